@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 工具包
+
+- ffab.format: 文件格式定义、解析与写入，只依赖标准库
+- ffab.encoder: 编码（依赖 numpy、Pillow 与 astcenc）
+- ffab.decoder: 解码（依赖 numpy、Pillow 与 astcenc）
+- ffab.info: 文件信息查看
+- ffab.blocks: ASTC 块数据分析（依赖 numpy）
+- ffab.watch: 监视模式，增量更新FFAB文件
+- ffab.archive: 多动画归档 (.ffar) 的打包、读取与解包，只依赖标准库
+- ffab.preview: 不解码图片，从 ASTC 块的颜色端点生成缩略图、联系表与动画预览（依赖 numpy 与 Pillow）
+
+包本身按需导入子模块，`import ffab` 与读取文件信息不会导入 numpy 与 Pillow。
+"""
+
+import importlib
+
+# 公开名称 -> 所在子模块，首次访问时导入
+_LAZY_ATTRIBUTES = {
+    'FFAB_MAGIC': 'format',
+    'FFAB_VERSION_0x0001': 'format',
+    'FFAB_VERSION_0x0002': 'format',
+    'FFAB_VERSION_0x0003': 'format',
+    'FFAB_FLAG_SPARSE': 'format',
+    'FFAB_FLAG_CHECKSUMS': 'format',
+    'FFAB_FLAG_TRAILING_INDEX': 'format',
+    'ASTC_FORMAT_CODES': 'format',
+    'ASTC_CODE_TO_FORMAT': 'format',
+    'FFAB_VERSION_PARSERS': 'format',
+    'register_ffab_version': 'format',
+    'check_astc_format': 'format',
+    'get_astc_format_code': 'format',
+    'get_astc_frame_data_size': 'format',
+    'generate_astc_header': 'format',
+    'parse_ffab': 'format',
+    'read_ffab': 'format',
+    'verify_ffab': 'format',
+    'write_ffab_file': 'format',
+    'write_ffab_file_v1': 'format',
+    'build_ffab_prefix': 'format',
+    'open_ffab_stream': 'format',
+    'write_ffab_stream_frame': 'format',
+    'finish_ffab_stream': 'format',
+    'parse_dirty_rects': 'format',
+    'read_ffab_buffer': 'format',
+    'get_index_entries': 'format',
+    'verify_ffab_buffer': 'format',
+    'preload_ffab': 'format',
+    'FFAR_MAGIC': 'archive',
+    'is_ffab_archive': 'archive',
+    'read_ffab_archive': 'archive',
+    'load_ffab_archive': 'archive',
+    'read_ffab_member': 'archive',
+    'verify_ffab_archive': 'archive',
+    'write_ffab_archive': 'archive',
+    'extract_ffab_archive': 'archive',
+    'get_file_info': 'info',
+    'analyze_blocks': 'blocks',
+    'compute_dirty_rects': 'blocks',
+    'encode_frames_to_ffab_v1': 'encoder',
+    'encode_density_variants': 'encoder',
+    'create_ffab_file_v1': 'encoder',
+    'encode_bundle_async': 'encoder',
+    'iter_frames': 'decoder',
+    'decode_ffab_file': 'decoder',
+    'block_colors': 'preview',
+    'iter_thumbnails': 'preview',
+    'build_contact_sheet': 'preview',
+    'create_previews': 'preview',
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
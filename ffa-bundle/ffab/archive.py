@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 多动画归档 (.ffar)
+将多个FFAB文件打包到一个文件中，每个动画保留完整的文件头、Meta信息区与索引表，按名称排序的目录支持二分查找。
+只依赖标准库。加载一个界面使用的全部动画只需要打开一次文件、读取一次目录。
+"""
+
+import os
+import mmap
+import shutil
+import struct
+import bisect
+from array import array
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .format import INDEX_OFFSET_TYPECODE, read_ffab, read_ffab_buffer, verify_ffab_buffer
+
+# 归档文件标识与版本
+FFAR_MAGIC = b'FFAR'
+FFAR_VERSION_0x0001 = 0x0001
+
+# 归档文件头（16字节）: 魔数 "FFAR"(4字节) + 版本号(2字节) + 保留(2字节) + 动画数量(4字节) + 目录长度(4字节)
+ARCHIVE_HEADER_STRUCT = struct.Struct('>4sHHII')
+
+# 目录项（24字节）: 名称偏移量(4字节，相对名称区) + 名称长度(2字节) + 保留(2字节)
+# + 动画偏移量(8字节，相对归档文件开头) + 动画长度(8字节)
+# 目录项按名称的 UTF-8 字节序排序，定长的目录项可以直接二分查找
+ARCHIVE_ENTRY_STRUCT = struct.Struct('>IHHQQ')
+
+# 动画名称的 UTF-8 最大字节数
+ARCHIVE_MAX_NAME_LENGTH = 0xFFFF
+
+
+def check_member_name(name: str) -> str:
+    """
+    检查动画名称是否可以写入归档（解包时作为文件名使用）
+
+    Raises:
+        ValueError: 名称为空、过长或包含路径分隔符
+    """
+    if not name or name in ('.', '..') or '/' in name or '\\' in name:
+        raise ValueError(f"无效的动画名称: {name!r}")
+    if len(name.encode('utf-8')) > ARCHIVE_MAX_NAME_LENGTH:
+        raise ValueError(f"动画名称过长: {name}")
+    return name
+
+
+def is_ffab_archive(file_path: str) -> bool:
+    """根据文件开头的魔数判断文件是否为多动画归档，路径不是文件时返回 False"""
+    if not os.path.isfile(file_path):
+        return False
+    with open(file_path, 'rb') as f:
+        return f.read(len(FFAR_MAGIC)) == FFAR_MAGIC
+
+
+def parse_ffab_archive(buffer) -> Dict[str, Any]:
+    """
+    从缓冲区解析归档文件头与目录
+
+    Args:
+        buffer: 整个归档文件的缓冲区（bytes、mmap 等）
+
+    Returns:
+        归档信息字典，包括 version、names（按字节序排序的动画名称）、offsets 与 lengths（每个动画在归档中的位置，array）
+        与 directory_size（文件头与目录的总长度）
+
+    Raises:
+        ValueError: 如果归档格式无效或版本不支持
+    """
+    with memoryview(buffer) as view:
+        if len(view) < ARCHIVE_HEADER_STRUCT.size:
+            raise ValueError("无效的FFAB归档文件: 文件头不完整")
+        magic, version, _, member_count, directory_length = ARCHIVE_HEADER_STRUCT.unpack_from(view, 0)
+        if magic != FFAR_MAGIC:
+            raise ValueError(f"无效的FFAB归档文件: 魔数不匹配 (期望: {FFAR_MAGIC!r}, 实际: {bytes(magic)!r})")
+        if version != FFAR_VERSION_0x0001:
+            raise ValueError(f"不支持的FFAB归档文件版本: 0x{version:04X}")
+
+        directory_size = ARCHIVE_HEADER_STRUCT.size + directory_length
+        names_offset = ARCHIVE_HEADER_STRUCT.size + member_count * ARCHIVE_ENTRY_STRUCT.size
+        if names_offset > directory_size or directory_size > len(view):
+            raise ValueError(f"无效的FFAB归档文件: 目录不完整 (动画数量: {member_count})")
+
+        names = []
+        offsets = array(INDEX_OFFSET_TYPECODE)
+        lengths = array(INDEX_OFFSET_TYPECODE)
+        with view[ARCHIVE_HEADER_STRUCT.size:names_offset] as entries, \
+                view[names_offset:directory_size] as names_view:
+            for name_offset, name_length, _, offset, length in ARCHIVE_ENTRY_STRUCT.iter_unpack(entries):
+                if name_offset + name_length > len(names_view):
+                    raise ValueError("无效的FFAB归档文件: 动画名称超出目录范围")
+                names.append(str(names_view[name_offset:name_offset + name_length], 'utf-8'))
+                offsets.append(offset)
+                lengths.append(length)
+
+        # 二分查找要求名称严格递增（UTF-8 字节序与 Unicode 码位顺序一致）
+        if any(a >= b for a, b in zip(names, names[1:])):
+            raise ValueError("无效的FFAB归档文件: 目录未按名称排序或包含重复名称")
+        file_size = len(view)
+        for name, offset, length in zip(names, offsets, lengths):
+            if offset < directory_size or offset + length > file_size:
+                raise ValueError(f"无效的FFAB归档文件: 动画 {name} 超出文件范围")
+
+    return {
+        'version': version,
+        'names': names,
+        'offsets': offsets,
+        'lengths': lengths,
+        'directory_size': directory_size,
+    }
+
+
+def find_archive_member(archive: Dict[str, Any], name: str) -> int:
+    """
+    在排序的目录中二分查找动画，返回目录项序号
+
+    Raises:
+        ValueError: 归档中没有该名称的动画
+    """
+    names = archive['names']
+    i = bisect.bisect_left(names, name)
+    if i == len(names) or names[i] != name:
+        raise ValueError(f"归档中没有动画: {name}")
+    return i
+
+
+def read_ffab_archive(file_path: str) -> Dict[str, Any]:
+    """
+    读取归档文件头与目录
+
+    Args:
+        file_path: 归档文件路径
+
+    Returns:
+        parse_ffab_archive 的归档信息字典，额外包括 file_size
+    """
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size < ARCHIVE_HEADER_STRUCT.size:
+            raise ValueError("无效的FFAB归档文件: 文件头不完整")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            archive = parse_ffab_archive(mapped)
+    archive['file_size'] = file_size
+    return archive
+
+
+def _read_member(view: memoryview, archive: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """
+    解析归档中的一个动画
+
+    偏移量转换为相对归档文件开头，解码与块分析可以直接读取归档文件。
+    """
+    base = archive['offsets'][index]
+    with view[base:base + archive['lengths'][index]] as member_view:
+        info = read_ffab_buffer(member_view)
+    info['offsets'] = array(INDEX_OFFSET_TYPECODE, (offset + base for offset in info['offsets']))
+    info['index_offset'] += base
+    info['data_offset'] += base
+    if info.get('preload'):
+        info['preload']['offset'] += base
+    info['member'] = archive['names'][index]
+    info['member_offset'] = base
+    return info
+
+
+def load_ffab_archive(file_path: str, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    打开一次归档文件，读取目录并解析多个动画的文件头、Meta信息区与索引表
+
+    Args:
+        file_path: 归档文件路径
+        names: 需要加载的动画名称，为 None 时加载全部动画
+
+    Returns:
+        动画名称 -> 文件信息字典（参考 read_ffab_member）
+
+    Raises:
+        ValueError: 归档中没有指定名称的动画
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < ARCHIVE_HEADER_STRUCT.size:
+            raise ValueError("无效的FFAB归档文件: 文件头不完整")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            archive = parse_ffab_archive(view)
+            indices = range(len(archive['names'])) if names is None else \
+                [find_archive_member(archive, name) for name in names]
+            return {archive['names'][i]: _read_member(view, archive, i) for i in indices}
+
+
+def read_ffab_member(file_path: str, name: str) -> Dict[str, Any]:
+    """
+    读取归档中一个动画的文件头、Meta信息区与索引表
+
+    Args:
+        file_path: 归档文件路径
+        name: 动画名称
+
+    Returns:
+        read_ffab 的文件信息字典，offsets、index_offset 与 data_offset 相对归档文件开头，
+        file_size 为动画的长度，额外包括 member（动画名称）与 member_offset（动画在归档中的偏移量）
+    """
+    return load_ffab_archive(file_path, [name])[name]
+
+
+def verify_ffab_archive(file_path: str, names: Optional[Iterable[str]] = None, executor: Optional[Executor] = None,
+                        jobs: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    校验归档中动画的完整性，归档文件只映射一次
+
+    Args:
+        file_path: 归档文件路径
+        names: 需要校验的动画名称，为 None 时校验全部动画
+        executor: 共享的线程池，参考 ffab.format.verify_ffab_buffer
+        jobs: 新线程池的线程数
+
+    Returns:
+        动画名称 -> ffab.format.verify_ffab_buffer 的校验结果字典（帧偏移量相对动画开头）
+    """
+    results = {}
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            memoryview(mapped) as view:
+        archive = parse_ffab_archive(view)
+        indices = range(len(archive['names'])) if names is None else \
+            [find_archive_member(archive, name) for name in names]
+        for i in indices:
+            offset = archive['offsets'][i]
+            with view[offset:offset + archive['lengths'][i]] as member_view:
+                results[archive['names'][i]] = verify_ffab_buffer(member_view, executor, jobs)
+    return results
+
+
+def write_ffab_archive(output_path: str, members: Dict[str, str]) -> None:
+    """
+    将多个FFAB文件打包为归档，每个动画按原样复制（保留版本、标志位、校验和表与扩展区）
+
+    Args:
+        output_path: 输出的归档文件路径
+        members: 动画名称 -> FFAB文件路径
+    """
+    if not members:
+        raise ValueError("没有可打包的FFAB文件")
+
+    names = sorted(check_member_name(name) for name in members)
+    encoded_names = [name.encode('utf-8') for name in names]
+    file_infos = {}
+    for name in names:
+        # 检查每个文件都是有效的FFAB文件
+        file_infos[name] = read_ffab(members[name])
+
+    # 计算目录与每个动画的位置：文件头 + 目录项 + 名称区 + 动画数据
+    names_size = sum(len(encoded) for encoded in encoded_names)
+    directory_length = len(names) * ARCHIVE_ENTRY_STRUCT.size + names_size
+    entries = b''
+    member_ends = []
+    name_offset = 0
+    offset = ARCHIVE_HEADER_STRUCT.size + directory_length
+    for name, encoded in zip(names, encoded_names):
+        length = file_infos[name]['file_size']
+        entries += ARCHIVE_ENTRY_STRUCT.pack(name_offset, len(encoded), 0, offset, length)
+        name_offset += len(encoded)
+        offset += length
+        member_ends.append(offset)
+
+    # 先写入临时文件再替换，读取方不会读到写入中的文件
+    temp_path = f'{output_path}.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(ARCHIVE_HEADER_STRUCT.pack(FFAR_MAGIC, FFAR_VERSION_0x0001, 0, len(names), directory_length))
+            f.write(entries)
+            f.write(b''.join(encoded_names))
+            for name, member_end in zip(names, member_ends):
+                with open(members[name], 'rb') as member_file:
+                    shutil.copyfileobj(member_file, f)
+                if f.tell() != member_end:
+                    raise RuntimeError(f"FFAB文件在打包过程中被修改: {members[name]}")
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    print(f"\nFFAB归档创建成功:")
+    print(f"  输出文件: {output_path}")
+    print(f"  动画数量: {len(names)}")
+    print(f"  目录大小: {ARCHIVE_HEADER_STRUCT.size + directory_length} 字节")
+    print(f"  文件大小: {os.path.getsize(output_path)} 字节")
+
+
+def pack_ffab_folder(input_path: str, output_path: str) -> None:
+    """
+    将文件夹中的全部 .ffab 文件打包为归档，动画名称为不含扩展名的文件名
+
+    Args:
+        input_path: 包含 .ffab 文件的文件夹
+        output_path: 输出的归档文件路径
+    """
+    if not os.path.isdir(input_path):
+        raise FileNotFoundError(f"文件夹不存在: {input_path}")
+    members = {}
+    for file_name in sorted(os.listdir(input_path)):
+        stem, extension = os.path.splitext(file_name)
+        if extension.lower() == '.ffab' and not file_name.startswith('.'):
+            members[stem] = os.path.join(input_path, file_name)
+    if not members:
+        raise ValueError(f"文件夹中没有找到 .ffab 文件: {input_path}")
+    print(f"正在打包 {len(members)} 个FFAB文件: {', '.join(members)}")
+    write_ffab_archive(output_path, members)
+
+
+def extract_ffab_archive(file_path: str, output_dir: str, names: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    将归档中的动画解包为独立的FFAB文件（按原样复制），文件名为 <动画名称>.ffab
+
+    Args:
+        file_path: 归档文件路径
+        output_dir: 输出文件夹
+        names: 需要解包的动画名称，为 None 时解包全部动画
+
+    Returns:
+        写出的FFAB文件路径列表
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output_files = []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            memoryview(mapped) as view:
+        archive = parse_ffab_archive(view)
+        indices = range(len(archive['names'])) if names is None else \
+            [find_archive_member(archive, name) for name in names]
+        for i in indices:
+            name = check_member_name(archive['names'][i])
+            output_file = os.path.join(output_dir, f'{name}.ffab')
+            offset = archive['offsets'][i]
+            with open(output_file, 'wb') as out, view[offset:offset + archive['lengths'][i]] as member_view:
+                out.write(member_view)
+            print(f"已解包: {name} -> {output_file} ({archive['lengths'][i]} 字节)")
+            output_files.append(output_file)
+    return output_files
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+
+"""
+ASTC 块数据分析
+不解码图片，只读取每个 16 字节块的块模式位：通过 numpy 向量化统计 void-extent（单色）块、完全透明块，
+以及与上一帧同一位置完全相同的块，用于估算稀疏存储、增量存储与裁剪能节省的空间，并计算每一帧的脏矩形。
+
+void-extent 块：块的低 9 位为 0x1FC，字节 8..15 为 RGBA 四个小端序 uint16 颜色值，整个块为同一颜色。
+
+稀疏存储（版本2 FFAB_FLAG_SPARSE）的帧数据为块位图加非空块：位图每个块 1 位（按块顺序，字节内低位在前），
+1 表示该块被存储，之后按块顺序依次存储被标记的块；未标记的块为 EMPTY_BLOCK。
+"""
+
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"错误：缺少必要的依赖库 {e}")
+    print("请运行: pip install numpy")
+    sys.exit(1)
+
+from .format import get_astc_frame_data_size, read_ffab
+
+# ASTC 每个块固定 16 字节
+ASTC_BLOCK_SIZE = 16
+
+# void-extent 块的块模式：低 9 位
+VOID_EXTENT_MASK = 0x1FF
+VOID_EXTENT_MODE = 0x1FC
+
+# void-extent 块中 alpha 分量 (uint16) 所在的字节偏移
+VOID_EXTENT_ALPHA_OFFSET = 14
+
+# void-extent 块中 RGBA 颜色值所在的字节范围
+VOID_EXTENT_COLOR = slice(8, 16)
+
+# 空块：LDR void-extent 块，不指定范围，颜色为 (0, 0, 0, 0)。
+# 稀疏存储只省略解码结果与其完全相同的块（RGBA 全为 0 的 LDR void-extent 块），保证解码结果不变
+EMPTY_BLOCK = bytes((0xFC, 0xFD, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0, 0, 0, 0, 0, 0, 0, 0))
+
+# 每一帧最多的脏矩形数量
+DEFAULT_MAX_DIRTY_RECTS = 8
+
+# 参与两两合并的候选矩形上限，变化区域拆分出更多矩形时（如条纹或噪点）先将变化块掩码合并为更粗的网格
+MAX_DIRTY_RECT_CANDIDATES = 64
+
+
+def as_blocks(data) -> np.ndarray:
+    """将一帧 ASTC 数据转换为 (块数, 16) 的 uint8 数组（不复制数据）"""
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, ASTC_BLOCK_SIZE)
+
+
+def void_extent_mask(blocks: np.ndarray) -> np.ndarray:
+    """返回每个块是否为 void-extent（单色）块"""
+    mode = blocks[:, 0].astype(np.uint16) | (blocks[:, 1].astype(np.uint16) << 8)
+    return (mode & VOID_EXTENT_MASK) == VOID_EXTENT_MODE
+
+
+def transparent_mask(blocks: np.ndarray) -> np.ndarray:
+    """返回每个块是否为完全透明块（alpha 为 0 的 void-extent 块）"""
+    alpha = blocks[:, VOID_EXTENT_ALPHA_OFFSET] | blocks[:, VOID_EXTENT_ALPHA_OFFSET + 1]
+    return void_extent_mask(blocks) & (alpha == 0)
+
+
+def empty_mask(blocks: np.ndarray) -> np.ndarray:
+    """返回每个块是否为空块（RGBA 全为 0 的 LDR void-extent 块，解码结果与 EMPTY_BLOCK 相同）"""
+    # 块模式之后的第 9 位为 HDR 标志
+    ldr = (blocks[:, 1] & 0x02) == 0
+    return void_extent_mask(blocks) & ldr & ~blocks[:, VOID_EXTENT_COLOR].any(axis=1)
+
+
+def pack_sparse_frame(payload) -> bytes:
+    """
+    将一帧 ASTC 数据转换为稀疏存储格式：块位图 + 非空块
+
+    Args:
+        payload: 不包括 astc header 的完整压缩数据
+
+    Returns:
+        稀疏存储的帧数据
+    """
+    blocks = as_blocks(payload)
+    occupied = ~empty_mask(blocks)
+    bitmap = np.packbits(occupied, bitorder='little')
+    return bitmap.tobytes() + blocks[occupied].tobytes()
+
+
+def sparse_occupancy(data, blocks_per_frame: int) -> np.ndarray:
+    """
+    读取稀疏存储帧数据的块位图
+
+    播放器可以根据位图跳过空块所在区域的纹理上传。
+
+    Args:
+        data: 稀疏存储的帧数据
+        blocks_per_frame: 每一帧的块数
+
+    Returns:
+        每个块是否被存储（非空）的 bool 数组
+    """
+    bitmap_size = (blocks_per_frame + 7) // 8
+    bitmap = np.frombuffer(data, dtype=np.uint8, count=bitmap_size)
+    return np.unpackbits(bitmap, count=blocks_per_frame, bitorder='little').astype(bool)
+
+
+def expand_sparse_frame(data, blocks_per_frame: int) -> bytes:
+    """
+    将稀疏存储的帧数据还原为完整的 ASTC 块数据：预先填充空块，再按位图把非空块写回对应位置
+
+    Args:
+        data: 稀疏存储的帧数据
+        blocks_per_frame: 每一帧的块数
+
+    Returns:
+        不包括 astc header 的完整压缩数据
+    """
+    occupied = sparse_occupancy(data, blocks_per_frame)
+    bitmap_size = (blocks_per_frame + 7) // 8
+    stored = as_blocks(memoryview(data)[bitmap_size:])
+    if len(stored) != np.count_nonzero(occupied):
+        raise ValueError(f"稀疏帧数据长度与块位图不符: 位图标记 {np.count_nonzero(occupied)} 块, 实际 {len(stored)} 块")
+
+    grid = np.empty((blocks_per_frame, ASTC_BLOCK_SIZE), dtype=np.uint8)
+    grid[:] = np.frombuffer(EMPTY_BLOCK, dtype=np.uint8)
+    grid[occupied] = stored
+    return grid.tobytes()
+
+
+def read_frame_payload(data, ffab: Dict[str, Any]) -> bytes:
+    """返回一帧完整的 ASTC 块数据，稀疏存储的帧先还原"""
+    if not ffab.get('sparse'):
+        return data
+    frame_size = get_astc_frame_data_size(ffab['width'], ffab['height'], ffab['astc_format'])
+    return expand_sparse_frame(data, frame_size // ASTC_BLOCK_SIZE)
+
+
+def identical_mask(blocks: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    """返回每个块是否与上一帧同一位置的块完全相同（按两个 uint64 比较）"""
+    current = blocks.view('<u8')
+    return (current == previous.view('<u8')).all(axis=1)
+
+
+def _changed_rects(changed: np.ndarray, limit: Optional[int] = None):
+    """
+    将变化块的掩码 (块行, 块列) 拆分为矩形：先按连续的变化行分段，每段再按连续的变化列拆分并收紧上下边界
+
+    矩形数量超过 limit 时提前停止并返回 None
+    """
+    rects = []
+    rows = np.flatnonzero(changed.any(axis=1))
+    if not rows.size:
+        return rects
+    # 连续的变化行为一段
+    bands = np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1)
+    for band in bands:
+        band_mask = changed[band[0]:band[-1] + 1]
+        cols = np.flatnonzero(band_mask.any(axis=0))
+        runs = np.split(cols, np.flatnonzero(np.diff(cols) > 1) + 1)
+        if limit is not None and len(rects) + len(runs) > limit:
+            return None
+        for run in runs:
+            run_rows = np.flatnonzero(band_mask[:, run[0]:run[-1] + 1].any(axis=1))
+            rects.append((int(run[0]), int(band[0] + run_rows[0]),
+                          int(run[-1] - run[0] + 1), int(run_rows[-1] - run_rows[0] + 1)))
+    return rects
+
+
+def _candidate_rects(changed: np.ndarray, limit: int = MAX_DIRTY_RECT_CANDIDATES):
+    """
+    将变化块的掩码拆分为不超过 limit 个候选矩形
+
+    拆分出的矩形过多时，按 2、4、8… 块的网格合并掩码（网格内任意块变化即视为变化）后重新拆分，
+    再将矩形换算回块坐标并收紧到其中实际变化的块，每次尝试最多拆分 limit 个矩形，耗时与矩形数量无关。
+    """
+    rects = _changed_rects(changed, limit)
+    tile = 1
+    while rects is None:
+        tile *= 2
+        rows, cols = -(-changed.shape[0] // tile), -(-changed.shape[1] // tile)
+        padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+        padded[:changed.shape[0], :changed.shape[1]] = changed
+        coarse = padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+        rects = _changed_rects(coarse, limit)
+        if rects is None:
+            continue
+        tightened = []
+        for x, y, w, h in rects:
+            region = changed[y * tile:(y + h) * tile, x * tile:(x + w) * tile]
+            region_rows = np.flatnonzero(region.any(axis=1))
+            region_cols = np.flatnonzero(region.any(axis=0))
+            tightened.append((int(x * tile + region_cols[0]), int(y * tile + region_rows[0]),
+                              int(region_cols[-1] - region_cols[0] + 1), int(region_rows[-1] - region_rows[0] + 1)))
+        rects = tightened
+    return rects
+
+
+def _merge_rects(rects, max_rects: int):
+    """
+    每次合并增加面积最小的两个矩形（合并为包围盒），直到不超过 max_rects 个
+
+    每次合并通过 numpy 一次计算所有矩形对的包围盒面积，面积相同时合并序号最小的一对
+    """
+    if len(rects) <= max_rects:
+        return list(rects)
+    boxes = np.array(rects, dtype=np.int64)
+    # (x0, y0, x1, y1)，x1 与 y1 不包括在内
+    boxes[:, 2:] += boxes[:, :2]
+    while len(boxes) > max_rects:
+        x0 = np.minimum.outer(boxes[:, 0], boxes[:, 0])
+        y0 = np.minimum.outer(boxes[:, 1], boxes[:, 1])
+        x1 = np.maximum.outer(boxes[:, 2], boxes[:, 2])
+        y1 = np.maximum.outer(boxes[:, 3], boxes[:, 3])
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        cost = (x1 - x0) * (y1 - y0) - areas[:, None] - areas[None, :]
+        # 只考虑 i < j 的矩形对
+        cost[np.tril_indices(len(boxes))] = np.iinfo(np.int64).max
+        i, j = divmod(int(np.argmin(cost)), len(boxes))
+        boxes[i] = (x0[i, j], y0[i, j], x1[i, j], y1[i, j])
+        boxes = np.delete(boxes, j, axis=0)
+    return [(int(x0), int(y0), int(x1 - x0), int(y1 - y0)) for x0, y0, x1, y1 in boxes]
+
+
+def frame_dirty_rects(payload, previous, blocks_x: int, blocks_y: int,
+                      max_rects: int = DEFAULT_MAX_DIRTY_RECTS) -> List[Tuple[int, int, int, int]]:
+    """
+    计算一帧相对上一帧发生变化的区域（脏矩形，以块为单位）
+
+    Args:
+        payload: 当前帧不包括 astc header 的完整压缩数据
+        previous: 上一帧不包括 astc header 的完整压缩数据
+        blocks_x: 每行的块数
+        blocks_y: 每列的块数
+        max_rects: 最多的矩形数量，超过时合并相邻的矩形
+
+    Returns:
+        矩形列表 [(x, y, 宽, 高), ...]
+    """
+    changed = ~identical_mask(as_blocks(payload), as_blocks(previous)).reshape(blocks_y, blocks_x)
+    return _merge_rects(_candidate_rects(changed), max_rects)
+
+
+def compute_dirty_rects(payloads, blocks_x: int, blocks_y: int,
+                        max_rects: int = DEFAULT_MAX_DIRTY_RECTS) -> List[List[Tuple[int, int, int, int]]]:
+    """
+    计算每一帧相对上一帧发生变化的区域（脏矩形，以块为单位）
+
+    第 0 帧与最后一帧比较（循环播放时的上一帧），只有一帧时与自身比较，没有脏矩形。
+    播放器可以只重新上传或重绘脏矩形内的块。
+
+    Args:
+        payloads: 每一帧不包括 astc header 的完整压缩数据
+        blocks_x: 每行的块数
+        blocks_y: 每列的块数
+        max_rects: 每一帧最多的矩形数量，超过时合并相邻的矩形
+
+    Returns:
+        每一帧的矩形列表 [(x, y, 宽, 高), ...]
+    """
+    return [frame_dirty_rects(payload, payloads[i - 1], blocks_x, blocks_y, max_rects)
+            for i, payload in enumerate(payloads)]
+
+
+def analyze_blocks(file_path: str, ffab: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    统计FFAB文件每一帧的 void-extent 块、完全透明块、空块与相同块，并估算各种存储方式的大小
+
+    稀疏存储的文件先还原每一帧的完整块数据，统计结果与版本1相同。
+
+    Args:
+        file_path: FFAB文件路径
+        ffab: 已读取的文件信息 (read_ffab 的返回值)，为 None 时读取文件
+
+    Returns:
+        分析结果字典，包括 blocks_x、blocks_y、blocks_per_frame、frames（每一帧的统计）、totals（合计）
+        与 estimates（稀疏、增量、裁剪存储的估算字节数）
+    """
+    ffab = ffab or read_ffab(file_path)
+    astc_format = ffab['astc_format']
+    if astc_format is None:
+        raise ValueError(f"未知的ASTC格式代码: 0x{ffab['astc_format_code']:04X}")
+    block_x, block_y = map(int, astc_format.split('x'))
+    blocks_x = (ffab['width'] + block_x - 1) // block_x
+    blocks_y = (ffab['height'] + block_y - 1) // block_y
+    blocks_per_frame = blocks_x * blocks_y
+    frame_size = blocks_per_frame * ASTC_BLOCK_SIZE
+
+    # 整个文件只读映射，每一帧按索引表切片，不复制数据
+    data = np.memmap(file_path, dtype=np.uint8, mode='r')
+    frames = []
+    previous = None
+    for i, (offset, data_length) in enumerate(zip(ffab['offsets'], ffab['lengths'])):
+        payload = read_frame_payload(data[offset:offset + data_length], ffab)
+        if len(payload) != frame_size:
+            raise ValueError(f"第{i}帧数据长度 ({len(payload)}) 与尺寸不符 (期望: {frame_size})")
+        blocks = as_blocks(payload)
+        void = void_extent_mask(blocks)
+        transparent = transparent_mask(blocks)
+        empty = empty_mask(blocks)
+        identical = identical_mask(blocks, previous) if previous is not None else np.zeros(blocks_per_frame, bool)
+
+        # 非透明块的包围盒（以块为单位），完全透明的帧为 None
+        occupied = (~transparent).reshape(blocks_y, blocks_x)
+        rows = np.flatnonzero(occupied.any(axis=1))
+        cols = np.flatnonzero(occupied.any(axis=0))
+        bbox = None
+        if rows.size:
+            bbox = [int(cols[0]), int(rows[0]), int(cols[-1] - cols[0] + 1), int(rows[-1] - rows[0] + 1)]
+
+        frames.append({
+            'frame': i,
+            'void_extent_blocks': int(void.sum()),
+            'transparent_blocks': int(transparent.sum()),
+            'empty_blocks': int(empty.sum()),
+            'identical_blocks': int(identical.sum()),
+            'bbox_blocks': bbox,
+        })
+        previous = blocks
+
+    total_blocks = blocks_per_frame * len(frames)
+    totals = {
+        'blocks': total_blocks,
+        'void_extent_blocks': sum(frame['void_extent_blocks'] for frame in frames),
+        'transparent_blocks': sum(frame['transparent_blocks'] for frame in frames),
+        'empty_blocks': sum(frame['empty_blocks'] for frame in frames),
+        'identical_blocks': sum(frame['identical_blocks'] for frame in frames),
+    }
+
+    # 估算：稀疏存储 = 每帧一个块位图 + 非空块（参考 pack_sparse_frame）；增量存储 = 每帧一个块位图 + 与上一帧不同的块；
+    # 裁剪 = 只保存每帧非透明块包围盒内的块
+    bitmap_size = (blocks_per_frame + 7) // 8
+    estimates = {
+        'v1_bytes': total_blocks * ASTC_BLOCK_SIZE,
+        'sparse_bytes': sum(bitmap_size + (blocks_per_frame - frame['empty_blocks']) * ASTC_BLOCK_SIZE
+                            for frame in frames),
+        'delta_bytes': sum(bitmap_size + (blocks_per_frame - frame['identical_blocks']) * ASTC_BLOCK_SIZE
+                           for frame in frames),
+        'crop_bytes': sum(frame['bbox_blocks'][2] * frame['bbox_blocks'][3] * ASTC_BLOCK_SIZE
+                          for frame in frames if frame['bbox_blocks'] is not None),
+    }
+    del data
+
+    return {
+        'blocks_x': blocks_x,
+        'blocks_y': blocks_y,
+        'blocks_per_frame': blocks_per_frame,
+        'frames': frames,
+        'totals': totals,
+        'estimates': estimates,
+    }
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 编码常驻服务客户端
+只依赖标准库。命令行工具启动时先尝试连接常驻服务 (ffab_encoder.py --serve)，
+连接成功时把任务交给服务执行并输出服务返回的进度；没有运行中的服务时在当前进程中执行。
+
+协议：每条消息为一行 JSON (UTF-8)。客户端发送一条请求后，服务依次返回事件，直到 done 或 error：
+    请求: {"op": "encode" | "decode" | "ping" | "shutdown", "argv": [...], "cwd": "..."}
+    事件: {"event": "progress", ...} / {"event": "done", ...} / {"event": "error", "message": "..."}
+"""
+
+import os
+import sys
+import json
+import socket
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def get_default_socket_path() -> str:
+    """常驻服务默认的 Unix socket 路径，每个用户一个"""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(runtime_dir, f'ffab-encoder-{uid}.sock')
+
+
+def _option_value(argv: List[str], name: str) -> Optional[str]:
+    """从命令行参数中读取选项的值，支持 `--name value` 与 `--name=value`"""
+    for i, arg in enumerate(argv):
+        if arg == name and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith(name + '='):
+            return arg[len(name) + 1:]
+    return None
+
+
+def connect(socket_path: Optional[str] = None) -> Optional[socket.socket]:
+    """
+    连接常驻服务，无法连接时返回 None，调用方在当前进程中执行
+
+    没有运行中的服务、socket 属于其他用户（服务创建时即为权限 0600，参考 ffab.server.serve，PermissionError）、路径不是 socket
+    或平台不支持 Unix socket 时都无法连接。
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path or get_default_socket_path())
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def send_request(sock: socket.socket, request: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """发送一条请求，逐个返回服务的事件，直到 done 或 error"""
+    sock.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+    with sock.makefile('r', encoding='utf-8') as reader:
+        for line in reader:
+            event = json.loads(line)
+            yield event
+            if event.get('event') in ('done', 'error'):
+                return
+    raise ConnectionError("常驻服务连接已断开")
+
+
+def run_via_daemon(op: str, argv: List[str]) -> Optional[int]:
+    """
+    通过常驻服务执行编码或解码任务
+
+    Args:
+        op: 任务类型 (encode, decode)
+        argv: 命令行参数，由服务使用与命令行相同的参数解析器解析
+
+    Returns:
+        退出码；不使用常驻服务（没有运行中的服务、--no-daemon、--serve、--watch、--help、pipe 输出、标准输出）时返回 None
+    """
+    if any(arg in ('--no-daemon', '--serve', '--watch', '-h', '--help') for arg in argv):
+        return None
+    if op == 'decode' and _option_value(argv, '--output-format') == 'pipe':
+        # pipe 输出需要写入当前进程的标准输出
+        return None
+    if op == 'encode' and '-' in argv:
+        # 输出到标准输出 (-) 需要写入当前进程的标准输出
+        return None
+
+    socket_path = _option_value(argv, '--socket') or get_default_socket_path()
+    sock = connect(socket_path)
+    if sock is None:
+        return None
+
+    print(f"使用常驻服务: {socket_path}")
+    with sock:
+        try:
+            for event in send_request(sock, {'op': op, 'argv': argv, 'cwd': os.getcwd()}):
+                if event['event'] == 'progress':
+                    if op == 'encode':
+                        total = f"/{event['total']}" if event.get('total') else ''
+                        print(f"已处理: {event['frame']} ({event['done']}{total})")
+                    else:
+                        print(f"已解码第{event['done']}/{event['total']}张图片")
+                elif event['event'] == 'done':
+                    print(f"\n完成: {event['output']} ({event['seconds']:.2f} 秒)")
+                    return 0
+                else:
+                    print(f"错误: {event['message']}")
+                    return 1
+        except (OSError, ValueError) as e:
+            print(f"错误: 常驻服务通信失败: {e}")
+            return 1
+    return 1
+
+
+def run_cli(op: str) -> None:
+    """命令行入口：优先交给常驻服务执行，否则在当前进程中执行"""
+    exit_code = run_via_daemon(op, sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+    if op == 'encode':
+        from .encoder import main
+    else:
+        from .decoder import main
+    main()
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 与标准 ASTC 容器格式之间的转换
+只依赖标准库。FFAB 的每一帧就是不包括 astc header 的 ASTC 块数据，因此导出为 `.astc` 文件或 KTX2 数组纹理、
+以及从它们导入都只需要复制字节，不会解码或重新压缩，转换是无损的。
+稀疏存储（版本2）的文件导出时需要按块位图还原空块，此时依赖 numpy。
+"""
+
+import os
+import sys
+import mmap
+import struct
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .format import (
+    ASTC_FORMAT_CODES,
+    FFAB_V3_MAX_DIMENSION,
+    generate_astc_header,
+    get_astc_frame_data_size,
+    parse_ffab,
+    write_ffab_file_v1,
+)
+
+# .astc 文件头: 魔数(4字节) + block_x, block_y, block_z(各1字节) + dim_x, dim_y, dim_z(各3字节，小端序)
+ASTC_HEADER_STRUCT = struct.Struct('<4s3B3s3s3s')
+ASTC_MAGIC = bytes((0x13, 0xAB, 0xA1, 0x5C))
+
+# KTX2 文件标识 «KTX 20»\r\n\x1A\n
+KTX2_IDENTIFIER = b'\xabKTX 20\xbb\r\n\x1a\n'
+
+# KTX2 文件头（标识之后）: vkFormat, typeSize, pixelWidth, pixelHeight, pixelDepth, layerCount, faceCount,
+# levelCount, supercompressionScheme, dfdByteOffset, dfdByteLength, kvdByteOffset, kvdByteLength,
+# sgdByteOffset, sgdByteLength，全部为小端序
+KTX2_HEADER_STRUCT = struct.Struct('<13I2Q')
+
+# KTX2 level 索引项: byteOffset, byteLength, uncompressedByteLength
+KTX2_LEVEL_STRUCT = struct.Struct('<3Q')
+
+# ASTC格式 -> VK_FORMAT_ASTC_*_UNORM_BLOCK，对应的 *_SRGB_BLOCK 为 UNORM + 1
+KTX2_ASTC_VK_FORMATS = {
+    '4x4': 157,
+    '5x4': 159,
+    '5x5': 161,
+    '6x5': 163,
+    '6x6': 165,
+    '8x5': 167,
+    '8x6': 169,
+    '8x8': 171,
+    '10x5': 173,
+    '10x6': 175,
+    '10x8': 177,
+    '10x10': 179,
+    '12x10': 181,
+    '12x12': 183,
+}
+
+# 反向映射：vkFormat (UNORM 与 SRGB) -> ASTC格式
+KTX2_VK_FORMAT_TO_ASTC = {}
+for _format, _vk_format in KTX2_ASTC_VK_FORMATS.items():
+    KTX2_VK_FORMAT_TO_ASTC[_vk_format] = _format
+    KTX2_VK_FORMAT_TO_ASTC[_vk_format + 1] = _format
+
+# Data Format Descriptor 中的常量 (Khronos Data Format Specification)
+KHR_DF_MODEL_ASTC = 162
+KHR_DF_PRIMARIES_BT709 = 1
+KHR_DF_TRANSFER_LINEAR = 1
+KHR_DF_TRANSFER_SRGB = 2
+
+# 写入 KTX2 元数据 KTXwriter 的名称
+KTX2_WRITER = 'ffab_container.py'
+
+
+def _read_ffab_frames(view: memoryview) -> Tuple[Dict[str, Any], List[memoryview]]:
+    """
+    解析FFAB文件并返回每一帧完整压缩数据的 memoryview（不复制数据，使用后需要 release）
+
+    稀疏存储的帧需要还原为完整的块数据（依赖 numpy），此时返回还原结果的 memoryview。
+    """
+    info = parse_ffab(view)
+    if info['astc_format'] is None:
+        raise ValueError(f"未知的ASTC格式代码: 0x{info['astc_format_code']:04X}")
+    if info['sparse']:
+        from .blocks import read_frame_payload
+    frames = []
+    for offset, data_length in zip(info['offsets'], info['lengths']):
+        if offset + data_length > len(view):
+            raise ValueError(f"无效的FFAB文件: 图片数据超出文件范围 (偏移量: {offset}, 长度: {data_length})")
+        frame = view[offset:offset + data_length]
+        if info['sparse']:
+            with frame:
+                frame = memoryview(read_frame_payload(frame, info))
+        frames.append(frame)
+    return info, frames
+
+
+def export_astc_files(ffab_path: str, output_dir: str) -> List[str]:
+    """
+    将FFAB文件的每一帧导出为 `.astc` 文件 (frame_%04d.astc)，文件内容为 astc header 加上原始的压缩数据
+
+    Args:
+        ffab_path: FFAB文件路径
+        output_dir: 输出文件夹路径
+
+    Returns:
+        导出的文件路径列表
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output_paths = []
+    with open(ffab_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            memoryview(mapped) as view:
+        info, frames = _read_ffab_frames(view)
+        header = generate_astc_header(info['width'], info['height'], info['astc_format'])
+        for i, frame in enumerate(frames):
+            output_path = os.path.join(output_dir, f'frame_{i + 1:04d}.astc')
+            with frame, open(output_path, 'wb') as out:
+                out.write(header)
+                out.write(frame)
+            output_paths.append(output_path)
+
+    print(f"已导出 {len(output_paths)} 个 .astc 文件: {output_dir}")
+    return output_paths
+
+
+def parse_astc_header(data: bytes) -> Tuple[int, int, str]:
+    """
+    解析 `.astc` 文件头
+
+    Args:
+        data: `.astc` 文件内容（至少 16 字节）
+
+    Returns:
+        (宽度, 高度, ASTC格式)
+
+    Raises:
+        ValueError: 如果不是二维 ASTC 文件或块大小不被FFAB支持
+    """
+    if len(data) < ASTC_HEADER_STRUCT.size:
+        raise ValueError("无效的ASTC文件: 文件头不完整")
+    magic, block_x, block_y, block_z, dim_x, dim_y, dim_z = ASTC_HEADER_STRUCT.unpack_from(data, 0)
+    if magic != ASTC_MAGIC:
+        raise ValueError("无效的ASTC文件: 魔数不匹配")
+    if block_z != 1 or int.from_bytes(dim_z, 'little') != 1:
+        raise ValueError("不支持3D ASTC纹理")
+    astc_format = f'{block_x}x{block_y}'
+    if astc_format not in ASTC_FORMAT_CODES:
+        raise ValueError(f"不支持的ASTC块大小: {astc_format}")
+    return int.from_bytes(dim_x, 'little'), int.from_bytes(dim_y, 'little'), astc_format
+
+
+def _check_ffab_limits(image_count: int, width: int, height: int) -> None:
+    """检查图片数量与尺寸是否能写入FFAB文件（超过 65535 时写入版本3，各4字节）"""
+    if image_count > FFAB_V3_MAX_DIMENSION:
+        raise ValueError(f"图片数量超出FFAB文件上限 ({FFAB_V3_MAX_DIMENSION}): {image_count}")
+    if width > FFAB_V3_MAX_DIMENSION or height > FFAB_V3_MAX_DIMENSION:
+        raise ValueError(f"图片尺寸超出FFAB文件上限 ({FFAB_V3_MAX_DIMENSION}): {width}x{height}")
+
+
+def import_astc_files(input_path: str, output_path: str) -> None:
+    """
+    将 `.astc` 文件导入为FFAB文件，去除每个文件的 astc header 后直接写入数据区
+
+    Args:
+        input_path: `.astc` 文件所在的文件夹（按文件名排序，忽略其他文件）
+        output_path: 输出的FFAB文件路径
+    """
+    folder = Path(input_path)
+    if not folder.is_dir():
+        raise FileNotFoundError(f"文件夹不存在: {input_path}")
+    astc_files = sorted(file for file in folder.iterdir() if file.suffix.lower() == '.astc')
+    if not astc_files:
+        raise ValueError(f"文件夹中没有找到 .astc 文件: {input_path}")
+
+    frames = []
+    expected = None
+    for astc_file in astc_files:
+        data = astc_file.read_bytes()
+        width, height, astc_format = parse_astc_header(data)
+        if expected is None:
+            expected = (width, height, astc_format)
+            _check_ffab_limits(len(astc_files), width, height)
+        elif (width, height, astc_format) != expected:
+            raise ValueError(f"ASTC文件尺寸或格式不一致: {astc_file.name} ({width}x{height}, {astc_format})，"
+                             f"期望 {expected[0]}x{expected[1]}, {expected[2]}")
+        payload = data[ASTC_HEADER_STRUCT.size:]
+        if len(payload) != get_astc_frame_data_size(width, height, astc_format):
+            raise ValueError(f"ASTC文件数据长度与尺寸不符: {astc_file.name}")
+        frames.append(payload)
+
+    width, height, astc_format = expected
+    write_ffab_file_v1(output_path, width, height, astc_format, frames)
+
+
+def _build_ktx2_dfd(astc_format: str, srgb: bool) -> bytes:
+    """构建 ASTC 的 Basic Data Format Descriptor（包括 dfdTotalSize）"""
+    block_x, block_y = map(int, astc_format.split('x'))
+    transfer = KHR_DF_TRANSFER_SRGB if srgb else KHR_DF_TRANSFER_LINEAR
+    # 描述块头 24 字节 + 1 个 sample 16 字节
+    block = struct.pack('<IHH4B4B8B',
+                        0,                      # vendorId = KHR, descriptorType = basic
+                        2, 24 + 16,             # versionNumber (KDF 1.3), descriptorBlockSize
+                        KHR_DF_MODEL_ASTC, KHR_DF_PRIMARIES_BT709, transfer, 0,
+                        block_x - 1, block_y - 1, 0, 0,
+                        16, 0, 0, 0, 0, 0, 0, 0)
+    # 整个 128 位的块作为一个 sample，channelType = KHR_DF_CHANNEL_ASTC_DATA
+    sample = struct.pack('<HBB4BII', 0, 127, 0, 0, 0, 0, 0, 0, 0xFFFFFFFF)
+    return struct.pack('<I', 4 + len(block) + len(sample)) + block + sample
+
+
+def _build_ktx2_key_values(values: Dict[str, str]) -> bytes:
+    """构建 KTX2 Key/Value 数据，键按字节序排序，每项按 4 字节对齐"""
+    data = b''
+    for key in sorted(values):
+        entry = key.encode('utf-8') + b'\0' + values[key].encode('utf-8') + b'\0'
+        data += struct.pack('<I', len(entry)) + entry
+        data += b'\0' * (-len(data) % 4)
+    return data
+
+
+def export_ktx2(ffab_path: str, output_path: str, srgb: bool = False) -> None:
+    """
+    将FFAB文件导出为 KTX2 数组纹理，每一帧为一层 (layer)，只有一个 mip level，不使用超压缩
+
+    Args:
+        ffab_path: FFAB文件路径
+        output_path: 输出的 .ktx2 文件路径
+        srgb: 是否标记为 sRGB 格式 (VK_FORMAT_ASTC_*_SRGB_BLOCK)，默认为 UNORM
+    """
+    with open(ffab_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            memoryview(mapped) as view:
+        info, frames = _read_ffab_frames(view)
+        astc_format = info['astc_format']
+        frame_size = get_astc_frame_data_size(info['width'], info['height'], astc_format)
+        for i, frame in enumerate(frames):
+            if len(frame) != frame_size:
+                for frame in frames:
+                    frame.release()
+                raise ValueError(f"第{i + 1}帧数据长度 ({len(frame)}) 与尺寸不符 (期望: {frame_size})，"
+                                 f"无法导出为 KTX2")
+
+        dfd = _build_ktx2_dfd(astc_format, srgb)
+        kvd = _build_ktx2_key_values({'KTXwriter': KTX2_WRITER})
+        dfd_offset = len(KTX2_IDENTIFIER) + KTX2_HEADER_STRUCT.size + KTX2_LEVEL_STRUCT.size
+        kvd_offset = dfd_offset + len(dfd)
+        # level 数据按块大小 (16 字节) 对齐
+        level_offset = kvd_offset + len(kvd)
+        padding = -level_offset % 16
+        level_offset += padding
+        level_length = frame_size * len(frames)
+
+        header = KTX2_HEADER_STRUCT.pack(
+            KTX2_ASTC_VK_FORMATS[astc_format] + (1 if srgb else 0),
+            1,                                  # typeSize，块压缩格式为 1
+            info['width'], info['height'], 0,   # pixelDepth = 0 表示二维纹理
+            len(frames), 1, 1,                  # layerCount, faceCount, levelCount
+            0,                                  # supercompressionScheme = 无
+            dfd_offset, len(dfd), kvd_offset, len(kvd),
+            0, 0)
+
+        with open(output_path, 'wb') as out:
+            out.write(KTX2_IDENTIFIER)
+            out.write(header)
+            out.write(KTX2_LEVEL_STRUCT.pack(level_offset, level_length, level_length))
+            out.write(dfd)
+            out.write(kvd)
+            out.write(b'\0' * padding)
+            for frame in frames:
+                with frame:
+                    out.write(frame)
+
+    print(f"已导出 KTX2 数组纹理: {output_path} ({len(frames)} 层, {info['width']}x{info['height']}, "
+          f"ASTC {astc_format}{' sRGB' if srgb else ''})")
+
+
+def import_ktx2(input_path: str, output_path: str) -> None:
+    """
+    将 ASTC 格式的 KTX2 纹理导入为FFAB文件，每一层为一帧；只读取 level 0（原始尺寸），不支持超压缩与立方体纹理
+
+    Args:
+        input_path: .ktx2 文件路径
+        output_path: 输出的FFAB文件路径
+    """
+    with open(input_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        header_end = len(KTX2_IDENTIFIER) + KTX2_HEADER_STRUCT.size
+        if len(mapped) < header_end + KTX2_LEVEL_STRUCT.size or mapped[:len(KTX2_IDENTIFIER)] != KTX2_IDENTIFIER:
+            raise ValueError("无效的KTX2文件: 文件标识不匹配")
+        (vk_format, _, width, height, depth, layer_count, face_count, level_count, supercompression,
+         *_) = KTX2_HEADER_STRUCT.unpack_from(mapped, len(KTX2_IDENTIFIER))
+
+        astc_format = KTX2_VK_FORMAT_TO_ASTC.get(vk_format)
+        if astc_format is None:
+            raise ValueError(f"不支持的KTX2格式: vkFormat {vk_format}，只支持 ASTC (LDR)")
+        if supercompression != 0:
+            raise ValueError(f"不支持使用超压缩的KTX2文件: supercompressionScheme {supercompression}")
+        if depth > 1 or face_count != 1:
+            raise ValueError("不支持3D纹理与立方体纹理")
+
+        image_count = max(layer_count, 1)
+        _check_ffab_limits(image_count, width, height)
+        level_offset, level_length, _ = KTX2_LEVEL_STRUCT.unpack_from(mapped, header_end)
+        frame_size = get_astc_frame_data_size(width, height, astc_format)
+        if level_length != frame_size * image_count or level_offset + level_length > len(mapped):
+            raise ValueError(f"无效的KTX2文件: level 0 数据长度 ({level_length}) 与尺寸、层数不符")
+
+        frames = [mapped[level_offset + i * frame_size:level_offset + (i + 1) * frame_size]
+                  for i in range(image_count)]
+
+    if level_count > 1:
+        print(f"提示: KTX2文件包含 {level_count} 个 mip level，只导入 level 0")
+    write_ffab_file_v1(output_path, width, height, astc_format, frames)
+
+
+def export_ffab(ffab_path: str, output: str, srgb: bool = False) -> None:
+    """导出FFAB文件，输出路径以 .ktx2 结尾时导出 KTX2 数组纹理，否则导出 `.astc` 文件到文件夹"""
+    if output.lower().endswith('.ktx2'):
+        export_ktx2(ffab_path, output, srgb)
+    else:
+        export_astc_files(ffab_path, output)
+
+
+def import_ffab(input_path: str, output_path: str) -> None:
+    """导入为FFAB文件，输入为 .ktx2 文件或包含 `.astc` 文件的文件夹"""
+    if input_path.lower().endswith('.ktx2'):
+        import_ktx2(input_path, output_path)
+    else:
+        import_astc_files(input_path, output_path)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='FFAB 与 .astc / KTX2 之间的无损转换工具（只复制压缩数据，不重新压缩）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='将FFAB文件导出为 .astc 文件或 KTX2 数组纹理')
+    export_parser.add_argument('input_file', help='输入的FFAB文件路径')
+    export_parser.add_argument('output', help='输出路径，以 .ktx2 结尾时导出 KTX2 数组纹理，否则为 .astc 文件的输出文件夹')
+    export_parser.add_argument('--srgb', action='store_true',
+                               help='KTX2 使用 VK_FORMAT_ASTC_*_SRGB_BLOCK 格式（默认：UNORM）')
+
+    import_parser = subparsers.add_parser('import', help='将 .astc 文件或 KTX2 纹理导入为FFAB文件')
+    import_parser.add_argument('input', help='输入的 .ktx2 文件，或包含 .astc 文件的文件夹')
+    import_parser.add_argument('output_file', help='输出的FFAB文件路径')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'export':
+            if not os.path.exists(args.input_file):
+                raise FileNotFoundError(f"文件不存在: {args.input_file}")
+            export_ffab(args.input_file, args.output, args.srgb)
+        else:
+            if not os.path.exists(args.input):
+                raise FileNotFoundError(f"输入路径不存在: {args.input}")
+            import_ffab(args.input, args.output_file)
+    except Exception as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 解码工具
+将FFAB格式文件解码成PNG图片序列，或RGBA原始数据、numpy数组、标准输出管道
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import tempfile
+
+# 尝试导入必要的库
+try:
+    from PIL import Image
+    import numpy as np
+except ImportError as e:
+    print(f"错误：缺少必要的依赖库 {e}")
+    print("请运行: pip install pillow numpy")
+    sys.exit(1)
+
+from .archive import extract_ffab_archive, is_ffab_archive, read_ffab_archive, read_ffab_member
+from .blocks import expand_sparse_frame
+from .encoder import TGA_MAX_DIMENSION, get_astc_encoder, plan_thread_budget
+from .format import get_astc_frame_data_size, generate_astc_header, preload_ffab, read_ffab
+
+# 输出格式
+# png: 每帧一张 PNG 图片 (frame_%04d.png)
+# raw: 所有帧的 RGBA 原始像素顺序拼接到一个文件
+# npy: 单个 (N, H, W, 4) uint8 numpy 数组文件，通过内存映射原地填充
+# pipe: RGBA 原始像素写入标准输出，可直接作为 ffmpeg rawvideo 输入
+OUTPUT_FORMATS = ('png', 'raw', 'npy', 'pipe')
+
+# 后台预解码的默认帧数（同时也是解码线程数），astcenc 为独立进程，线程池即可并行
+DEFAULT_PREFETCH = os.cpu_count() or 4
+
+# PNG 默认压缩级别，与 Pillow 默认值一致 (0-9，0 为不压缩，9 为最高压缩)
+DEFAULT_PNG_COMPRESS_LEVEL = 6
+
+
+def check_astc_decoder() -> bool:
+    """检查ASTC解码器是否可用（与编码使用同一个 astcenc，参考 get_astc_encoder）"""
+    return get_astc_encoder() is not None
+
+
+def decode_astc_data(compressed_data: bytes, width: int, height: int, astc_format: str,
+                     threads: Optional[int] = None) -> np.ndarray:
+    """
+    使用ASTC解码器解码图片数据
+
+    Args:
+        compressed_data: 压缩的ASTC数据
+        width: 图片宽度
+        height: 图片高度
+        astc_format: ASTC格式 (4x4, 5x4, 5x5, 6x5, 6x6, 8x5, 8x6, 8x8, 10x5, 10x6, 10x8, 10x10, 12x10, 12x12)
+        threads: astcenc 线程数 (-j)，为 None 时由 astcenc 使用全部 CPU
+
+    Returns:
+        解码后的numpy数组图像数据
+    """
+    # 使用 get_astc_encoder() 选择的 astcenc 可执行文件（如 astcenc-avx2），PATH 中可以没有 astcenc
+    encoder = get_astc_encoder()
+    if encoder is None:
+        raise RuntimeError("未找到ASTC解码器 (astcenc)")
+
+    # 生成ASTC文件头（16字节）
+    astc_header = generate_astc_header(width, height, astc_format)
+
+    # 创建临时工作文件夹
+    with tempfile.TemporaryDirectory(prefix='ffab_') as temp_dir:
+        # 将压缩数据写入临时文件，先写入ASTC头部，再写入压缩数据
+        astc_path = os.path.join(temp_dir, 'input.astc')
+        with open(astc_path, 'wb') as f:
+            f.write(astc_header)
+            f.write(compressed_data)
+
+        # 解码后的输出路径，输出未压缩的 TGA，避免 PNG 的 zlib 压缩与解压（宽度或高度超过 TGA 的上限时输出 PNG）
+        output_name = 'output.png' if max(width, height) > TGA_MAX_DIMENSION else 'output.tga'
+        output_path = os.path.join(temp_dir, output_name)
+
+        # 构建ASTC解码命令
+        # -dl decompress with linear LDR
+        cmd = [
+            encoder['path'],
+            '-dl', astc_path, output_path
+        ]
+        if threads is not None:
+            cmd.extend(['-j', str(threads)])
+
+        # 执行ASTC解码
+        result = subprocess.run(cmd, 
+                               stdout=subprocess.PIPE, 
+                               stderr=subprocess.PIPE,
+                               text=True)
+
+        if result.returncode != 0:
+            raise RuntimeError(f"ASTC解码失败: {result.stderr}")
+
+        # 读取解码后的图片
+        with Image.open(output_path) as img:
+            # 转换为RGBA格式（保持透明度）
+            img = img.convert('RGBA')
+            # 转换为numpy数组
+            img_array = np.array(img)
+
+        return img_array
+
+
+def read_ffab_file_info(file_path: str, member: Optional[str] = None) -> Dict[str, Any]:
+    """
+    读取并校验FFAB文件的文件头、Meta信息区与索引表
+
+    Args:
+        file_path: FFAB文件路径，或多动画归档 (.ffar) 路径
+        member: 归档中的动画名称，读取归档时必须指定
+
+    Returns:
+        ffab.format.read_ffab 的文件信息字典；读取归档时为 ffab.archive.read_ffab_member 的文件信息字典，
+        偏移量相对归档文件开头，可以直接读取归档文件
+
+    Raises:
+        ValueError: 如果文件格式无效、版本不支持或ASTC格式代码未知
+    """
+    if member is not None:
+        info = read_ffab_member(file_path, member)
+    elif is_ffab_archive(file_path):
+        names = read_ffab_archive(file_path)['names']
+        raise ValueError(f"多动画归档需要指定动画名称 (--member)，可用的动画: {', '.join(names)}")
+    else:
+        info = read_ffab(file_path)
+    if info['astc_format'] is None:
+        raise ValueError(f"未知的ASTC格式代码: 0x{info['astc_format_code']:04X}")
+    return info
+
+
+def read_compressed_image_data(file_path: str, offset: int, data_length: int) -> bytes:
+    """
+    读取压缩的图像数据
+
+    Args:
+        file_path: FFAB文件路径
+        offset: 数据偏移量
+        data_length: 数据长度
+
+    Returns:
+        压缩的图像数据
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        compressed_data = f.read(data_length)
+    return compressed_data
+
+
+def _iter_decoded_frames(file_path: str, offsets: Sequence[int], lengths: Sequence[int], width: int, height: int,
+                         astc_format: str, frames: Iterable[int], prefetch: int,
+                         sparse: bool = False,
+                         preload: Optional[Dict[str, int]] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    按 frames 顺序在后台线程池中预解码，并按顺序返回解码结果
+
+    同时在途（排队、解码中、已完成未被取走）的帧数不超过 prefetch，每个 astcenc 的线程数 (-j) 按 CPU 预算
+    除以 prefetch 计算（参考 plan_thread_budget），并行解码不会超额使用 CPU；
+    调用方提前结束迭代时，取消未开始的解码任务并等待解码线程退出。
+    sparse 为 True 时（版本2稀疏存储），读取的帧数据先按块位图还原为完整的块数据。
+    文件包含预加载扩展段时，打开文件后先对预加载前缀发起一次预读。
+    """
+    prefetch = max(1, prefetch)
+    _, astcenc_threads = plan_thread_budget(None, prefetch)
+    blocks_per_frame = get_astc_frame_data_size(width, height, astc_format) // 16
+    frame_iter = iter(frames)
+    pending = deque()
+
+    with open(file_path, 'rb') as f, \
+            ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix='ffab_decode') as executor:
+        preload_ffab(f.fileno(), preload)
+
+        def submit_next() -> bool:
+            i = next(frame_iter, None)
+            if i is None:
+                return False
+            if not (0 <= i < len(offsets)):
+                raise IndexError(f"帧序号超出范围: {i} (图片数量: {len(offsets)})")
+
+            # 在当前线程顺序读取压缩数据，解码线程只负责调用 astcenc
+            f.seek(offsets[i])
+            compressed_data = f.read(lengths[i])
+            if sparse:
+                compressed_data = expand_sparse_frame(compressed_data, blocks_per_frame)
+            pending.append((i, executor.submit(decode_astc_data, compressed_data, width, height, astc_format,
+                                                     astcenc_threads)))
+            return True
+
+        try:
+            while len(pending) < prefetch and submit_next():
+                pass
+
+            while pending:
+                i, future = pending.popleft()
+                img_array = future.result()
+                submit_next()
+                yield i, img_array
+        finally:
+            # 正常结束时 pending 为空；提前结束或异常时取消尚未开始的任务
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_frames(file_path: str, frames: Optional[Iterable[int]] = None,
+                prefetch: int = DEFAULT_PREFETCH, member: Optional[str] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    逐帧解码FFAB文件的生成器，不写入磁盘
+
+    在后台线程池中预先解码后续的帧，最多同时保留 prefetch 帧，按请求顺序返回。
+    调用方提前结束迭代（break 或 close()）时，后台解码线程会被正确关闭。
+
+    示例:
+        for i, img_array in iter_frames('animation.ffab', prefetch=4):
+            ...
+
+    Args:
+        file_path: FFAB文件路径
+        frames: 需要解码的帧序号序列（从 0 开始，可以乱序或重复），为 None 时按顺序解码全部帧
+        prefetch: 预解码的最大帧数，同时也是解码线程数
+        member: 多动画归档中的动画名称，file_path 为归档时必须指定
+
+    Returns:
+        (帧序号, RGBA numpy数组) 的迭代器，数组形状为 (高度, 宽度, 4)
+    """
+    # 读取文件头、Meta信息区与索引表
+    info = read_ffab_file_info(file_path, member)
+
+    if frames is None:
+        frames = range(info['image_count'])
+
+    yield from _iter_decoded_frames(file_path, info['offsets'], info['lengths'], info['width'], info['height'],
+                                    info['astc_format'], frames, prefetch, info['sparse'], info.get('preload'))
+
+
+def decode_ffab_file(file_path: str, output: str, output_format: str = 'png',
+                     compress_level: int = DEFAULT_PNG_COMPRESS_LEVEL, prefetch: int = DEFAULT_PREFETCH,
+                     progress: Optional[Callable[[int, int], None]] = None, member: Optional[str] = None) -> None:
+    """
+    解码FFAB文件到指定输出
+
+    Args:
+        file_path: FFAB文件路径
+        output: 输出路径。png 格式为输出文件夹；raw 与 npy 格式为输出文件；pipe 格式忽略此参数
+        output_format: 输出格式 (png, raw, npy, pipe)
+        compress_level: png 格式的压缩级别 (0-9)
+        prefetch: 并行解码的线程数
+        progress: 每一帧输出完成后调用 progress(已完成帧数, 总帧数)
+        member: 多动画归档中的动画名称，file_path 为归档时必须指定
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}")
+
+    # pipe 模式下标准输出用于图片数据，日志输出到标准错误
+    log_file = sys.stderr if output_format == 'pipe' else sys.stdout
+
+    # 读取文件头、Meta信息区与索引表
+    info = read_ffab_file_info(file_path, member)
+    version = info['version']
+    image_count, width, height = info['image_count'], info['width'], info['height']
+    astc_format = info['astc_format']
+
+    print(f"FFAB文件信息:", file=log_file)
+    if member is not None:
+        print(f"  动画名称: {member}", file=log_file)
+    print(f"  ffab 版本: 0x{version:04X}", file=log_file)
+    print(f"  图片数量: {image_count}", file=log_file)
+    print(f"  图片尺寸: {width}x{height}", file=log_file)
+    print(f"  ASTC格式: {astc_format}", file=log_file)
+    if info['sparse']:
+        print(f"  稀疏存储: 是", file=log_file)
+
+    # 根据输出格式准备输出目标
+    output_dir = None
+    raw_file = None
+    frames_array = None
+    if output_format == 'png':
+        # 确保输出文件夹存在
+        output_dir = Path(output)
+        output_dir.mkdir(parents=True, exist_ok=True)
+    elif output_format == 'raw':
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        raw_file = open(output, 'wb')
+    elif output_format == 'npy':
+        # 预先创建 (N, H, W, 4) 的内存映射数组，解码结果原地写入，不在内存中累积
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        frames_array = np.lib.format.open_memmap(output, mode='w+', dtype=np.uint8,
+                                                 shape=(image_count, height, width, 4))
+    else:
+        raw_file = sys.stdout.buffer
+
+    try:
+        # 在后台线程池中并行解码，按帧顺序写出
+        decoded_frames = _iter_decoded_frames(file_path, info['offsets'], info['lengths'], width, height, astc_format,
+                                              range(image_count), prefetch, info['sparse'], info.get('preload'))
+        for i, img_array in decoded_frames:
+            print(f"已解码第{i+1}/{image_count}张图片", file=log_file)
+
+            if output_format == 'png':
+                # 保存图片
+                output_filename = f"frame_{i:04d}.png"
+                img = Image.fromarray(img_array)
+                img.save(output_dir / output_filename, 'PNG', compress_level=compress_level)
+                print(f"已保存: {output_filename}", file=log_file)
+            elif output_format == 'npy':
+                frames_array[i] = img_array
+            else:
+                raw_file.write(np.ascontiguousarray(img_array).data)
+
+            if progress is not None:
+                progress(i + 1, image_count)
+    finally:
+        if frames_array is not None:
+            frames_array.flush()
+            del frames_array
+        if raw_file is not None:
+            if output_format == 'pipe':
+                raw_file.flush()
+            else:
+                raw_file.close()
+
+    if output_format == 'png':
+        print(f"\n解码完成！所有图片已保存到: {output}", file=log_file)
+    elif output_format == 'pipe':
+        print(f"\n解码完成！RGBA 数据已写入标准输出 ({width}x{height}, {image_count} 帧)", file=log_file)
+    else:
+        print(f"\n解码完成！RGBA 数据已保存到: {output} ({width}x{height}, {image_count} 帧)", file=log_file)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """构建解码工具的命令行参数解析器，命令行与编码常驻服务共用"""
+    parser = argparse.ArgumentParser(description='FFAB解码工具 - 将FFAB格式文件解码成PNG图片序列或RGBA原始数据')
+    parser.add_argument('input_file', help='输入的FFAB文件路径，或多动画归档 (.ffar) 路径')
+    parser.add_argument('output', nargs='?', default=None,
+                        help='输出路径：png 格式为图片文件夹，raw/npy 格式为输出文件，pipe 格式不需要；--extract 时为输出文件夹')
+    parser.add_argument('--member', default=None,
+                        help='解码多动画归档中指定名称的动画')
+    parser.add_argument('--extract', action='store_true',
+                        help='将多动画归档中的动画按原样解包为 .ffab 文件（不解码），指定 --member 时只解包该动画')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='png',
+                        help='输出格式 (默认: png)')
+    parser.add_argument('--compress-level', type=int, choices=range(0, 10), default=DEFAULT_PNG_COMPRESS_LEVEL,
+                        metavar='[0-9]', help=f'png 格式的压缩级别 (默认: {DEFAULT_PNG_COMPRESS_LEVEL})')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_PREFETCH,
+                        help=f'并行解码的线程数 (默认: {DEFAULT_PREFETCH})')
+    parser.add_argument('--socket', default=None,
+                        help='编码常驻服务的 Unix socket 路径，服务运行时由服务解码 (默认: $XDG_RUNTIME_DIR/ffab-encoder-<uid>.sock)')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='不连接编码常驻服务，直接在当前进程中解码')
+    return parser
+
+
+def main():
+    """
+    主函数
+    """
+    parser = build_arg_parser()
+    args = parser.parse_args()
+
+    # pipe 模式下标准输出用于图片数据，日志输出到标准错误
+    log_file = sys.stderr if args.output_format == 'pipe' else sys.stdout
+
+    if args.extract:
+        if args.output is None:
+            parser.error("--extract 需要指定输出文件夹")
+        try:
+            extract_ffab_archive(args.input_file, args.output, None if args.member is None else [args.member])
+        except Exception as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        return
+
+    if args.output_format != 'pipe' and args.output is None:
+        parser.error(f"{args.output_format} 格式需要指定输出路径")
+
+    try:
+        # 检查ASTC解码器是否可用
+        if not check_astc_decoder():
+            print("错误：未找到ASTC解码器 (astcenc)", file=log_file)
+            print("请从 https://github.com/ARM-software/astc-encoder 下载并安装", file=log_file)
+            sys.exit(1)
+
+        # 检查输入文件是否存在
+        if not os.path.exists(args.input_file):
+            raise FileNotFoundError(f"输入文件不存在: {args.input_file}")
+
+        # 解码FFAB文件
+        print(f"正在解码文件: {args.input_file}", file=log_file)
+        decode_ffab_file(args.input_file, args.output, args.output_format, args.compress_level, args.jobs,
+                         member=args.member)
+
+    except Exception as e:
+        print(f"错误: {e}", file=log_file)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,1765 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 编码工具
+将PNG或JPEG图片序列（图片文件夹、zip/tar 压缩包或视频文件）编码成FFAB格式文件
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import struct
+import shutil
+import tarfile
+import zipfile
+import asyncio
+import hashlib
+import argparse
+import functools
+import threading
+import contextlib
+import subprocess
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import tempfile
+
+try:
+    from PIL import Image
+    import numpy as np
+except ImportError as e:
+    print(f"错误：缺少必要的依赖库 {e}")
+    print("请运行: pip install pillow numpy")
+    sys.exit(1)
+
+from .blocks import compute_dirty_rects, frame_dirty_rects, pack_sparse_frame
+from .format import (
+    ASTC_FORMAT_CODES,
+    EXTENSION_DIRTY_RECTS,
+    FFAB_FLAG_CHECKSUMS,
+    FFAB_FLAG_SPARSE,
+    FFAB_MAGIC,
+    build_dirty_rects,
+    build_ffab_prefix,
+    check_astc_format,
+    finish_ffab_stream,
+    generate_astc_header,
+    get_astc_format_code,
+    get_astc_frame_data_size,
+    open_ffab_stream,
+    print_ffab_summary,
+    write_ffab_stream_frame,
+    write_ffab_file,
+    write_ffab_file_v1,
+)
+
+# astcenc 各 SIMD 版本的可执行文件名称，按速度从快到慢排列，第二项为需要的 CPU 指令集 (/proc/cpuinfo flags)
+# astcenc-native 为针对本机编译的版本；astcenc 为 PATH 中未标注指令集的版本，作为兜底
+ASTCENC_BUILDS = (
+    ('astcenc-native', None),
+    ('astcenc-avx2', 'avx2'),
+    ('astcenc-sse4.1', 'sse4_1'),
+    ('astcenc-sse2', 'sse2'),
+    ('astcenc-neon', None),
+    ('astcenc', None),
+)
+
+# astcenc 速度预设，从快到慢，对应命令行参数 -fastest ... -exhaustive
+ASTC_QUALITY_PRESETS = ('fastest', 'fast', 'medium', 'thorough', 'verythorough', 'exhaustive')
+
+# 自适应质量模式下的候选压缩质量，从低（快）到高（慢），每一帧在其中二分查找
+ADAPTIVE_QUALITY_LEVELS = (0.0, 10.0, 20.0, 40.0, 60.0, 80.0, 98.0, 100.0)
+
+# 自适应质量模式下用于估算节省时间的固定高质量，对应 -thorough
+DEFAULT_REFERENCE_QUALITY = 98.0
+
+# 自适应质量模式下测量固定高质量耗时的采样帧数
+DEFAULT_REFERENCE_SAMPLES = 3
+
+# astcenc 探测结果缓存文件，避免每次运行都调用 astcenc -help
+ASTCENC_CACHE_PATH = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'ffab' / 'astcenc.json'
+
+# 支持的图片格式
+SUPPORTED_FORMATS = ('.png', '.jpg', '.jpeg')
+
+# astcenc 的输入与解码输出使用未压缩的 32 位 TGA，astcenc 直接读写像素，不需要逐帧 PNG 压缩与解压
+# TGA 文件头（18字节，小端序）: ID长度 + 颜色表类型 + 图像类型(2: 未压缩真彩色) + 颜色表信息(5字节)
+# + 原点 x, y + 宽度 + 高度 + 像素位数(32) + 图像描述符(0x28: 8 位 alpha，原点在左上角)，之后为 BGRA 像素
+TGA_HEADER_STRUCT = struct.Struct('<BBBHHBHHHHBB')
+TGA_MAX_DIMENSION = 0xFFFF
+
+# 输出到标准输出的文件路径（单遍写出）
+STDOUT_PATH = '-'
+
+# 支持直接输入的视频格式，通过 ffmpeg rawvideo 管道读取帧数据
+SUPPORTED_VIDEO_FORMATS = ('.mp4', '.mov', '.mkv', '.webm', '.avi', '.gif')
+
+# 支持直接输入的图片压缩包格式，不解压到磁盘，直接读取压缩包中的图片
+SUPPORTED_ARCHIVE_FORMATS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# Android 密度分组与相对 mdpi 的缩放比例，用于生成密度变体
+DENSITY_SCALES = {'mdpi': 1.0, 'hdpi': 1.5, 'xhdpi': 2.0, 'xxhdpi': 3.0, 'xxxhdpi': 4.0}
+
+# 源图片默认对应的密度分组（动画通常按最高密度绘制）
+DEFAULT_SOURCE_DENSITY = 'xxxhdpi'
+
+# 默认的播放顺序：按帧序号顺序播放，帧数据按帧序号顺序存储
+PLAYBACK_ORDER_SEQUENTIAL = 'sequential'
+PLAYBACK_ORDER_REVERSE = 'reverse'
+
+
+def _read_cpu_flags() -> Optional[set]:
+    """读取 CPU 支持的指令集，无法读取时（非 Linux）返回 None"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return set(line.split(':', 1)[1].split())
+    except OSError:
+        pass
+    return None
+
+
+def _astcenc_candidates() -> List[Tuple[str, str]]:
+    """查找 PATH 中存在的 astcenc 可执行文件，返回 (名称, 路径) 列表，按速度从快到慢排列"""
+    cpu_flags = _read_cpu_flags()
+    candidates = []
+    for name, required_flag in ASTCENC_BUILDS:
+        path = shutil.which(name)
+        if path is None:
+            continue
+        if required_flag is not None and cpu_flags is not None and required_flag not in cpu_flags:
+            continue
+        candidates.append((name, path))
+    return candidates
+
+
+def _probe_astcenc(path: str) -> bool:
+    """运行 astcenc -help 确认可执行文件可用（指令集不受支持的版本会启动失败）"""
+    try:
+        result = subprocess.run([path, '-help'],
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               text=True)
+        return result.returncode == 0
+    except OSError:
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def get_astc_encoder() -> Optional[Dict[str, str]]:
+    """
+    选择可用的最快 astcenc 版本
+
+    探测结果按候选可执行文件的路径、大小与修改时间缓存到 ASTCENC_CACHE_PATH，
+    候选文件不变时直接使用缓存，不再调用 astcenc -help。
+
+    Returns:
+        {'name': 可执行文件名称, 'path': 可执行文件路径}，没有可用的 astcenc 时返回 None
+    """
+    candidates = _astcenc_candidates()
+    cache_key = []
+    for name, path in candidates:
+        stat = os.stat(path)
+        cache_key.append([name, path, stat.st_size, int(stat.st_mtime)])
+
+    try:
+        with open(ASTCENC_CACHE_PATH) as f:
+            cache = json.load(f)
+        if cache.get('key') == cache_key:
+            return cache.get('encoder')
+    except (OSError, ValueError):
+        pass
+
+    encoder = None
+    for name, path in candidates:
+        if _probe_astcenc(path):
+            encoder = {'name': name, 'path': path}
+            break
+
+    try:
+        ASTCENC_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(ASTCENC_CACHE_PATH, 'w') as f:
+            json.dump({'key': cache_key, 'encoder': encoder}, f)
+    except OSError:
+        # 缓存写入失败不影响编码
+        pass
+
+    return encoder
+
+
+def check_astc_encoder() -> bool:
+    """检查ASTC编码器是否可用"""
+    return get_astc_encoder() is not None
+
+
+def get_cpu_budget() -> int:
+    """
+    获取当前进程可用的 CPU 数量
+
+    综合考虑 CPU 亲和性与 cgroup 配额（v2: cpu.max，v1: cpu.cfs_quota_us / cpu.cfs_period_us），
+    容器中运行时不会超出配额。
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        budget = len(os.sched_getaffinity(0))
+    else:
+        budget = os.cpu_count() or 1
+
+    quota = period = None
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            fields = f.read().split()
+        if fields and fields[0] != 'max':
+            quota, period = int(fields[0]), int(fields[1])
+    except (OSError, ValueError, IndexError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+        except (OSError, ValueError):
+            quota = period = None
+
+    if quota is not None and period and quota > 0:
+        budget = min(budget, -(-quota // period))
+
+    return max(1, budget)
+
+
+def plan_thread_budget(frame_count: Optional[int] = None, jobs: Optional[int] = None,
+                       cpu_budget: Optional[int] = None) -> Tuple[int, int]:
+    """
+    在帧级并行与 astcenc -j 之间分配 CPU 预算，避免两者叠加造成 CPU 超额使用
+
+    帧级并行的效率高于 astcenc 单图内部的多线程，因此优先分配给并行帧，剩余的 CPU 再分配给 astcenc -j。
+
+    Args:
+        frame_count: 帧数量，为 None 时视为足够多
+        jobs: 指定的并行帧数量，为 None 时自动计算
+        cpu_budget: CPU 预算，为 None 时使用 get_cpu_budget()
+
+    Returns:
+        (并行帧数量, 每个 astcenc 进程的线程数)
+    """
+    budget = cpu_budget or get_cpu_budget()
+    workers = jobs or budget
+    if frame_count is not None:
+        workers = min(workers, frame_count)
+    workers = max(1, workers)
+    astcenc_threads = max(1, budget // workers)
+    return workers, astcenc_threads
+
+
+def format_astc_quality(quality: Union[float, str]) -> str:
+    """将压缩质量转换为 astcenc 命令行参数，速度预设转换为 -fastest 等形式"""
+    if isinstance(quality, str):
+        if quality not in ASTC_QUALITY_PRESETS:
+            raise ValueError(f"无效的ASTC速度预设: {quality}")
+        return f'-{quality}'
+    return str(quality)
+
+
+def build_astcenc_compress_command(input_path: str, output_path: str, astc_format: str,
+                                   quality: Union[float, str], threads: Optional[int] = None) -> List[str]:
+    """构建 astcenc 压缩命令，使用 get_astc_encoder() 选择的可执行文件"""
+    encoder = get_astc_encoder()
+    if encoder is None:
+        raise RuntimeError("未找到ASTC编码器 (astcenc)")
+
+    cmd = [encoder['path'], '-cl', input_path, output_path, astc_format, format_astc_quality(quality)]
+    if threads is not None:
+        cmd += ['-j', str(threads)]
+    return cmd
+
+
+def check_ffmpeg() -> bool:
+    """检查ffmpeg与ffprobe是否可用"""
+    try:
+        for tool in ('ffmpeg', 'ffprobe'):
+            result = subprocess.run([tool, '-version'],
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   text=True)
+            if result.returncode != 0:
+                return False
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def write_astcenc_input(temp_dir: str, img_data: np.ndarray) -> str:
+    """
+    将 RGBA 图片写入临时文件夹，作为 astcenc 的输入，返回输入文件路径
+
+    写入未压缩的 TGA（只交换 R、B 通道），宽度或高度超过 TGA 的上限 (65535) 时写入 PNG。
+
+    Args:
+        temp_dir: 临时文件夹
+        img_data: (高, 宽, 4) 的 RGBA 图片数据
+    """
+    height, width = img_data.shape[:2]
+    if max(width, height) > TGA_MAX_DIMENSION:
+        input_path = os.path.join(temp_dir, 'input.png')
+        Image.fromarray(img_data).save(input_path, 'PNG')
+        return input_path
+
+    input_path = os.path.join(temp_dir, 'input.tga')
+    with open(input_path, 'wb') as f:
+        f.write(TGA_HEADER_STRUCT.pack(0, 0, 2, 0, 0, 0, 0, 0, width, height, 32, 0x28))
+        f.write(img_data[..., [2, 1, 0, 3]].tobytes())
+    return input_path
+
+
+def compress_with_astc(img_data: np.ndarray, astc_format: str, quality: Union[float, str],
+                       threads: Optional[int] = None) -> bytes:
+    """
+    使用ASTC编码器压缩图片
+
+    Args:
+        img_data: 图片数据
+        astc_format: ASTC压缩格式 (4x4, 5x4, 5x5, 6x5, 6x6, 8x5, 8x6, 8x8, 10x5, 10x6, 10x8, 10x10, 12x10, 12x12)
+        quality: 压缩质量 (0.0 - 100.0)，或速度预设 (fastest, fast, medium, thorough, verythorough, exhaustive)
+        threads: astcenc 线程数 (-j)，为 None 时由 astcenc 使用全部 CPU
+
+    Returns:
+        压缩后的数据
+    """
+    # 创建临时工作文件夹
+    with tempfile.TemporaryDirectory(prefix='ffab_') as temp_dir:
+        # 将 img_data 写入未压缩的输入文件
+        input_path = write_astcenc_input(temp_dir, img_data)
+
+        # 使用 astcenc 编码器压缩输入文件
+        output_path = os.path.join(temp_dir, 'output.astc')
+
+        # 构建ASTC编码命令
+        cmd = build_astcenc_compress_command(input_path, output_path, astc_format, quality, threads)
+
+        # 执行ASTC编码
+        result = subprocess.run(cmd, 
+                               stdout=subprocess.PIPE, 
+                               stderr=subprocess.PIPE,
+                               text=True)
+
+        if result.returncode != 0:
+            raise RuntimeError(f"ASTC编码失败: {result.stderr} ${result.stdout}")
+
+        # 读取 output.astc 文件内容，作为压缩后的数据返回
+        with open(output_path, 'rb') as f:
+            compressed_data = f.read()
+
+        return compressed_data
+    # 临时工作文件夹会在 with 块结束后自动清理
+
+
+def load_images_from_folder(folder_path: str) -> List[Tuple[str, np.ndarray]]:
+    """
+    从文件夹加载所有图片，如果遇到不识别的图片或文件、文件夹为空，会抛出异常。
+
+    Args:
+        folder_path: 图片文件夹路径
+
+    Returns:
+        图片文件名和numpy数组数据的列表
+    """
+    images = []
+    folder = Path(folder_path)
+
+    if not folder.exists():
+        raise FileNotFoundError(f"文件夹不存在: {folder_path}")
+
+    image_files = []
+
+    # 遍历文件夹的所有文件，如果文件不是支持的图片格式，抛出异常，否则添加到列表中
+    for file in folder.iterdir():
+        if file.suffix.lower() not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的图片格式: {file.name}")
+        else:
+            image_files.append(file)
+
+    # 对图片文件列表按名称排序
+    image_files = sorted(image_files)
+
+    if not image_files:
+        raise ValueError(f"文件夹中没有找到支持的图片格式: {SUPPORTED_FORMATS}")
+
+    # 遍历 image_files，加载图片并添加到列表中
+    for img_file in image_files:
+        try:
+            with Image.open(img_file) as img:
+                # 转换为RGBA格式（保持透明度）
+                img = img.convert('RGBA')
+                # 转换为numpy数组
+                img_array = np.array(img)
+
+                images.append((img_file.name, img_array))
+                print(f"已加载: {img_file.name} ({img_array.shape})")
+        except Exception as e:
+            raise RuntimeError(f"无法加载图片 {img_file.name}: {e}")
+
+    return images
+
+
+def is_archive_file(path: str) -> bool:
+    """判断输入路径是否为支持的图片压缩包"""
+    return Path(path).is_file() and path.lower().endswith(SUPPORTED_ARCHIVE_FORMATS)
+
+
+def _is_archive_frame(member_name: str) -> bool:
+    """
+    判断压缩包中的文件是否为帧图片，忽略隐藏文件与 macOS 生成的 __MACOSX 目录，
+    其他不支持的文件与文件夹输入一样抛出异常
+    """
+    parts = member_name.split('/')
+    if parts[0] == '__MACOSX' or any(part.startswith('.') for part in parts if part):
+        return False
+    if Path(member_name).suffix.lower() not in SUPPORTED_FORMATS:
+        raise ValueError(f"不支持的图片格式: {member_name}")
+    return True
+
+
+def _decode_image_bytes(name: str, data: bytes) -> np.ndarray:
+    """解码压缩包中读取的图片数据为 RGBA numpy 数组"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return np.array(img.convert('RGBA'))
+    except Exception as e:
+        raise RuntimeError(f"无法加载图片 {name}: {e}")
+
+
+def _iter_archive_members(archive_path: str) -> Iterator[Tuple[str, bytes]]:
+    """按压缩包中的存储顺序逐个读取帧图片的名称与数据"""
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_archive_frame(info.filename):
+                    yield info.filename, archive.read(info)
+        return
+
+    # 流式读取 tar（包括 gzip/bz2/xz 压缩），只顺序读取一遍，不需要在压缩流中回退
+    with tarfile.open(archive_path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and _is_archive_frame(member.name):
+                yield member.name, archive.extractfile(member).read()
+
+
+def load_images_from_archive(archive_path: str, jobs: Optional[int] = None) -> List[Tuple[str, np.ndarray]]:
+    """
+    从 zip 或 tar 压缩包加载所有图片，不解压到磁盘，规则与 load_images_from_folder 相同。
+
+    压缩包在当前线程中顺序读取，图片解码在线程池中进行（PNG 的 zlib 解压与 JPEG 解码会释放 GIL），
+    读取与解码同时进行。图片按压缩包中的完整路径排序。
+
+    Args:
+        archive_path: 压缩包路径
+        jobs: 解码线程数，为 None 时使用CPU预算
+
+    Returns:
+        图片名称和numpy数组数据的列表
+    """
+    if not Path(archive_path).is_file():
+        raise FileNotFoundError(f"压缩包不存在: {archive_path}")
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=jobs or get_cpu_budget(), thread_name_prefix='ffab_archive') as executor:
+        try:
+            for name, data in _iter_archive_members(archive_path):
+                pending[name] = executor.submit(_decode_image_bytes, name, data)
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            raise RuntimeError(f"无法读取压缩包 {archive_path}: {e}")
+
+        if not pending:
+            raise ValueError(f"压缩包中没有找到支持的图片格式: {SUPPORTED_FORMATS}")
+
+        images = []
+        for name in sorted(pending):
+            img_array = pending[name].result()
+            images.append((name, img_array))
+            print(f"已加载: {name} ({img_array.shape})")
+
+    return images
+
+
+def is_video_file(path: str) -> bool:
+    """判断输入路径是否为支持的视频文件"""
+    return Path(path).is_file() and Path(path).suffix.lower() in SUPPORTED_VIDEO_FORMATS
+
+
+def probe_video_size(video_path: str) -> Tuple[int, int]:
+    """
+    使用 ffprobe 获取视频第一条视频流的宽度和高度
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        视频的宽度和高度
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height',
+        '-of', 'csv=p=0:s=x',
+        video_path
+    ]
+
+    result = subprocess.run(cmd,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE,
+                           text=True)
+
+    if result.returncode != 0:
+        raise RuntimeError(f"无法读取视频信息: {result.stderr}")
+
+    try:
+        width, height = map(int, result.stdout.strip().split('x')[:2])
+    except ValueError:
+        raise RuntimeError(f"无法解析视频尺寸: {result.stdout.strip()}")
+
+    return width, height
+
+
+def _read_exact_into(stream, buffer: memoryview) -> int:
+    """从流中读取数据填满 buffer，返回实际读取的字节数（小于 buffer 长度表示流已结束）"""
+    total = 0
+    while total < len(buffer):
+        n = stream.readinto(buffer[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+
+def iter_frames_from_video(video_path: str,
+                           fps: Optional[float] = None,
+                           start: Optional[str] = None,
+                           duration: Optional[str] = None) -> Iterator[Tuple[str, np.ndarray]]:
+    """
+    通过 ffmpeg rawvideo 管道逐帧读取视频，不产生任何中间图片文件。
+
+    ffmpeg 将每一帧以 RGBA 原始像素写入 stdout，直接读入可复用的 numpy 缓冲区。
+    注意：生成器每次返回的是同一块缓冲区，调用方需要在获取下一帧之前处理完当前帧（或自行拷贝）。
+
+    Args:
+        video_path: 视频文件路径
+        fps: 输出帧率，为 None 时保持视频原始帧率
+        start: 起始时间（秒数或 ffmpeg 时间格式，如 00:00:01.5），为 None 时从头开始
+        duration: 截取时长（秒数或 ffmpeg 时间格式），为 None 时读取到视频结尾
+
+    Returns:
+        帧名称和numpy数组数据的迭代器
+    """
+    width, height = probe_video_size(video_path)
+
+    cmd = ['ffmpeg', '-v', 'error', '-nostdin']
+    # -ss 放在 -i 之前，使用输入端快速定位
+    if start is not None:
+        cmd += ['-ss', str(start)]
+    if duration is not None:
+        cmd += ['-t', str(duration)]
+    # 禁用自动旋转，保证输出帧尺寸与 ffprobe 读取到的视频流尺寸一致
+    cmd += ['-noautorotate', '-i', video_path]
+    if fps is not None:
+        cmd += ['-vf', f'fps={fps}']
+    cmd += ['-f', 'rawvideo', '-pix_fmt', 'rgba', '-']
+
+    frame_buffer = np.empty((height, width, 4), dtype=np.uint8)
+    frame_view = memoryview(frame_buffer).cast('B')
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    finished = False
+    try:
+        index = 0
+        while True:
+            n = _read_exact_into(process.stdout, frame_view)
+            if n == 0:
+                break
+            if n != len(frame_view):
+                raise RuntimeError(f"视频帧数据不完整: 期望 {len(frame_view)} 字节, 实际 {n} 字节")
+
+            index += 1
+            yield f"frame_{index:04d}", frame_buffer
+
+        finished = True
+    finally:
+        if not finished:
+            # 调用方提前结束或发生异常，终止 ffmpeg 进程
+            process.kill()
+        process.stdout.close()
+        stderr = process.stderr.read().decode('utf-8', errors='replace')
+        process.stderr.close()
+        returncode = process.wait()
+
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg 读取视频失败: {stderr}")
+    if index == 0:
+        raise ValueError(f"视频中没有读取到任何帧: {video_path}")
+
+
+def check_images_dimensions(images: List[Tuple[str, np.ndarray]]) -> Tuple[int, int]:
+    """
+    检查所有图片的尺寸是否一致
+
+    Args:
+        images: 图片列表
+
+    Returns:
+        图片的宽度和高度
+
+    Raises:
+        ValueError: 如果图片尺寸不一致
+    """
+    if not images:
+        raise ValueError("没有可用的图片")
+
+    first_img_name, first_img_data = images[0]
+    height, width = first_img_data.shape[:2]
+
+    for img_name, img_data in images[1:]:
+        h, w = img_data.shape[:2]
+        if h != height or w != width:
+            raise ValueError(f"图片尺寸不一致: {first_img_name} ({width}x{height}) vs {img_name} ({w}x{h})")
+
+    return width, height
+
+
+def compress_frame(img_name: str, img_data: np.ndarray, astc_header: bytes, astc_format: str,
+                   quality: Union[float, str], threads: Optional[int] = None) -> bytes:
+    """
+    压缩单帧图片，并校验、去除 `.astc` header
+
+    Args:
+        img_name: 图片名称（用于日志与错误信息）
+        img_data: 图片数据
+        astc_header: 根据 meta 信息生成的 `.astc` header (16字节)
+        astc_format: ASTC格式
+        quality: ASTC压缩质量 (0.0-100.0) 或速度预设
+        threads: astcenc 线程数 (-j)
+
+    Returns:
+        不包括 astc header 的压缩数据
+    """
+    # 使用ASTC编码器压缩图片
+    astc_compressed_data = compress_with_astc(img_data, astc_format, quality, threads)
+
+    # 对比压缩数据的前 16 个字节是否与 astc_header 相同
+    # https://github.com/ARM-software/astc-encoder/blob/main/Docs/FileFormat.md
+    # .astc 文件的前 16 个字节是文件头
+    if astc_compressed_data[:16] != astc_header:
+        raise ValueError(f"图片 {img_name} 的 ASTC 压缩数据前 16 个字节与 astc_header 不匹配")
+
+    # 返回实际压缩数据（不包括 astc header）
+    return astc_compressed_data[16:]
+
+
+def compute_psnr(original: np.ndarray, decoded: np.ndarray) -> Tuple[float, float]:
+    """
+    使用 numpy 向量化计算两张 RGBA 图片的 PSNR 与 RMSE（包含 alpha 通道）
+
+    Returns:
+        (PSNR dB, RMSE)，两张图片完全一致时 PSNR 为 inf
+    """
+    diff = original.astype(np.int16) - decoded.astype(np.int16)
+    mse = float(np.mean(np.square(diff, dtype=np.int32), dtype=np.float64))
+    psnr = math.inf if mse == 0 else 10.0 * math.log10(255.0 * 255.0 / mse)
+    return psnr, math.sqrt(mse)
+
+
+def compress_frame_adaptive(img_name: str, img_data: np.ndarray, astc_header: bytes, astc_format: str,
+                            min_psnr: Optional[float] = None, max_rmse: Optional[float] = None,
+                            threads: Optional[int] = None,
+                            reference_quality: Optional[float] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    在 ADAPTIVE_QUALITY_LEVELS 中二分查找满足质量目标的最低（最快）压缩质量，返回该质量的压缩结果
+
+    ASTC 压缩数据的长度只由块格式决定，质量参数只影响压缩耗时与还原效果，
+    因此每一帧使用满足目标的最低质量即可。还原效果随质量提高而提高，按二分查找每一帧约尝试 3 次
+    （8 个候选质量），每次尝试都会解码压缩结果，并与原图向量化对比。
+    更低的质量都无法满足目标时，使用最高质量的结果。
+
+    Args:
+        img_name: 图片名称（用于错误信息）
+        img_data: 图片数据
+        astc_header: 根据 meta 信息生成的 `.astc` header (16字节)
+        astc_format: ASTC格式
+        min_psnr: 最低 PSNR (dB)
+        max_rmse: 最大均方根误差 RMSE，单位为 8 位通道值 (0-255)，对所有像素的 RGBA 通道计算
+        threads: astcenc 线程数 (-j)
+        reference_quality: 不为 None 时额外以该质量压缩一次，记录耗时，用于估算固定高质量的总耗时
+
+    Returns:
+        (不包括 astc header 的压缩数据, 统计信息字典)
+    """
+    encoder = get_astc_encoder()
+    if encoder is None:
+        raise RuntimeError("未找到ASTC编码器 (astcenc)")
+    encoder_path = encoder['path']
+    stats = {'name': img_name, 'attempts': 0, 'met': False}
+    start_time = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(prefix='ffab_') as temp_dir:
+        # 输入图片只写入一次，供所有质量尝试复用；解码结果同样输出为未压缩的 TGA
+        input_path = write_astcenc_input(temp_dir, img_data)
+        astc_path = os.path.join(temp_dir, 'output.astc')
+        decoded_path = os.path.join(temp_dir, 'decoded.tga' if input_path.endswith('.tga') else 'decoded.png')
+
+        def run(cmd: List[str]) -> None:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"ASTC处理失败: {result.stderr} {result.stdout}")
+
+        # 每个已尝试质量的结果：序号 -> (压缩数据, PSNR, RMSE, 是否满足目标)
+        attempts = {}
+
+        def attempt(level: int) -> bool:
+            quality = ADAPTIVE_QUALITY_LEVELS[level]
+            run(build_astcenc_compress_command(input_path, astc_path, astc_format, quality, threads))
+            run([encoder_path, '-dl', astc_path, decoded_path])
+
+            with open(astc_path, 'rb') as f:
+                compressed = f.read()
+            with Image.open(decoded_path) as img:
+                decoded = np.asarray(img.convert('RGBA'))
+
+            psnr, rmse = compute_psnr(img_data, decoded)
+            met = (min_psnr is None or psnr >= min_psnr) and (max_rmse is None or rmse <= max_rmse)
+            attempts[level] = (compressed, psnr, rmse, met)
+            return met
+
+        # 二分查找满足目标的最低质量，找不到时为最高质量
+        low, high = 0, len(ADAPTIVE_QUALITY_LEVELS) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if attempt(middle):
+                high = middle
+            else:
+                low = middle + 1
+        if low not in attempts:
+            attempt(low)
+
+        astc_compressed_data, psnr, rmse, met = attempts[low]
+        stats.update(attempts=len(attempts), quality=ADAPTIVE_QUALITY_LEVELS[low], psnr=psnr, rmse=rmse, met=met)
+
+        stats['seconds'] = time.perf_counter() - start_time
+
+        if reference_quality is not None:
+            reference_start = time.perf_counter()
+            run(build_astcenc_compress_command(input_path, astc_path, astc_format, reference_quality, threads))
+            stats['reference_seconds'] = time.perf_counter() - reference_start
+
+    if astc_compressed_data[:16] != astc_header:
+        raise ValueError(f"图片 {img_name} 的 ASTC 压缩数据前 16 个字节与 astc_header 不匹配")
+
+    return astc_compressed_data[16:], stats
+
+
+def print_adaptive_quality_report(frame_stats: List[Dict[str, Any]], reference_quality: float) -> None:
+    """打印自适应质量模式的统计报告，包括每种质量的帧数与相对固定高质量的耗时估算"""
+    print(f"\n自适应质量统计:")
+    quality_counts = {}
+    for stats in frame_stats:
+        quality_counts[stats['quality']] = quality_counts.get(stats['quality'], 0) + 1
+    for quality in sorted(quality_counts):
+        print(f"  质量 {quality:g}: {quality_counts[quality]} 帧")
+
+    unmet = [stats['name'] for stats in frame_stats if not stats['met']]
+    if unmet:
+        print(f"  未达到质量目标（已使用最高质量）: {', '.join(unmet)}")
+
+    finite_psnr = [stats['psnr'] for stats in frame_stats if math.isfinite(stats['psnr'])]
+    if finite_psnr:
+        print(f"  最低 PSNR: {min(finite_psnr):.2f} dB, 平均 PSNR: {sum(finite_psnr) / len(finite_psnr):.2f} dB")
+
+    adaptive_seconds = sum(stats['seconds'] for stats in frame_stats)
+    reference_samples = [stats['reference_seconds'] for stats in frame_stats if 'reference_seconds' in stats]
+    print(f"  自适应压缩累计耗时: {adaptive_seconds:.2f} 秒（包括每次尝试的压缩与解码）")
+    if reference_samples:
+        reference_seconds = sum(reference_samples) / len(reference_samples) * len(frame_stats)
+        print(f"  固定质量 {reference_quality:g} 估算累计耗时: {reference_seconds:.2f} 秒（基于 {len(reference_samples)} 帧采样）")
+        if reference_seconds > 0:
+            saved = reference_seconds - adaptive_seconds
+            print(f"  节省: {saved:.2f} 秒 ({saved / reference_seconds * 100:.1f}%)")
+
+
+def create_frame_cache(max_bytes: int) -> Dict[str, Any]:
+    """
+    创建压缩帧缓存（LRU），以帧像素内容、尺寸、ASTC格式与压缩质量为键，缓存不包括 astc header 的压缩数据
+
+    Args:
+        max_bytes: 缓存的压缩数据总字节数上限
+
+    Returns:
+        缓存字典，通过 frame_cache_get / frame_cache_put 访问，可在多个线程间共享
+    """
+    return {'entries': OrderedDict(), 'size': 0, 'max_bytes': max_bytes, 'lock': threading.Lock(),
+            'hits': 0, 'misses': 0}
+
+
+def frame_cache_key(img_data: np.ndarray, astc_format: str, quality: Union[float, str]) -> str:
+    """计算帧在压缩帧缓存中的键"""
+    digest = hashlib.sha256(np.ascontiguousarray(img_data).data).hexdigest()
+    h, w = img_data.shape[:2]
+    return f'{digest}:{w}x{h}:{astc_format}:{format_astc_quality(quality)}'
+
+
+def frame_cache_get(cache: Dict[str, Any], key: str) -> Optional[bytes]:
+    """从压缩帧缓存中读取压缩数据，未命中时返回 None"""
+    with cache['lock']:
+        data = cache['entries'].get(key)
+        if data is None:
+            cache['misses'] += 1
+            return None
+        cache['entries'].move_to_end(key)
+        cache['hits'] += 1
+        return data
+
+
+def frame_cache_put(cache: Dict[str, Any], key: str, data: bytes) -> None:
+    """写入压缩帧缓存，超出容量时淘汰最久未使用的帧"""
+    if len(data) > cache['max_bytes']:
+        return
+    with cache['lock']:
+        if key in cache['entries']:
+            cache['entries'].move_to_end(key)
+            return
+        cache['entries'][key] = data
+        cache['size'] += len(data)
+        while cache['size'] > cache['max_bytes']:
+            _, evicted = cache['entries'].popitem(last=False)
+            cache['size'] -= len(evicted)
+
+
+def get_block_grid(width: int, height: int, astc_format: str) -> Tuple[int, int]:
+    """返回每行与每列的块数"""
+    block_x, block_y = map(int, astc_format.split('x'))
+    return (width + block_x - 1) // block_x, (height + block_y - 1) // block_y
+
+
+def print_dirty_rects_stats(dirty_rects: List[List[Tuple[int, int, int, int]]], blocks_x: int, blocks_y: int) -> None:
+    """打印脏矩形的平均数量与覆盖的块比例"""
+    dirty_blocks = sum(w * h for rects in dirty_rects for _, _, w, h in rects)
+    total_blocks = blocks_x * blocks_y * len(dirty_rects)
+    print(f"\n脏矩形: 平均每帧 {sum(map(len, dirty_rects)) / len(dirty_rects):.1f} 个, "
+          f"覆盖 {dirty_blocks / total_blocks * 100:.1f}% 的块")
+
+
+def get_dirty_rects(compressed_frames: List[bytes], width: int, height: int,
+                    astc_format: str) -> List[List[Tuple[int, int, int, int]]]:
+    """计算每一帧相对上一帧的脏矩形并打印变化区域的占比，参考 compute_dirty_rects"""
+    blocks_x, blocks_y = get_block_grid(width, height, astc_format)
+    dirty_rects = compute_dirty_rects(compressed_frames, blocks_x, blocks_y)
+    print_dirty_rects_stats(dirty_rects, blocks_x, blocks_y)
+    return dirty_rects
+
+
+def open_frame_stream(stream: BinaryIO, width: int, height: int, astc_format: str, sparse: bool = False,
+                      dirty_rects: bool = False, checksums: bool = False) -> Dict[str, Any]:
+    """
+    开始单遍写出压缩帧（索引表位于文件末尾，参考 ffab.format.open_ffab_stream）
+
+    每一帧写出后只保留脏矩形计算需要的第一帧与上一帧。
+
+    Args:
+        stream: 二进制输出流（文件、管道、标准输出）
+        width: 图片宽度
+        height: 图片高度
+        astc_format: ASTC格式
+        sparse: 是否使用稀疏存储
+        dirty_rects: 是否写入脏矩形扩展段
+        checksums: 是否写入校验和表
+
+    Returns:
+        写出状态，传给 write_stream_frame 与 finish_frame_stream
+    """
+    flags = (FFAB_FLAG_SPARSE if sparse else 0) | (FFAB_FLAG_CHECKSUMS if checksums else 0)
+    return {
+        'writer': open_ffab_stream(stream, width, height, astc_format, flags),
+        'sparse': sparse,
+        'block_grid': get_block_grid(width, height, astc_format),
+        'dirty_rects': [] if dirty_rects else None,
+        'first': None,
+        'previous': None,
+        'full_size': 0,
+        'stored_size': 0,
+    }
+
+
+def write_stream_frame(state: Dict[str, Any], compressed_data: bytes) -> None:
+    """写出一帧不包括 astc header 的压缩数据，稀疏存储时先打包"""
+    if state['dirty_rects'] is not None:
+        if state['first'] is None:
+            # 第 0 帧与最后一帧比较，写出结束时计算
+            state['first'] = compressed_data
+            state['dirty_rects'].append([])
+        else:
+            state['dirty_rects'].append(frame_dirty_rects(compressed_data, state['previous'], *state['block_grid']))
+        state['previous'] = compressed_data
+
+    stored_data = pack_sparse_frame(compressed_data) if state['sparse'] else compressed_data
+    state['full_size'] += len(compressed_data)
+    state['stored_size'] += len(stored_data)
+    write_ffab_stream_frame(state['writer'], stored_data)
+
+
+def finish_frame_stream(state: Dict[str, Any], output_name: str) -> None:
+    """写出扩展区与文件末尾的索引表，并输出统计信息"""
+    writer = state['writer']
+    extensions = {}
+    if state['dirty_rects']:
+        state['dirty_rects'][0] = frame_dirty_rects(state['first'], state['previous'], *state['block_grid'])
+        print_dirty_rects_stats(state['dirty_rects'], *state['block_grid'])
+        extensions[EXTENSION_DIRTY_RECTS] = build_dirty_rects(state['dirty_rects'])
+    if state['sparse'] and state['full_size']:
+        print(f"\n稀疏存储: 帧数据 {state['full_size']} -> {state['stored_size']} 字节 "
+              f"({state['stored_size'] / state['full_size'] * 100:.1f}%)")
+
+    file_size = finish_ffab_stream(writer, extensions)
+    print_ffab_summary(output_name, writer['version'], writer['flags'], extensions, writer['extension_size'],
+                       len(writer['offsets']), writer['width'], writer['height'], writer['astc_format'], file_size)
+
+
+def encode_frames_to_ffab_v1(frames: Iterable[Tuple[str, np.ndarray]], output_path: str, astc_format: str,
+                             quality: Union[float, str], jobs: Optional[int] = None,
+                             astcenc_threads: Optional[int] = None,
+                             target: Optional[Dict[str, Any]] = None,
+                             executor: Optional[Executor] = None,
+                             progress: Optional[Callable[[str, int, Optional[int]], None]] = None,
+                             frame_cache: Optional[Dict[str, Any]] = None,
+                             sparse: bool = False, dirty_rects: bool = False, checksums: bool = False,
+                             stream: bool = False, output_stream: Optional[BinaryIO] = None,
+                             playback_order: str = PLAYBACK_ORDER_SEQUENTIAL, preload_frames: int = 0,
+                             cpu_budget: Optional[int] = None) -> None:
+    """
+    以流式方式压缩帧序列并创建FFAB文件 (版本1，sparse、checksums 或 stream 为 True 时为版本2)
+
+    帧在迭代到时拷贝后提交到线程池并行压缩，同时在途的帧数不超过并行帧数量的两倍，
+    仅保留压缩后的数据，因此 frames 可以是复用缓冲区的生成器（如视频管道）。
+    图片尺寸以第一帧为准，后续帧尺寸不一致时抛出异常。
+    单遍写出 (stream) 时每一帧按顺序压缩完成后立即写出，不保留压缩数据，索引表写在文件末尾。
+
+    Args:
+        frames: 图片名称和numpy数组数据的可迭代对象
+        output_path: 输出文件路径，指定 output_stream 时只用于输出信息
+        astc_format: ASTC格式 (4x4, 5x4, 5x5, 6x5, 6x6, 8x5, 8x6, 8x8, 10x5, 10x6, 10x8, 10x10, 12x10, 12x12)
+        quality: ASTC压缩质量 (0.0-100.0) 或速度预设
+        jobs: 并行压缩的帧数量，为 None 时根据 CPU 预算自动计算
+        astcenc_threads: 每个 astcenc 进程的线程数 (-j)，为 None 时根据 CPU 预算自动计算
+        target: 自适应质量目标，不为 None 时忽略 quality，每一帧使用满足目标的最低质量，
+            包含 min_psnr、max_rmse、reference_quality 字段，参考 compress_frame_adaptive
+        executor: 共享的线程池，为 None 时创建并在结束时关闭新的线程池
+        progress: 每一帧压缩完成后按帧顺序调用 progress(图片名称, 已完成帧数, 总帧数或 None)
+        frame_cache: create_frame_cache 创建的压缩帧缓存，命中的帧不再调用 astcenc（自适应质量模式下不使用）
+        sparse: 是否使用稀疏存储，每一帧只存储块位图与非空块，适合大面积透明的动画
+        dirty_rects: 是否在扩展区写入每一帧相对上一帧的脏矩形，参考 compute_dirty_rects
+        checksums: 是否写入每一帧的 CRC32 校验和表，可以通过 ffab_info.py --check 校验文件完整性
+        stream: 是否单遍写出（版本2 FFAB_FLAG_TRAILING_INDEX），输出路径可以是管道或 FIFO
+        output_stream: 单遍写出的二进制输出流（如标准输出），指定时总是单遍写出
+        playback_order: 播放顺序，帧数据按首次访问的顺序存储，参考 parse_playback_order（单遍写出时只支持默认顺序）
+        preload_frames: 大于 0 时写入预加载扩展段，按播放顺序的前 preload_frames 帧位于文件开头的连续前缀中
+        cpu_budget: CPU 预算，帧数量已知时按帧数量在并行帧与 astcenc -j 之间分配，为 None 时使用 get_cpu_budget()
+    """
+    stream = stream or output_stream is not None
+    if stream and (playback_order != PLAYBACK_ORDER_SEQUENTIAL or preload_frames):
+        raise ValueError("单遍写出按压缩完成的顺序写出帧数据，不支持 --playback-order 与 --preload-frames")
+
+    frame_count = len(frames) if hasattr(frames, '__len__') else None
+    workers, planned_threads = plan_thread_budget(frame_count, jobs, cpu_budget)
+    astcenc_threads = astcenc_threads or planned_threads
+    print(f"并行帧: {workers}, astcenc -j {astcenc_threads}")
+
+    width = height = None
+    first_img_name = None
+    astc_header = b''
+    compressed_frames = []
+    frame_stats = []
+    pending = deque()
+    frames_done = 0
+
+    # 单遍写出的状态，在读取到第一帧（确定图片尺寸）时创建
+    stream_state = None
+    output_stack = contextlib.ExitStack()
+
+    # 自适应质量模式下，采样部分帧额外以固定高质量压缩，用于估算节省的时间
+    if target is not None:
+        reference_quality = target.get('reference_quality', DEFAULT_REFERENCE_QUALITY)
+        sample_count = DEFAULT_REFERENCE_SAMPLES
+        if frame_count:
+            reference_indexes = {i * frame_count // sample_count for i in range(min(sample_count, frame_count))}
+        else:
+            reference_indexes = set(range(sample_count))
+
+    def collect_one():
+        nonlocal frames_done
+        img_name, cache_key, future = pending.popleft()
+        if target is None:
+            compressed_data = future.result()
+            if cache_key is not None:
+                frame_cache_put(frame_cache, cache_key, compressed_data)
+            print(f"已处理: {img_name} -> {len(compressed_data)} 字节")
+        else:
+            compressed_data, stats = future.result()
+            frame_stats.append(stats)
+            print(f"已处理: {img_name} -> {len(compressed_data)} 字节, 质量 {stats['quality']:g}, PSNR {stats['psnr']:.2f} dB")
+        if stream_state is None:
+            compressed_frames.append(compressed_data)
+        else:
+            write_stream_frame(stream_state, compressed_data)
+        frames_done += 1
+        if progress is not None:
+            progress(img_name, frames_done, frame_count)
+
+    if executor is None:
+        executor_context = ThreadPoolExecutor(max_workers=workers)
+    else:
+        executor_context = contextlib.nullcontext(executor)
+
+    with executor_context as executor, output_stack:
+        try:
+            for index, (img_name, img_data) in enumerate(frames):
+                h, w = img_data.shape[:2]
+                if width is None:
+                    # 以第一帧的尺寸生成 `.astc` header 的内容(16字节)
+                    width, height, first_img_name = w, h, img_name
+                    astc_header = generate_astc_header(width, height, astc_format)
+                    if stream:
+                        # 单遍写出：立即写出文件头与 Meta信息区
+                        output = output_stream or output_stack.enter_context(open(output_path, 'wb'))
+                        stream_state = open_frame_stream(output, width, height, astc_format, sparse, dirty_rects,
+                                                         checksums)
+                elif h != height or w != width:
+                    raise ValueError(f"图片尺寸不一致: {first_img_name} ({width}x{height}) vs {img_name} ({w}x{h})")
+
+                # 命中压缩帧缓存时不再调用 astcenc；否则拷贝帧数据后提交压缩，生成器可以在压缩期间复用缓冲区
+                cache_key = cached_data = None
+                if target is None and frame_cache is not None:
+                    cache_key = frame_cache_key(img_data, astc_format, quality)
+                    cached_data = frame_cache_get(frame_cache, cache_key)
+
+                if cached_data is not None:
+                    future = Future()
+                    future.set_result(cached_data)
+                    cache_key = None
+                elif target is None:
+                    future = executor.submit(compress_frame, img_name, img_data.copy(), astc_header,
+                                             astc_format, quality, astcenc_threads)
+                else:
+                    future = executor.submit(compress_frame_adaptive, img_name, img_data.copy(), astc_header,
+                                             astc_format, target.get('min_psnr'), target.get('max_rmse'),
+                                             astcenc_threads,
+                                             reference_quality if index in reference_indexes else None)
+                pending.append((img_name, cache_key, future))
+                while len(pending) >= workers * 2:
+                    collect_one()
+
+            while pending:
+                collect_one()
+
+            if stream_state is not None:
+                finish_frame_stream(stream_state, output_path)
+        except BaseException:
+            # 单遍写出失败时删除写了一半的普通文件（管道与标准输出无法撤回，读取方会因缺少索引尾部而报错）
+            if stream_state is not None and output_stream is None and os.path.isfile(output_path):
+                output_stack.close()
+                os.remove(output_path)
+            raise
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+    if not frames_done:
+        raise ValueError("没有可用的图片")
+
+    if stream:
+        if target is not None:
+            print_adaptive_quality_report(frame_stats, reference_quality)
+        return
+
+    write_compressed_frames(output_path, width, height, astc_format, compressed_frames, sparse, dirty_rects,
+                            checksums, parse_playback_order(playback_order, frames_done), preload_frames)
+
+    if target is not None:
+        print_adaptive_quality_report(frame_stats, reference_quality)
+
+
+def parse_playback_order(spec: str, frame_count: int) -> Optional[List[int]]:
+    """
+    解析播放顺序，得到帧数据的存储顺序
+
+    Args:
+        spec: sequential（按帧序号）、reverse（倒序），或逗号分隔的帧序号与范围（从 0 开始，如 12-23,0-11 或 23-0），
+            可以重复出现（如往返播放），帧数据按首次出现的顺序存储，未出现的帧按帧序号顺序排在最后；
+            写入时最后一帧不在预加载前缀中时移到数据区末尾（参考 write_ffab_file）
+        frame_count: 帧数量
+
+    Returns:
+        帧序号的排列，按帧序号顺序存储时返回 None
+    """
+    spec = spec.strip()
+    if spec == PLAYBACK_ORDER_SEQUENTIAL:
+        return None
+    if spec == PLAYBACK_ORDER_REVERSE:
+        return list(range(frame_count - 1, -1, -1))
+
+    order = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            if '-' in item:
+                start, end = (int(value) for value in item.split('-', 1))
+            else:
+                start = end = int(item)
+        except ValueError:
+            raise ValueError(f"无效的播放顺序: {item}") from None
+        for i in (start, end):
+            if not 0 <= i < frame_count:
+                raise ValueError(f"播放顺序中的帧序号超出范围: {i} (共 {frame_count} 帧)")
+        step = 1 if end >= start else -1
+        for i in range(start, end + step, step):
+            order.setdefault(i, None)
+    if not order:
+        raise ValueError("没有指定播放顺序")
+
+    layout = list(order) + [i for i in range(frame_count) if i not in order]
+    return None if layout == list(range(frame_count)) else layout
+
+
+def write_compressed_frames(output_path: str, width: int, height: int, astc_format: str,
+                            compressed_frames: List[bytes], sparse: bool = False, dirty_rects: bool = False,
+                            checksums: bool = False, layout: Optional[List[int]] = None,
+                            preload_frames: int = 0) -> None:
+    """
+    将全部帧的压缩数据写出为FFAB文件，按选项计算脏矩形、打包稀疏存储并写入校验和表
+
+    Args:
+        output_path: 输出文件路径
+        width: 图片宽度
+        height: 图片高度
+        astc_format: ASTC格式
+        compressed_frames: 每一帧不包括 astc header 的压缩数据
+        sparse: 是否使用稀疏存储，参考 encode_frames_to_ffab_v1
+        dirty_rects: 是否写入脏矩形扩展段，参考 encode_frames_to_ffab_v1
+        checksums: 是否写入校验和表，参考 encode_frames_to_ffab_v1
+        layout: 帧数据的存储顺序，参考 parse_playback_order
+        preload_frames: 预加载前缀中的帧数量，参考 encode_frames_to_ffab_v1
+    """
+    extensions = {}
+    if dirty_rects:
+        extensions[EXTENSION_DIRTY_RECTS] = build_dirty_rects(
+            get_dirty_rects(compressed_frames, width, height, astc_format))
+
+    flags = FFAB_FLAG_CHECKSUMS if checksums else 0
+    if sparse:
+        packed_frames = [pack_sparse_frame(compressed_data) for compressed_data in compressed_frames]
+        full_size = sum(len(compressed_data) for compressed_data in compressed_frames)
+        packed_size = sum(len(packed_data) for packed_data in packed_frames)
+        print(f"\n稀疏存储: 帧数据 {full_size} -> {packed_size} 字节 ({packed_size / full_size * 100:.1f}%)")
+        write_ffab_file(output_path, width, height, astc_format, packed_frames, flags | FFAB_FLAG_SPARSE, extensions,
+                        layout, preload_frames)
+    else:
+        write_ffab_file(output_path, width, height, astc_format, compressed_frames, flags, extensions,
+                        layout, preload_frames)
+
+
+def create_ffab_file_v1(images: List[Tuple[str, np.ndarray]], output_path: str, astc_format: str,
+                        quality: Union[float, str], jobs: Optional[int] = None,
+                        astcenc_threads: Optional[int] = None,
+                        target: Optional[Dict[str, Any]] = None, sparse: bool = False,
+                        dirty_rects: bool = False, checksums: bool = False, stream: bool = False) -> None:
+    """
+    创建FFAB文件 (版本1)，文件结构参考 write_ffab_file_v1
+
+    Args:
+        images: 图片列表
+        output_path: 输出文件路径
+        astc_format: ASTC格式 (4x4, 5x4, 5x5, 6x5, 6x6, 8x5, 8x6, 8x8, 10x5, 10x6, 10x8, 10x10, 12x10, 12x12)
+        quality: ASTC压缩质量 (0.0-100.0) 或速度预设
+        jobs: 并行压缩的帧数量，为 None 时根据 CPU 预算自动计算
+        astcenc_threads: 每个 astcenc 进程的线程数 (-j)，为 None 时根据 CPU 预算自动计算
+        target: 自适应质量目标，参考 encode_frames_to_ffab_v1
+        sparse: 是否使用稀疏存储（版本2），参考 encode_frames_to_ffab_v1
+        dirty_rects: 是否写入脏矩形扩展段，参考 encode_frames_to_ffab_v1
+        checksums: 是否写入校验和表（版本2），参考 encode_frames_to_ffab_v1
+        stream: 是否单遍写出（版本2，索引表位于文件末尾），参考 encode_frames_to_ffab_v1
+    """
+    if not images:
+        raise ValueError("没有可用的图片")
+
+    # 压缩前先检查所有图片的尺寸是否一致
+    check_images_dimensions(images)
+
+    encode_frames_to_ffab_v1(images, output_path, astc_format, quality, jobs, astcenc_threads, target,
+                             sparse=sparse, dirty_rects=dirty_rects, checksums=checksums, stream=stream)
+
+
+def parse_density_scales(spec: str, source_density: str = DEFAULT_SOURCE_DENSITY) -> List[Tuple[str, float]]:
+    """
+    解析密度变体列表
+
+    Args:
+        spec: 逗号分隔的缩放比例（如 0.5）或密度分组名称（如 xhdpi，按相对 source_density 的比例缩放）
+        source_density: 源图片对应的密度分组
+
+    Returns:
+        按缩放比例从大到小排列的 (变体名称, 缩放比例) 列表，缩放比例的变体名称为 `<比例>x`
+    """
+    if source_density not in DENSITY_SCALES:
+        raise ValueError(f"未知的密度分组: {source_density}")
+    scales = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if item in DENSITY_SCALES:
+            label, scale = item, DENSITY_SCALES[item] / DENSITY_SCALES[source_density]
+        else:
+            try:
+                scale = float(item)
+            except ValueError:
+                raise ValueError(f"无效的缩放比例或密度分组: {item}") from None
+            if not (scale > 0 and math.isfinite(scale)):
+                raise ValueError(f"缩放比例必须大于 0: {item}")
+            label = f"{scale:g}x"
+        if label in scales:
+            raise ValueError(f"重复的密度变体: {label}")
+        scales[label] = scale
+    if not scales:
+        raise ValueError("没有指定密度变体")
+    return sorted(scales.items(), key=lambda item: item[1], reverse=True)
+
+
+def get_variant_output_path(output_path: str, label: str) -> str:
+    """密度变体的输出路径: <输出文件名>_<变体名称>.ffab"""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_{label}{ext or '.ffab'}"
+
+
+def get_variant_size(width: int, height: int, scale: float, astc_format: str,
+                     snap_blocks: bool = False) -> Tuple[int, int]:
+    """
+    计算密度变体的尺寸
+
+    Args:
+        width: 源图片宽度
+        height: 源图片高度
+        scale: 缩放比例
+        astc_format: ASTC格式
+        snap_blocks: 是否将宽高取整到块尺寸的整数倍（至少一个块），最后一行与最后一列不会出现部分块
+
+    Returns:
+        (宽度, 高度)
+    """
+    if not snap_blocks:
+        return max(1, round(width * scale)), max(1, round(height * scale))
+    block_x, block_y = map(int, astc_format.split('x'))
+    return block_x * max(1, round(width * scale / block_x)), block_y * max(1, round(height * scale / block_y))
+
+
+def resize_frame(img_data: np.ndarray, width: int, height: int) -> np.ndarray:
+    """
+    使用 Lanczos 重采样缩放 RGBA 图片，尺寸相同时直接返回
+
+    Pillow 对 RGBA 图片在预乘 alpha 下重采样，半透明边缘不会混入透明像素的颜色；重采样期间释放 GIL，可以在线程池中并行。
+    """
+    if img_data.shape[1] == width and img_data.shape[0] == height:
+        return img_data
+    return np.array(Image.fromarray(img_data).resize((width, height), Image.LANCZOS))
+
+
+def compress_variant_frame(img_name: str, img_data: np.ndarray, width: int, height: int, astc_header: bytes,
+                           astc_format: str, quality: Union[float, str], threads: Optional[int] = None,
+                           target: Optional[Dict[str, Any]] = None) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+    """
+    缩放源图片到密度变体的尺寸后压缩
+
+    Returns:
+        (不包括 astc header 的压缩数据, 自适应质量模式下的统计信息，否则为 None)
+    """
+    resized = resize_frame(img_data, width, height)
+    if target is None:
+        return compress_frame(img_name, resized, astc_header, astc_format, quality, threads), None
+    return compress_frame_adaptive(img_name, resized, astc_header, astc_format, target.get('min_psnr'),
+                                   target.get('max_rmse'), threads)
+
+
+def encode_density_variants(frames: Iterable[Tuple[str, np.ndarray]], output_path: str,
+                            scales: List[Tuple[str, float]], astc_format: str, quality: Union[float, str],
+                            jobs: Optional[int] = None, astcenc_threads: Optional[int] = None,
+                            target: Optional[Dict[str, Any]] = None, executor: Optional[Executor] = None,
+                            progress: Optional[Callable[[str, int, Optional[int]], None]] = None,
+                            snap_blocks: bool = False, sparse: bool = False, dirty_rects: bool = False,
+                            checksums: bool = False, playback_order: str = PLAYBACK_ORDER_SEQUENTIAL,
+                            preload_frames: int = 0, cpu_budget: Optional[int] = None) -> List[str]:
+    """
+    一次读取源帧序列，生成多个密度变体并分别写出FFAB文件
+
+    每一帧源图片只读取并拷贝一次，由全部变体共享；每个变体的缩放与压缩作为一个任务提交到同一个线程池，
+    尺寸大的变体先提交，同时在途的任务数不超过并行帧数量的两倍，只保留压缩后的数据。
+
+    Args:
+        frames: 图片名称和numpy数组数据的可迭代对象，可以是复用缓冲区的生成器（如视频管道）
+        output_path: 输出文件路径，每个变体输出到 get_variant_output_path(output_path, 变体名称)
+        scales: parse_density_scales 返回的 (变体名称, 缩放比例) 列表
+        astc_format: ASTC格式
+        quality: ASTC压缩质量 (0.0-100.0) 或速度预设
+        jobs: 并行压缩的任务数量，为 None 时根据 CPU 预算自动计算
+        astcenc_threads: 每个 astcenc 进程的线程数 (-j)，为 None 时根据 CPU 预算自动计算
+        target: 自适应质量目标，参考 encode_frames_to_ffab_v1（不采样固定高质量的耗时）
+        executor: 共享的线程池，为 None 时创建并在结束时关闭新的线程池
+        progress: 每个任务完成后调用 progress(变体名称/图片名称, 已完成任务数, 总任务数或 None)
+        snap_blocks: 是否将变体的宽高取整到块尺寸的整数倍，参考 get_variant_size
+        sparse: 是否使用稀疏存储，参考 encode_frames_to_ffab_v1
+        dirty_rects: 是否写入脏矩形扩展段，参考 encode_frames_to_ffab_v1
+        checksums: 是否写入校验和表，参考 encode_frames_to_ffab_v1
+        playback_order: 播放顺序，参考 encode_frames_to_ffab_v1
+        preload_frames: 预加载前缀中的帧数量，参考 encode_frames_to_ffab_v1
+        cpu_budget: CPU 预算，按任务数量在并行任务与 astcenc -j 之间分配，为 None 时使用 get_cpu_budget()
+
+    Returns:
+        按 scales 顺序写出的FFAB文件路径列表
+    """
+    start_time = time.perf_counter()
+    frame_count = len(frames) if hasattr(frames, '__len__') else None
+    task_count = frame_count * len(scales) if frame_count is not None else None
+    workers, planned_threads = plan_thread_budget(task_count, jobs, cpu_budget)
+    astcenc_threads = astcenc_threads or planned_threads
+    print(f"并行任务: {workers}, astcenc -j {astcenc_threads}")
+
+    variants = [{'label': label, 'scale': scale, 'output_path': get_variant_output_path(output_path, label),
+                 'compressed_frames': [], 'frame_stats': []} for label, scale in scales]
+    width = height = None
+    first_img_name = None
+    pending = deque()
+    tasks_done = 0
+
+    def collect_one():
+        nonlocal tasks_done
+        variant, img_name, future = pending.popleft()
+        compressed_data, stats = future.result()
+        variant['compressed_frames'].append(compressed_data)
+        if stats is not None:
+            variant['frame_stats'].append(stats)
+        print(f"已处理: {variant['label']}/{img_name} -> {len(compressed_data)} 字节")
+        tasks_done += 1
+        if progress is not None:
+            progress(f"{variant['label']}/{img_name}", tasks_done, task_count)
+
+    if executor is None:
+        executor_context = ThreadPoolExecutor(max_workers=workers)
+    else:
+        executor_context = contextlib.nullcontext(executor)
+
+    with executor_context as executor:
+        try:
+            for img_name, img_data in frames:
+                h, w = img_data.shape[:2]
+                if width is None:
+                    # 以第一帧的尺寸计算每个变体的尺寸与 `.astc` header
+                    width, height, first_img_name = w, h, img_name
+                    print(f"密度变体 (源图片 {width}x{height}):")
+                    for variant in variants:
+                        variant['width'], variant['height'] = get_variant_size(width, height, variant['scale'],
+                                                                               astc_format, snap_blocks)
+                        variant['astc_header'] = generate_astc_header(variant['width'], variant['height'],
+                                                                      astc_format)
+                        print(f"  {variant['label']}: {variant['width']}x{variant['height']} -> "
+                              f"{variant['output_path']}")
+                elif h != height or w != width:
+                    raise ValueError(f"图片尺寸不一致: {first_img_name} ({width}x{height}) vs {img_name} ({w}x{h})")
+
+                # 源帧只拷贝一次，全部变体的任务共享，生成器可以在压缩期间复用缓冲区
+                source = img_data.copy()
+                for variant in variants:
+                    future = executor.submit(compress_variant_frame, img_name, source, variant['width'],
+                                             variant['height'], variant['astc_header'], astc_format, quality,
+                                             astcenc_threads, target)
+                    pending.append((variant, img_name, future))
+                    while len(pending) >= workers * 2:
+                        collect_one()
+
+            while pending:
+                collect_one()
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+    if not tasks_done:
+        raise ValueError("没有可用的图片")
+
+    layout = parse_playback_order(playback_order, len(variants[0]['compressed_frames']))
+    for variant in variants:
+        print(f"\n密度变体 {variant['label']} ({variant['width']}x{variant['height']}):")
+        write_compressed_frames(variant['output_path'], variant['width'], variant['height'], astc_format,
+                                variant['compressed_frames'], sparse, dirty_rects, checksums, layout, preload_frames)
+        if target is not None:
+            print_adaptive_quality_report(variant['frame_stats'],
+                                          target.get('reference_quality', DEFAULT_REFERENCE_QUALITY))
+        variant['compressed_frames'] = None
+
+    print(f"\n密度变体生成完成: {len(variants)} 个变体, {tasks_done} 个压缩任务, "
+          f"耗时 {time.perf_counter() - start_time:.2f} 秒")
+    return [variant['output_path'] for variant in variants]
+
+
+async def compress_with_astc_async(img_data: np.ndarray, astc_format: str, quality: Union[float, str],
+                                   threads: Optional[int] = None) -> bytes:
+    """
+    compress_with_astc 的异步版本，通过 asyncio.create_subprocess_exec 调用 astcenc
+
+    协程被取消时会结束正在运行的 astcenc 子进程。
+
+    Args:
+        img_data: 图片数据
+        astc_format: ASTC压缩格式 (4x4, 5x4, 5x5, 6x5, 6x6, 8x5, 8x6, 8x8, 10x5, 10x6, 10x8, 10x10, 12x10, 12x12)
+        quality: 压缩质量 (0.0 - 100.0) 或速度预设
+        threads: astcenc 线程数 (-j)
+
+    Returns:
+        压缩后的数据
+    """
+    # 创建临时文件夹、写入输入文件、读取输出文件与清理临时文件夹都是阻塞操作，放到默认线程池中执行，避免阻塞事件循环
+    loop = asyncio.get_running_loop()
+    temp_dir = await loop.run_in_executor(None, functools.partial(tempfile.mkdtemp, prefix='ffab_'))
+    try:
+        output_path = os.path.join(temp_dir, 'output.astc')
+        input_path = await loop.run_in_executor(None, write_astcenc_input, temp_dir, img_data)
+
+        cmd = build_astcenc_compress_command(input_path, output_path, astc_format, quality, threads)
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE)
+
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            # 任务被取消，结束 astcenc 子进程后再清理临时文件夹
+            if process.returncode is None:
+                process.kill()
+            await asyncio.shield(process.wait())
+            raise
+
+        if process.returncode != 0:
+            raise RuntimeError(f"ASTC编码失败: {stderr.decode(errors='replace')} ${stdout.decode(errors='replace')}")
+
+        return await loop.run_in_executor(None, Path(output_path).read_bytes)
+    finally:
+        await asyncio.shield(loop.run_in_executor(None, functools.partial(shutil.rmtree, temp_dir, ignore_errors=True)))
+
+
+async def encode_bundle_async(images: List[Tuple[str, np.ndarray]], output_path: str, astc_format: str,
+                              quality: Union[float, str], concurrency: Optional[int] = None) -> None:
+    """
+    异步创建FFAB文件，文件结构参考 write_ffab_file
+
+    通过信号量限制同时运行的 astcenc 进程数，适合在同一个事件循环中同时处理多个编码请求。
+    每一帧的数据长度固定，先写出文件头、Meta信息区与索引表（参考 build_ffab_prefix，版本1，
+    图片数量或尺寸超过版本1的上限时为版本3），之后每当下一帧压缩完成就按帧序号顺序写出，只保留尚未轮到写出的帧；
+    astcenc 探测与所有文件操作都放到默认线程池中执行，不阻塞事件循环。
+    先写入临时文件，全部帧写出后再替换输出文件；任务被取消或任一帧压缩失败时，
+    结束所有正在运行的 astcenc 子进程并删除临时文件，不写出输出文件。
+
+    示例:
+        await encode_bundle_async(images, 'output.ffab', '6x6', 50, concurrency=8)
+
+    Args:
+        images: 图片列表
+        output_path: 输出文件路径
+        astc_format: ASTC格式 (4x4, 5x4, 5x5, 6x5, 6x6, 8x5, 8x6, 8x8, 10x5, 10x6, 10x8, 10x10, 12x10, 12x12)
+        quality: ASTC压缩质量 (0.0-100.0) 或速度预设
+        concurrency: 同时运行的 astcenc 进程数，为 None 时根据 CPU 预算自动计算
+    """
+    if not images:
+        raise ValueError("没有可用的图片")
+
+    # 检查所有图片的尺寸是否一致
+    width, height = check_images_dimensions(images)
+
+    # 探测 astcenc（可能运行 astcenc -help），结果在进程内缓存，后续构建命令不再阻塞
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, get_astc_encoder) is None:
+        raise RuntimeError("未找到ASTC编码器 (astcenc)")
+
+    astc_header = generate_astc_header(width, height, astc_format)
+    image_count = len(images)
+    data_length = get_astc_frame_data_size(width, height, astc_format)
+    version, prefix = build_ffab_prefix(width, height, astc_format, [data_length] * image_count)
+
+    concurrency, astcenc_threads = plan_thread_budget(image_count, concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def compress_one(index: int, img_name: str, img_data: np.ndarray) -> Tuple[int, bytes]:
+        async with semaphore:
+            astc_compressed_data = await compress_with_astc_async(img_data, astc_format, quality, astcenc_threads)
+        if astc_compressed_data[:16] != astc_header:
+            raise ValueError(f"图片 {img_name} 的 ASTC 压缩数据前 16 个字节与 astc_header 不匹配")
+        compressed_data = astc_compressed_data[16:]
+        if len(compressed_data) != data_length:
+            raise ValueError(f"图片 {img_name} 的 ASTC 压缩数据长度错误: 期望 {data_length}, 实际 {len(compressed_data)}")
+        return index, compressed_data
+
+    # 先写入临时文件再替换，读取方不会读到写入中的文件
+    temp_path = f'{output_path}.tmp'
+    f = await loop.run_in_executor(None, open, temp_path, 'wb')
+    tasks = []
+    try:
+        await loop.run_in_executor(None, f.write, prefix)
+
+        tasks = [asyncio.ensure_future(compress_one(i, img_name, img_data))
+                 for i, (img_name, img_data) in enumerate(images)]
+
+        # 已压缩完成但前面还有帧未完成的帧，按帧序号暂存
+        completed = {}
+        next_index = 0
+        for next_completed in asyncio.as_completed(tasks):
+            index, compressed_data = await next_completed
+            completed[index] = compressed_data
+            print(f"已处理: {images[index][0]} -> {data_length} 字节")
+
+            # 按帧序号顺序写出已经轮到的帧
+            ready = []
+            while next_index in completed:
+                ready.append(completed.pop(next_index))
+                next_index += 1
+            if ready:
+                await loop.run_in_executor(None, f.writelines, ready)
+
+        await loop.run_in_executor(None, f.close)
+        await loop.run_in_executor(None, os.replace, temp_path, output_path)
+    except BaseException:
+        # 取消所有未完成的任务（其中的 astcenc 子进程会被结束），删除临时文件
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.shield(loop.run_in_executor(None, _discard_temp_file, f, temp_path))
+        raise
+
+    file_size = await loop.run_in_executor(None, os.path.getsize, output_path)
+    print_ffab_summary(output_path, version, 0, None, 0, image_count, width, height, astc_format, file_size)
+
+
+def _discard_temp_file(f: BinaryIO, temp_path: str) -> None:
+    """关闭并删除写入失败的临时文件"""
+    f.close()
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """构建编码工具的命令行参数解析器，命令行与常驻服务 (--serve) 共用"""
+    parser = argparse.ArgumentParser(description='FFAB编码工具 - 将图片序列或视频编码成FFAB格式')
+    parser.add_argument('input_path', nargs='?', default=None,
+                       help='包含PNG或JPEG图片的输入文件夹或压缩包 (zip, tar, tar.gz, tar.bz2, tar.xz)，或视频文件 (mp4, mov, mkv, webm, avi, gif)')
+    parser.add_argument('output_file', nargs='?', default=None, help='输出的FFAB文件路径，- 表示标准输出（单遍写出）')
+    parser.add_argument('--format', choices=list(ASTC_FORMAT_CODES.keys()), default='6x6',
+                       help='ASTC压缩格式 (默认: 6x6)')
+    parser.add_argument('--quality', type=float, default=50,
+                       help='ASTC压缩质量 (0.0-100.0, 默认: 50)')
+    parser.add_argument('--preset', choices=ASTC_QUALITY_PRESETS, default=None,
+                       help='astcenc 速度预设，指定时替代 --quality')
+    parser.add_argument('--min-psnr', type=float, default=None,
+                       help='自适应质量模式：每一帧使用 PSNR 不低于该值 (dB) 的最低压缩质量，指定时忽略 --quality')
+    parser.add_argument('--max-rmse', type=float, default=None,
+                       help='自适应质量模式：每一帧使用均方根误差 (RMSE，8 位通道值 0-255，对全部像素的 RGBA 通道计算) '
+                            '不高于该值的最低压缩质量，指定时忽略 --quality')
+    parser.add_argument('--reference-quality', type=float, default=DEFAULT_REFERENCE_QUALITY,
+                       help=f'自适应质量模式：用于估算节省时间的固定高质量 (默认: {DEFAULT_REFERENCE_QUALITY:g})')
+    parser.add_argument('--sparse', action='store_true',
+                       help='稀疏存储（版本2）：每一帧只存储块位图与非空块，适合大面积透明的动画')
+    parser.add_argument('--dirty-rects', action='store_true',
+                       help='在扩展区写入每一帧相对上一帧的脏矩形（以块为单位），播放器可以只更新变化的区域')
+    parser.add_argument('--checksums', action='store_true',
+                       help='写入每一帧的 CRC32 校验和表（版本2），可以通过 ffab_info.py --check 校验文件完整性')
+    parser.add_argument('--stream', action='store_true',
+                       help='单遍写出（版本2）：索引表写在文件末尾，每一帧压缩完成后立即写出，输出可以是管道、FIFO，'
+                            'output_file 为 - 时写入标准输出')
+    parser.add_argument('--playback-order', default=PLAYBACK_ORDER_SEQUENTIAL,
+                       help='播放顺序，帧数据按首次访问的顺序存储：sequential、reverse，或逗号分隔的帧序号与范围 '
+                            '(从 0 开始，如 12-23,0-11) (默认: sequential)')
+    parser.add_argument('--preload-frames', type=int, default=0,
+                       help='按播放顺序的前 N 帧与文件头、索引表一起位于文件开头的连续前缀中，并在扩展区记录前缀长度，'
+                            '播放器可以对该前缀发起一次预读 (默认: 0，不记录)')
+    parser.add_argument('--scales', default=None,
+                       help='密度变体：逗号分隔的缩放比例或密度分组 (mdpi, hdpi, xhdpi, xxhdpi, xxxhdpi)，'
+                            '如 1,0.5 或 xxxhdpi,xxhdpi,xhdpi，源图片只读取一次，每个变体输出为 <输出文件名>_<变体>.ffab')
+    parser.add_argument('--source-density', choices=list(DENSITY_SCALES), default=DEFAULT_SOURCE_DENSITY,
+                       help=f'源图片对应的密度分组，--scales 中的密度分组按相对该密度的比例缩放 (默认: {DEFAULT_SOURCE_DENSITY})')
+    parser.add_argument('--snap-blocks', action='store_true',
+                       help='密度变体的宽高取整到 ASTC 块尺寸的整数倍，不产生部分块')
+    parser.add_argument('--pack', action='store_true',
+                       help='打包模式：将 input_path 文件夹中的全部 .ffab 文件按原样打包为多动画归档 (.ffar)，'
+                            '动画名称为不含扩展名的文件名，不重新压缩')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                       help='并行压缩的帧数量 (默认: 根据CPU预算自动计算)')
+    parser.add_argument('--cpu-budget', type=int, default=None,
+                       help='CPU预算，按帧数量在并行帧与 astcenc -j 之间分配 (默认: 根据CPU亲和性与cgroup配额自动检测)')
+    parser.add_argument('--fps', type=float, default=None,
+                       help='视频输入时的抽帧帧率 (默认: 保持视频原始帧率)')
+    parser.add_argument('--start', default=None,
+                       help='视频输入时的起始时间，秒数或 ffmpeg 时间格式 (默认: 从头开始)')
+    parser.add_argument('--duration', default=None,
+                       help='视频输入时的截取时长，秒数或 ffmpeg 时间格式 (默认: 到视频结尾)')
+    parser.add_argument('--watch', action='store_true',
+                       help='编码后监视输入文件夹，帧文件变化时只重新压缩变化的帧并更新FFAB文件')
+    parser.add_argument('--poll-interval', type=float, default=0.5,
+                       help='监视模式下 inotify 不可用时的轮询间隔，单位秒 (默认: 0.5)')
+    parser.add_argument('--serve', action='store_true',
+                       help='以常驻服务方式运行，通过本地 Unix socket 接收编码与解码任务')
+    parser.add_argument('--socket', default=None,
+                       help='常驻服务的 Unix socket 路径 (默认: $XDG_RUNTIME_DIR/ffab-encoder-<uid>.sock)')
+    parser.add_argument('--cache-size', type=float, default=256,
+                       help='常驻服务的压缩帧缓存大小，单位 MB (默认: 256)')
+    parser.add_argument('--no-daemon', action='store_true',
+                       help='不连接常驻服务，直接在当前进程中编码')
+    return parser
+
+
+def run_encode(args: argparse.Namespace, executor: Optional[Executor] = None,
+               progress: Optional[Callable[[str, int, Optional[int]], None]] = None,
+               frame_cache: Optional[Dict[str, Any]] = None, output_stream: Optional[BinaryIO] = None) -> None:
+    """
+    按命令行参数执行一次编码
+
+    Args:
+        args: build_arg_parser() 解析得到的参数
+        executor: 共享的线程池，参考 encode_frames_to_ffab_v1
+        progress: 进度回调，参考 encode_frames_to_ffab_v1
+        frame_cache: 压缩帧缓存，参考 encode_frames_to_ffab_v1
+        output_stream: 输出文件为 '-' 时写入的二进制输出流（标准输出）
+    """
+    if args.pack:
+        # 打包已编码的FFAB文件，不需要 astcenc
+        if args.watch or args.stream or args.output_file == STDOUT_PATH:
+            raise ValueError("打包模式不支持 --watch、--stream 与标准输出")
+        from .archive import pack_ffab_folder
+        pack_ffab_folder(args.input_path, args.output_file)
+        return
+
+    # 校验ASTC格式
+    astc_format = check_astc_format(args.format)
+
+    # 校验ASTC质量
+    if not (0 <= args.quality <= 100):
+        raise ValueError("ASTC质量必须在0-100之间")
+    quality = args.preset or args.quality
+
+    # 自适应质量目标
+    target = None
+    if args.min_psnr is not None or args.max_rmse is not None:
+        target = {
+            'min_psnr': args.min_psnr,
+            'max_rmse': args.max_rmse,
+            'reference_quality': args.reference_quality,
+        }
+
+    # CPU预算在帧数量确定后（编码函数中）按帧数量在并行帧与 astcenc -j 之间分配
+    cpu_budget = args.cpu_budget or get_cpu_budget()
+    jobs = args.jobs
+    encoder = get_astc_encoder()
+    print(f"astcenc: {encoder['path']} ({encoder['name']})")
+    print(f"CPU预算: {cpu_budget}")
+
+    if args.output_file == STDOUT_PATH and output_stream is None:
+        raise ValueError("输出到标准输出 (-) 只能在命令行中使用")
+
+    if args.preload_frames < 0:
+        raise ValueError("预加载帧数不能小于0")
+    custom_layout = args.playback_order != PLAYBACK_ORDER_SEQUENTIAL or args.preload_frames > 0
+
+    # 密度变体
+    scales = None
+    if args.scales:
+        scales = parse_density_scales(args.scales, args.source_density)
+        if args.watch or args.stream or args.output_file == STDOUT_PATH:
+            raise ValueError("密度变体会写出多个文件，不支持 --watch、--stream 与标准输出")
+
+    if args.watch:
+        if is_video_file(args.input_path) or is_archive_file(args.input_path):
+            raise ValueError("监视模式只支持图片文件夹输入")
+        if args.stream or args.output_file == STDOUT_PATH:
+            raise ValueError("监视模式会重新写出整个文件，不支持单遍写出与标准输出")
+        if custom_layout:
+            raise ValueError("监视模式不支持 --playback-order 与 --preload-frames")
+        from .watch import watch_folder
+        watch_folder(args.input_path, args.output_file, astc_format, quality, jobs, None, target,
+                     args.poll_interval, args.sparse, args.dirty_rects, args.checksums, cpu_budget)
+        return
+
+    if is_video_file(args.input_path):
+        # 检查ffmpeg是否可用
+        if not check_ffmpeg():
+            raise RuntimeError("未找到 ffmpeg 或 ffprobe，请安装 ffmpeg 并确保其在系统 PATH 中")
+
+        # 通过 rawvideo 管道逐帧读取视频，边读取边压缩
+        print(f"正在从视频读取帧: {args.input_path}")
+        frames = iter_frames_from_video(args.input_path, args.fps, args.start, args.duration)
+    elif is_archive_file(args.input_path):
+        # 直接从压缩包读取图片，压缩前先检查所有图片的尺寸是否一致
+        print(f"正在从压缩包加载图片: {args.input_path}")
+        frames = load_images_from_archive(args.input_path, jobs or cpu_budget)
+        check_images_dimensions(frames)
+    else:
+        # 加载图片，压缩前先检查所有图片的尺寸是否一致
+        print(f"正在从文件夹加载图片: {args.input_path}")
+        frames = load_images_from_folder(args.input_path)
+        check_images_dimensions(frames)
+
+    if custom_layout and hasattr(frames, '__len__'):
+        # 帧数量已知时在压缩前校验播放顺序
+        parse_playback_order(args.playback_order, len(frames))
+
+    if scales is not None:
+        print(f"\n正在创建 {len(scales)} 个密度变体: {', '.join(label for label, _ in scales)}")
+        encode_density_variants(frames, args.output_file, scales, astc_format, quality, jobs, None, target,
+                                executor, progress, args.snap_blocks, args.sparse, args.dirty_rects, args.checksums,
+                                args.playback_order, args.preload_frames, cpu_budget)
+        return
+
+    print(f"\n正在创建FFAB文件: {args.output_file}")
+    encode_frames_to_ffab_v1(frames, args.output_file, astc_format, quality, jobs, None, target,
+                             executor, progress, frame_cache, args.sparse, args.dirty_rects, args.checksums,
+                             args.stream, output_stream, args.playback_order, args.preload_frames, cpu_budget)
+
+
+def main():
+    """主函数"""
+    parser = build_arg_parser()
+    args = parser.parse_args()
+
+    if not args.serve and (args.input_path is None or args.output_file is None):
+        parser.error("需要指定 input_path 与 output_file")
+
+    # 输出到标准输出时，标准输出用于FFAB数据，日志输出到标准错误
+    output_stream = None
+    log_context = contextlib.nullcontext()
+    if args.output_file == STDOUT_PATH:
+        if sys.stdout.isatty():
+            parser.error("标准输出是终端，请重定向到文件或管道")
+        output_stream = sys.stdout.buffer
+        log_context = contextlib.redirect_stdout(sys.stderr)
+
+    with log_context:
+        try:
+            # 检查ASTC编码器是否可用（打包模式不需要）
+            if not args.pack and not check_astc_encoder():
+                print("错误：未找到ASTC编码器 (astcenc)")
+                print("请从 https://github.com/ARM-software/astc-encoder 下载并安装")
+                sys.exit(1)
+
+            if args.serve:
+                from .server import serve
+                serve(args.socket, args.jobs, args.cpu_budget, int(args.cache_size * 1024 * 1024))
+            else:
+                run_encode(args, output_stream=output_stream)
+        except Exception as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,913 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 文件格式定义、解析与写入
+只依赖标准库，不导入 numpy 与 Pillow。文件头、Meta信息区与索引表通过 mmap 映射到同一个缓冲区，
+使用 memoryview 与 struct.unpack_from 一次解析完成，不复制数据，也不重复打开文件。
+"""
+
+import operator
+import os
+import sys
+import mmap
+import contextlib
+import time
+import zlib
+import struct
+from array import array
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
+
+# FFAB 文件头魔数
+FFAB_MAGIC = 0xFFAB
+
+# FFAB 文件版本
+FFAB_VERSION_0x0001 = 0x0001
+FFAB_VERSION_0x0002 = 0x0002
+FFAB_VERSION_0x0003 = 0x0003
+
+# 版本2与版本3 标志位
+# FFAB_FLAG_SPARSE: 稀疏存储，每一帧为块位图加非空块，空块（完全透明的 void-extent 块）不存储
+FFAB_FLAG_SPARSE = 0x0001
+# FFAB_FLAG_CHECKSUMS: 索引表之后为校验和表，每一帧一个 CRC32（按存储的帧数据计算）
+FFAB_FLAG_CHECKSUMS = 0x0002
+# FFAB_FLAG_TRAILING_INDEX: 索引表位于文件末尾，由固定长度的索引尾部定位，写入方可以单遍流式写出（如管道、标准输出）
+FFAB_FLAG_TRAILING_INDEX = 0x0004
+
+# 当前支持的全部标志位，包含未知标志位的文件无法正确读取
+FFAB_KNOWN_FLAGS = FFAB_FLAG_SPARSE | FFAB_FLAG_CHECKSUMS | FFAB_FLAG_TRAILING_INDEX
+
+# astc 压缩格式定义与对应的编码映射，压缩格式同时匹配 astc block size (blockdim) 定义
+ASTC_FORMAT_CODES = {
+    '4x4': 0x0001,
+    '5x4': 0x0002,
+    '5x5': 0x0003,
+    '6x5': 0x0004,
+    '6x6': 0x0005,
+    '8x5': 0x0006,
+    '8x6': 0x0007,
+    '8x8': 0x0008,
+    '10x5': 0x0009,
+    '10x6': 0x000A,
+    '10x8': 0x000B,
+    '10x10': 0x000C,
+    '12x10': 0x000D,
+    '12x12': 0x000E
+}
+
+# 反向映射：从格式代码到格式名称
+ASTC_CODE_TO_FORMAT = {v: k for k, v in ASTC_FORMAT_CODES.items()}
+
+# 文件头（4字节）: 魔数(2字节) + 版本号(2字节)
+HEADER_STRUCT = struct.Struct('>HH')
+
+# 版本1 Meta信息区（8字节）: 图片数量(2字节) + 宽度(2字节) + 高度(2字节) + ASTC格式代码(2字节)
+META_V1_STRUCT = struct.Struct('>HHHH')
+
+# 版本2 Meta信息区（10字节）: 版本1 Meta信息区 + 标志位(2字节)
+META_V2_STRUCT = struct.Struct('>HHHHH')
+
+# 版本3 Meta信息区（16字节）: 图片数量(4字节) + 宽度(4字节) + 高度(4字节) + ASTC格式代码(2字节) + 标志位(2字节)
+META_V3_STRUCT = struct.Struct('>IIIHH')
+
+# 版本1与版本2 Meta信息区中图片数量、宽度与高度的上限，超过时编码工具写入版本3
+FFAB_V2_MAX_DIMENSION = 0xFFFF
+
+# 版本3 Meta信息区中图片数量、宽度与高度的上限
+FFAB_V3_MAX_DIMENSION = 0xFFFFFFFF
+
+# 版本1 索引项（12字节）: 偏移量(8字节) + 数据长度(4字节)
+INDEX_ENTRY_STRUCT = struct.Struct('>QI')
+
+# 版本3 索引表按列存储：全部偏移量（每项8字节），之后为全部数据长度（每项4字节），可以整块读入数组
+INDEX_OFFSET_TYPECODE = 'Q'
+INDEX_LENGTH_TYPECODE = 'I'
+
+# 版本2与版本3 校验和表项（4字节）: CRC32
+CHECKSUM_STRUCT = struct.Struct('>I')
+
+# 版本2与版本3 索引尾部（16字节，FFAB_FLAG_TRAILING_INDEX，位于文件末尾）:
+# 魔数 "FFIX"(4字节) + 图片数量(4字节) + 索引表偏移量(8字节)
+FFAB_INDEX_FOOTER_MAGIC = b'FFIX'
+INDEX_FOOTER_STRUCT = struct.Struct('>4sIQ')
+
+# 扩展区：位于图片数据区之后的可选元数据，只通过文件末尾的扩展区尾部定位。
+# 版本1与版本2的读取方只通过索引表访问图片数据，会忽略扩展区
+# 扩展区尾部（16字节）: 魔数 "FFEX"(4字节) + 扩展段数量(4字节) + 第一个扩展段的偏移量(8字节)
+FFAB_EXTENSION_MAGIC = b'FFEX'
+EXTENSION_FOOTER_STRUCT = struct.Struct('>4sIQ')
+
+# 扩展段头（8字节）: 标签(4字节 ASCII) + 数据长度(4字节)
+EXTENSION_SECTION_STRUCT = struct.Struct('>4sI')
+
+# 脏矩形扩展段：每一帧相对上一帧（第 0 帧相对最后一帧，即循环播放时的上一帧）发生变化的区域，以块为单位
+# 每一帧: 矩形数量(2字节) + 矩形数量 * (x, y, 宽, 高)(各2字节)
+EXTENSION_DIRTY_RECTS = 'DRCT'
+DIRTY_RECT_STRUCT = struct.Struct('>HHHH')
+
+# 预加载扩展段：文件开头的连续前缀包含文件头、Meta信息区、索引表与按播放顺序最先访问的帧，
+# 读取方打开文件时可以对该前缀发起一次预读 (readahead / madvise WILLNEED)
+# 数据: 前缀中的帧数量(4字节) + 前缀长度(8字节，从文件开头开始)
+EXTENSION_PRELOAD = 'PRLD'
+PRELOAD_STRUCT = struct.Struct('>IQ')
+
+# 版本号 -> 解析函数，解析函数接收整个文件的 memoryview 与版本号，返回文件信息字典
+FFAB_VERSION_PARSERS: Dict[int, Callable[[memoryview, int], Dict[str, Any]]] = {}
+
+
+def register_ffab_version(version: int):
+    """注册指定版本的解析函数（装饰器），新版本的文件布局通过此方法接入 parse_ffab"""
+    def decorator(parser: Callable[[memoryview, int], Dict[str, Any]]):
+        FFAB_VERSION_PARSERS[version] = parser
+        return parser
+    return decorator
+
+
+def check_astc_format(format_name: str) -> str:
+    """校验ASTC格式"""
+    format_name = format_name.lower()
+    if format_name in ASTC_FORMAT_CODES.keys():
+        return format_name
+    else:
+        raise ValueError(f"无效的ASTC格式: {format_name}")
+
+
+def get_astc_format_code(format_name: str) -> int:
+    """获取ASTC格式代码"""
+    format_name = format_name.lower()
+    if format_name in ASTC_FORMAT_CODES.keys():
+        return ASTC_FORMAT_CODES[format_name]
+    else:
+        raise ValueError(f"无效的ASTC格式: {format_name}")
+
+
+def get_astc_frame_data_size(width: int, height: int, astc_format: str) -> int:
+    """
+    计算单帧 ASTC 压缩数据的长度（不包括 astc header）
+
+    ASTC 每个块固定 16 字节，块数由图片尺寸向上取整到块大小得到，因此同一格式、同一尺寸的帧数据长度固定。
+    """
+    block_x, block_y = map(int, astc_format.split('x'))
+    blocks_x = (width + block_x - 1) // block_x
+    blocks_y = (height + block_y - 1) // block_y
+    return blocks_x * blocks_y * 16
+
+
+def generate_astc_header(width: int, height: int, astc_format: str) -> bytes:
+    """
+    生成ASTC文件头(16字节)
+    ```
+    struct astc_header
+    {
+        uint8_t magic[4];
+        uint8_t block_x;
+        uint8_t block_y;
+        uint8_t block_z;
+        uint8_t dim_x[3];
+        uint8_t dim_y[3];
+        uint8_t dim_z[3];
+    }
+    ```
+
+    Args:
+        width: 图片宽度
+        height: 图片高度
+        astc_format: ASTC格式 (4x4, 5x4, 5x5, 6x5, 6x6, 8x5, 8x6, 8x8, 10x5, 10x6, 10x8, 10x10, 12x10, 12x12)
+
+    Returns:
+        ASTC文件头数据
+    """
+    # 从 astc_format 中拆解 block_x 与 block_y
+    # 注意：二维图片中，block_z 固定为 1，dim_z 固定为 1
+    block_x, block_y = map(int, astc_format.split('x'))
+
+    # 构建ASTC文件头（使用大端序）
+    header = struct.pack('>4BBBB3B3B3B',
+                         0x13, 0xAB, 0xA1, 0x5C,
+                         block_x, block_y, 1,
+                         width & 0xFF, (width >> 8) & 0xFF, (width >> 16) & 0xFF,
+                         height & 0xFF, (height >> 8) & 0xFF, (height >> 16) & 0xFF,
+                         1, 0, 0)
+
+    return header
+
+
+def get_sparse_bitmap_size(width: int, height: int, astc_format: str) -> int:
+    """计算稀疏存储中每一帧块位图的字节数（每个块 1 位，向上取整到字节）"""
+    return (get_astc_frame_data_size(width, height, astc_format) // 16 + 7) // 8
+
+
+def _read_be_array(view: memoryview, typecode: str, offset: int, count: int) -> array:
+    """将大端序的整数序列整块读入 array（不为每一项创建 Python 对象）"""
+    values = array(typecode)
+    with view[offset:offset + count * values.itemsize] as part:
+        values.frombytes(part)
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values
+
+
+def _build_be_array(typecode: str, values) -> bytes:
+    """将整数序列编码为大端序字节串"""
+    values = array(typecode, values)
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_interleaved_index(view: memoryview, offset: int, count: int) -> Tuple[array, array]:
+    """
+    将版本1与版本2交错存储的索引项 (偏移量 8 字节 + 数据长度 4 字节) 整块读入两个 array
+
+    按字节位置跨步切片，把交错的索引项重排为按列存储后整块读入，不为每一项创建 Python 对象。
+    """
+    entry_size = INDEX_ENTRY_STRUCT.size
+    with view[offset:offset + count * entry_size] as part:
+        raw = part.tobytes()
+    offset_bytes = bytearray(count * 8)
+    for i in range(8):
+        offset_bytes[i::8] = raw[i::entry_size]
+    length_bytes = bytearray(count * 4)
+    for i in range(4):
+        length_bytes[i::4] = raw[8 + i::entry_size]
+    with memoryview(offset_bytes) as offset_view, memoryview(length_bytes) as length_view:
+        return (_read_be_array(offset_view, INDEX_OFFSET_TYPECODE, 0, count),
+                _read_be_array(length_view, INDEX_LENGTH_TYPECODE, 0, count))
+
+
+def _build_interleaved_index(offsets, lengths) -> bytes:
+    """将偏移量与数据长度编码为版本1与版本2交错存储的索引表，与 _read_interleaved_index 互逆"""
+    offset_bytes = _build_be_array(INDEX_OFFSET_TYPECODE, offsets)
+    length_bytes = _build_be_array(INDEX_LENGTH_TYPECODE, lengths)
+    entry_size = INDEX_ENTRY_STRUCT.size
+    index_table = bytearray(len(length_bytes) // 4 * entry_size)
+    for i in range(8):
+        index_table[i::entry_size] = offset_bytes[i::8]
+    for i in range(4):
+        index_table[8 + i::entry_size] = length_bytes[i::4]
+    return bytes(index_table)
+
+
+def get_index_entries(info: Dict[str, Any]) -> List[Tuple[int, int]]:
+    """返回文件信息字典中每一帧的 (偏移量, 数据长度) 列表，只在需要逐项处理的地方调用"""
+    return list(zip(info['offsets'], info['lengths']))
+
+
+@register_ffab_version(FFAB_VERSION_0x0001)
+@register_ffab_version(FFAB_VERSION_0x0002)
+@register_ffab_version(FFAB_VERSION_0x0003)
+def _parse_v1(view: memoryview, version: int) -> Dict[str, Any]:
+    """
+    解析版本1、版本2与版本3的 Meta信息区与索引表
+
+    版本2的 Meta信息区多出 2 字节标志位，索引表之后可能有校验和表；
+    版本3的图片数量、宽度与高度为 4 字节，索引表按列存储，整块读入数组。
+    """
+    meta_offset = HEADER_STRUCT.size
+    meta_struct = {FFAB_VERSION_0x0002: META_V2_STRUCT, FFAB_VERSION_0x0003: META_V3_STRUCT}.get(version, META_V1_STRUCT)
+    if len(view) < meta_offset + meta_struct.size:
+        raise ValueError("无效的FFAB文件: Meta信息区不完整")
+    image_count, width, height, astc_format_code, *rest = meta_struct.unpack_from(view, meta_offset)
+    flags = rest[0] if rest else 0
+    if flags & ~FFAB_KNOWN_FLAGS:
+        raise ValueError(f"不支持的FFAB标志位: 0x{flags:04X}")
+
+    if flags & FFAB_FLAG_TRAILING_INDEX:
+        # 索引表位于文件末尾：图片数据区紧跟 Meta信息区，图片数量与索引表偏移量从索引尾部读取
+        data_offset = meta_offset + meta_struct.size
+        footer_offset = len(view) - INDEX_FOOTER_STRUCT.size
+        if footer_offset < data_offset:
+            raise ValueError("无效的FFAB文件: 索引尾部不完整")
+        magic, image_count, index_offset = INDEX_FOOTER_STRUCT.unpack_from(view, footer_offset)
+        if magic != FFAB_INDEX_FOOTER_MAGIC:
+            raise ValueError("无效的FFAB文件: 索引尾部魔数不匹配，文件可能没有写入完成")
+        tables_end = footer_offset
+    else:
+        # 索引表紧跟 Meta信息区
+        index_offset = meta_offset + meta_struct.size
+        data_offset = None
+        tables_end = len(view)
+
+    # 校验和表紧跟索引表
+    index_end = index_offset + image_count * INDEX_ENTRY_STRUCT.size
+    checksum_end = index_end + (image_count * CHECKSUM_STRUCT.size if flags & FFAB_FLAG_CHECKSUMS else 0)
+    if index_end > tables_end:
+        raise ValueError(f"无效的FFAB文件: 索引表不完整 (图片数量: {image_count})")
+    if checksum_end > tables_end:
+        raise ValueError(f"无效的FFAB文件: 校验和表不完整 (图片数量: {image_count})")
+
+    if version == FFAB_VERSION_0x0003:
+        # 按列存储的索引表整块读入数组
+        offsets = _read_be_array(view, INDEX_OFFSET_TYPECODE, index_offset, image_count)
+        lengths = _read_be_array(view, INDEX_LENGTH_TYPECODE, index_offset + len(offsets) * offsets.itemsize,
+                                 image_count)
+    else:
+        # 交错存储的索引表按字节跨步拆分后整块读入数组
+        offsets, lengths = _read_interleaved_index(view, index_offset, image_count)
+
+    checksums = None
+    if flags & FFAB_FLAG_CHECKSUMS:
+        checksums = _read_be_array(view, INDEX_LENGTH_TYPECODE, index_end, image_count)
+    if data_offset is None:
+        data_offset = checksum_end
+
+    return {
+        'version': version,
+        'image_count': image_count,
+        'width': width,
+        'height': height,
+        'astc_format_code': astc_format_code,
+        'astc_format': ASTC_CODE_TO_FORMAT.get(astc_format_code),
+        'flags': flags,
+        'sparse': bool(flags & FFAB_FLAG_SPARSE),
+        'trailing_index': bool(flags & FFAB_FLAG_TRAILING_INDEX),
+        'index_offset': index_offset,
+        'data_offset': data_offset,
+        'offsets': offsets,
+        'lengths': lengths,
+        'checksums': checksums,
+    }
+
+
+def _build_index_table(version: int, offsets, lengths) -> bytes:
+    """构建索引表：版本1与版本2为 (偏移量, 数据长度) 交错存储，版本3按列存储"""
+    if version == FFAB_VERSION_0x0003:
+        return _build_be_array(INDEX_OFFSET_TYPECODE, offsets) + _build_be_array(INDEX_LENGTH_TYPECODE, lengths)
+    return _build_interleaved_index(offsets, lengths)
+
+
+def _select_version(image_count: int, width: int, height: int, astc_format_code: int, flags: int) -> Tuple[int, bytes]:
+    """
+    选择能表示文件的最低版本，返回版本号与 Meta信息区
+
+    图片数量、宽度或高度超过 FFAB_V2_MAX_DIMENSION 时为版本3，使用标志位时为版本2，否则为版本1。
+    """
+    if max(image_count, width, height) > FFAB_V3_MAX_DIMENSION:
+        raise ValueError(f"图片数量或尺寸超出FFAB文件上限 ({FFAB_V3_MAX_DIMENSION}): {image_count}, {width}x{height}")
+    if max(image_count, width, height) > FFAB_V2_MAX_DIMENSION:
+        return FFAB_VERSION_0x0003, META_V3_STRUCT.pack(image_count, width, height, astc_format_code, flags)
+    if flags:
+        return FFAB_VERSION_0x0002, META_V2_STRUCT.pack(image_count, width, height, astc_format_code, flags)
+    return FFAB_VERSION_0x0001, META_V1_STRUCT.pack(image_count, width, height, astc_format_code)
+
+
+def parse_ffab(buffer) -> Dict[str, Any]:
+    """
+    从缓冲区解析FFAB文件头、Meta信息区与索引表，按版本号分发到 FFAB_VERSION_PARSERS 中的解析函数
+
+    Args:
+        buffer: 支持缓冲区协议的对象（bytes、mmap 等），至少包含文件头、Meta信息区与索引表；
+            索引表位于文件末尾 (FFAB_FLAG_TRAILING_INDEX) 时必须为整个文件
+
+    Returns:
+        文件信息字典，包括 version、image_count、width、height、astc_format_code、astc_format
+        (未知格式代码时为 None)、flags（版本1为 0）、sparse、trailing_index、index_offset、data_offset、
+        offsets 与 lengths（每一帧的偏移量与数据长度，array）、checksums（每一帧的 CRC32，array，没有校验和表时为 None）；
+        需要 [(偏移量, 数据长度), ...] 列表时使用 get_index_entries
+
+    Raises:
+        ValueError: 如果文件格式无效或版本不支持
+    """
+    with memoryview(buffer) as view:
+        if len(view) < HEADER_STRUCT.size:
+            raise ValueError("无效的FFAB文件: 文件头不完整")
+
+        magic, version = HEADER_STRUCT.unpack_from(view, 0)
+        if magic != FFAB_MAGIC:
+            raise ValueError(f"无效的FFAB文件: 魔数不匹配 (期望: 0x{FFAB_MAGIC:04X}, 实际: 0x{magic:04X})")
+
+        parser = FFAB_VERSION_PARSERS.get(version)
+        if parser is None:
+            raise ValueError(f"不支持的FFAB文件版本: 0x{version:04X}")
+
+        info = parser(view, version)
+        info['magic'] = magic
+        return info
+
+
+def read_ffab_buffer(buffer) -> Dict[str, Any]:
+    """
+    从整个FFAB文件的缓冲区解析文件头、Meta信息区、索引表与扩展区
+
+    Args:
+        buffer: 整个FFAB文件的缓冲区（mmap、bytes 或多动画归档中一个动画的 memoryview 切片）
+
+    Returns:
+        parse_ffab 的文件信息字典，额外包括 file_size（缓冲区长度）、extensions（扩展区中的扩展段，标签 -> 数据）
+        与 preload（预加载前缀，参考 parse_preload）
+
+    Raises:
+        ValueError: 如果文件格式无效或版本不支持
+    """
+    with memoryview(buffer) as view:
+        info = parse_ffab(view)
+        # 版本1的最后一帧总是位于图片数据区末尾（播放器同样按最后一个索引项计算数据区长度，参考 write_ffab_file），
+        # 版本2与版本3的最后一帧可能位于预加载前缀中
+        if info['image_count'] and info['version'] == FFAB_VERSION_0x0001:
+            data_end = info['offsets'][-1] + info['lengths'][-1]
+        elif info['image_count']:
+            data_end = max(map(operator.add, info['offsets'], info['lengths']))
+        else:
+            data_end = info['data_offset']
+        # 索引表位于文件末尾时，扩展区位于索引表之前
+        extension_end = info['index_offset'] if info['trailing_index'] else len(view)
+        with view[:extension_end] as extension_view:
+            info['extensions'] = parse_ffab_extensions(extension_view, data_end)
+        info['file_size'] = len(view)
+        info['preload'] = parse_preload(info['extensions'].get(EXTENSION_PRELOAD), len(view))
+    return info
+
+
+def parse_preload(payload: Optional[bytes], file_size: int) -> Optional[Dict[str, int]]:
+    """
+    解析预加载扩展段
+
+    Args:
+        payload: 预加载扩展段数据，没有该扩展段时为 None
+        file_size: 文件大小，前缀长度超出文件时按文件大小截断
+
+    Returns:
+        {'frames': 前缀中的帧数量, 'offset': 前缀起始位置 (0), 'length': 前缀长度}，没有预加载扩展段时返回 None
+    """
+    if payload is None:
+        return None
+    if len(payload) < PRELOAD_STRUCT.size:
+        raise ValueError("无效的预加载数据: 长度不足")
+    frames, length = PRELOAD_STRUCT.unpack_from(payload)
+    return {'frames': frames, 'offset': 0, 'length': min(length, file_size)}
+
+
+def preload_ffab(fd: int, preload: Optional[Dict[str, int]]) -> int:
+    """
+    对文件的预加载前缀发起一次预读 (posix_fadvise WILLNEED)，第一帧不需要逐页等待缺页读取
+
+    通过 mmap 读取的播放器可以对同一范围调用 madvise(MADV_WILLNEED)。
+
+    Args:
+        fd: 打开的文件描述符
+        preload: 文件信息字典中的 preload（多动画归档中的动画起始位置相对归档文件开头）
+
+    Returns:
+        发起预读的字节数，没有预加载扩展段或平台不支持时返回 0
+    """
+    if not preload or not hasattr(os, 'posix_fadvise'):
+        return 0
+    os.posix_fadvise(fd, preload['offset'], preload['length'], os.POSIX_FADV_WILLNEED)
+    return preload['length']
+
+
+def read_ffab(file_path: str) -> Dict[str, Any]:
+    """
+    读取FFAB文件的文件头、Meta信息区与索引表
+
+    文件只打开一次并映射到内存，只有被解析的部分会被实际读取；索引表位于文件末尾时只读取文件头与文件末尾。
+
+    Args:
+        file_path: FFAB文件路径
+
+    Returns:
+        read_ffab_buffer 的文件信息字典
+
+    Raises:
+        ValueError: 如果文件格式无效或版本不支持
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER_STRUCT.size:
+            raise ValueError("无效的FFAB文件: 文件头不完整")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return read_ffab_buffer(mapped)
+
+
+def _frame_crc32(view: memoryview, offset: int, data_length: int) -> int:
+    """计算一帧数据的 CRC32，zlib.crc32 计算时释放 GIL，可以在多个线程中并行"""
+    with view[offset:offset + data_length] as frame:
+        return zlib.crc32(frame)
+
+
+def verify_ffab(file_path: str, executor: Optional[Executor] = None, jobs: Optional[int] = None) -> Dict[str, Any]:
+    """
+    校验FFAB文件的完整性，通过 mmap 映射整个文件后调用 verify_ffab_buffer
+
+    Args:
+        file_path: FFAB文件路径
+        executor: 共享的线程池，为 None 时创建并在结束时关闭新的线程池
+        jobs: 新线程池的线程数，为 None 时使用 CPU 核心数
+
+    Returns:
+        verify_ffab_buffer 的校验结果字典
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER_STRUCT.size:
+            raise ValueError("无效的FFAB文件: 文件头不完整")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return verify_ffab_buffer(mapped, executor, jobs)
+
+
+def verify_ffab_buffer(buffer, executor: Optional[Executor] = None, jobs: Optional[int] = None) -> Dict[str, Any]:
+    """
+    校验整个FFAB文件缓冲区的完整性
+
+    检查索引表中每一帧的数据范围是否在文件内，非稀疏存储时检查帧数据长度；
+    文件包含校验和表 (FFAB_FLAG_CHECKSUMS) 时，在线程池中并行计算每一帧的 CRC32。
+
+    Args:
+        buffer: 整个FFAB文件的缓冲区（mmap、bytes 或多动画归档中一个动画的 memoryview 切片）
+        executor: 共享的线程池，为 None 时创建并在结束时关闭新的线程池
+        jobs: 新线程池的线程数，为 None 时使用 CPU 核心数
+
+    Returns:
+        校验结果字典，包括 ok、frames、checksums（是否有校验和表）、bytes（校验的字节数）、seconds
+        与 errors（错误信息列表）
+    """
+    start_time = time.perf_counter()
+    errors = []
+    with memoryview(buffer) as view:
+        file_size = len(view)
+        info = parse_ffab(view)
+        frame_size = None
+        if info['astc_format'] is not None and not info['sparse']:
+            frame_size = get_astc_frame_data_size(info['width'], info['height'], info['astc_format'])
+
+        # 数据范围与长度
+        frames = []
+        for i, (offset, data_length) in enumerate(zip(info['offsets'], info['lengths'])):
+            if offset < info['data_offset'] or offset + data_length > file_size:
+                errors.append(f"第{i}帧数据超出文件范围 (偏移量: {offset}, 数据长度: {data_length})")
+            elif frame_size is not None and data_length != frame_size:
+                errors.append(f"第{i}帧数据长度 ({data_length}) 与尺寸不符 (期望: {frame_size})")
+            else:
+                frames.append((i, offset, data_length))
+
+        # 并行计算 CRC32，每一帧直接读取映射的文件，不复制数据
+        checked_bytes = 0
+        checksums = info['checksums']
+        if checksums is not None:
+            if executor is None:
+                executor_context = ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1)
+            else:
+                executor_context = contextlib.nullcontext(executor)
+            with executor_context as pool:
+                futures = [(i, data_length, pool.submit(_frame_crc32, view, offset, data_length))
+                           for i, offset, data_length in frames]
+                for i, data_length, future in futures:
+                    crc = future.result()
+                    checked_bytes += data_length
+                    if crc != checksums[i]:
+                        errors.append(f"第{i}帧校验和不匹配 (期望: 0x{checksums[i]:08X}, 实际: 0x{crc:08X})")
+
+    return {
+        'ok': not errors,
+        'frames': info['image_count'],
+        'checksums': checksums is not None,
+        'bytes': checked_bytes,
+        'seconds': time.perf_counter() - start_time,
+        'errors': errors,
+    }
+
+
+def build_ffab_extensions(sections: Dict[str, bytes], offset: int) -> bytes:
+    """
+    构建扩展区（扩展段 + 扩展区尾部）
+
+    Args:
+        sections: 标签 (4 个 ASCII 字符) -> 数据
+        offset: 扩展区在文件中的起始偏移量
+
+    Returns:
+        扩展区数据，sections 为空时返回空字节串
+    """
+    if not sections:
+        return b''
+    data = b''
+    for tag, payload in sections.items():
+        tag_bytes = tag.encode('ascii')
+        if len(tag_bytes) != 4:
+            raise ValueError(f"扩展段标签必须为 4 个 ASCII 字符: {tag}")
+        data += EXTENSION_SECTION_STRUCT.pack(tag_bytes, len(payload)) + payload
+    return data + EXTENSION_FOOTER_STRUCT.pack(FFAB_EXTENSION_MAGIC, len(sections), offset)
+
+
+def parse_ffab_extensions(view: memoryview, data_end: int) -> Dict[str, bytes]:
+    """
+    解析文件末尾的扩展区
+
+    Args:
+        view: 整个文件的 memoryview
+        data_end: 图片数据区的结束位置，扩展区不能与其重叠
+
+    Returns:
+        标签 -> 数据，没有扩展区时返回空字典
+
+    Raises:
+        ValueError: 如果扩展区尾部存在但扩展段不完整
+    """
+    footer_offset = len(view) - EXTENSION_FOOTER_STRUCT.size
+    if footer_offset < data_end:
+        return {}
+    magic, section_count, offset = EXTENSION_FOOTER_STRUCT.unpack_from(view, footer_offset)
+    if magic != FFAB_EXTENSION_MAGIC or not (data_end <= offset <= footer_offset):
+        return {}
+
+    sections = {}
+    for _ in range(section_count):
+        if offset + EXTENSION_SECTION_STRUCT.size > footer_offset:
+            raise ValueError("无效的FFAB文件: 扩展段不完整")
+        tag, length = EXTENSION_SECTION_STRUCT.unpack_from(view, offset)
+        offset += EXTENSION_SECTION_STRUCT.size
+        if offset + length > footer_offset:
+            raise ValueError(f"无效的FFAB文件: 扩展段 {tag.decode('ascii', 'replace')} 不完整")
+        sections[tag.decode('ascii', 'replace')] = bytes(view[offset:offset + length])
+        offset += length
+    return sections
+
+
+def build_dirty_rects(dirty_rects: List[List[Tuple[int, int, int, int]]]) -> bytes:
+    """将每一帧的脏矩形列表 [(x, y, 宽, 高), ...]（以块为单位）编码为脏矩形扩展段数据"""
+    data = b''
+    for rects in dirty_rects:
+        data += struct.pack('>H', len(rects)) + b''.join(DIRTY_RECT_STRUCT.pack(*rect) for rect in rects)
+    return data
+
+
+def parse_dirty_rects(payload: bytes, image_count: int) -> List[List[Tuple[int, int, int, int]]]:
+    """解析脏矩形扩展段数据，返回每一帧的矩形列表 [(x, y, 宽, 高), ...]（以块为单位）"""
+    dirty_rects = []
+    offset = 0
+    for _ in range(image_count):
+        if offset + 2 > len(payload):
+            raise ValueError("无效的脏矩形数据: 长度不足")
+        (count,) = struct.unpack_from('>H', payload, offset)
+        offset += 2
+        end = offset + count * DIRTY_RECT_STRUCT.size
+        if end > len(payload):
+            raise ValueError("无效的脏矩形数据: 长度不足")
+        dirty_rects.append(list(DIRTY_RECT_STRUCT.iter_unpack(payload[offset:end])))
+        offset = end
+    return dirty_rects
+
+
+def write_ffab_file(output_path: str, width: int, height: int, astc_format: str, compressed_frames: List[bytes],
+                    flags: int = 0, extensions: Optional[Dict[str, bytes]] = None,
+                    layout: Optional[Sequence[int]] = None, preload_frames: int = 0) -> None:
+    """
+    将已压缩的帧数据写入FFAB文件，flags 为 0 时写入版本1，否则写入版本2；
+    图片数量、宽度或高度超过 FFAB_V2_MAX_DIMENSION (65535) 时写入版本3
+
+    Args:
+        output_path: 输出文件路径
+        width: 图片宽度
+        height: 图片高度
+        astc_format: ASTC格式 (4x4, 5x4, 5x5, 6x5, 6x6, 8x5, 8x6, 8x8, 10x5, 10x6, 10x8, 10x10, 12x10, 12x12)
+        compressed_frames: 每一帧的数据；版本1为不包括 astc header 的压缩数据，
+            使用 FFAB_FLAG_SPARSE 时为块位图加非空块（参考 ffab.blocks.pack_sparse_frame）
+        flags: 版本2与版本3的标志位 (FFAB_FLAG_*)，包含 FFAB_FLAG_CHECKSUMS 时写入每一帧的 CRC32
+        extensions: 写入扩展区的扩展段，标签 (4 个 ASCII 字符) -> 数据，参考 build_ffab_extensions
+        layout: 图片数据区中帧的存储顺序（帧序号的排列，如按播放顺序最先访问的帧在前），为 None 时按帧序号顺序存储；
+            版本1播放器按最后一个索引项计算数据区长度，最后一帧（帧序号最大）不在预加载前缀中时移到数据区末尾，
+            位于预加载前缀中时（如倒序播放）保持在前缀中并写入版本2
+        preload_frames: 大于 0 时写入预加载扩展段，前缀包含存储顺序（即 layout）的前 preload_frames 帧
+    """
+    if not compressed_frames:
+        raise ValueError("没有可用的图片")
+    if flags & ~FFAB_KNOWN_FLAGS:
+        raise ValueError(f"不支持的FFAB标志位: 0x{flags:04X}")
+    if flags & FFAB_FLAG_TRAILING_INDEX:
+        raise ValueError("索引表位于文件末尾的文件请使用 open_ffab_stream 写出")
+
+    # 获取ASTC格式代码
+    astc_format_code = get_astc_format_code(astc_format)
+    image_count = len(compressed_frames)
+    preload_frames = min(preload_frames, image_count)
+
+    # 帧数据按存储顺序排列
+    last_frame_stored_last = True
+    if layout is None:
+        layout = range(image_count)
+    elif sorted(layout) != list(range(image_count)):
+        raise ValueError(f"帧存储顺序必须是全部 {image_count} 帧的一个排列")
+    elif image_count - 1 in layout[:preload_frames]:
+        # 预加载前缀必须包含按播放顺序最先访问的帧，最后一帧无法位于数据区末尾
+        last_frame_stored_last = layout[-1] == image_count - 1
+    elif layout[-1] != image_count - 1:
+        # 播放器按最后一个索引项的偏移量加数据长度映射图片数据区，最后一帧必须位于数据区末尾
+        layout = [i for i in layout if i != image_count - 1] + [image_count - 1]
+
+    # 准备文件头与Meta信息区（使用大端序），图片数量或尺寸超过版本2的上限时写入版本3；
+    # 最后一帧不在数据区末尾时写入版本2，版本1播放器会按最后一个索引项截断数据区
+    version, meta = _select_version(image_count, width, height, astc_format_code, flags)
+    if version == FFAB_VERSION_0x0001 and not last_frame_stored_last:
+        print(f"警告: 最后一帧位于预加载前缀中，无法存储在图片数据区末尾，写入版本2（仅支持版本1的播放器无法读取）")
+        version, meta = FFAB_VERSION_0x0002, META_V2_STRUCT.pack(image_count, width, height, astc_format_code, flags)
+    header = HEADER_STRUCT.pack(FFAB_MAGIC, version)
+
+    # 校验和表（FFAB_FLAG_CHECKSUMS），按写入文件的帧数据计算
+    checksum_table = b''
+    if flags & FFAB_FLAG_CHECKSUMS:
+        checksum_table = _build_be_array(INDEX_LENGTH_TYPECODE,
+                                         (zlib.crc32(compressed_data) for compressed_data in compressed_frames))
+
+    # 计算数据区起始位置
+    # 文件头(4字节) + Meta信息区 + 索引表(每项12字节) + 校验和表(每项4字节，可选)
+    data_start_offset = len(header) + len(meta) + (image_count * INDEX_ENTRY_STRUCT.size) + len(checksum_table)
+
+    # 准备索引表
+    offsets = [0] * image_count
+    lengths = [len(compressed_data) for compressed_data in compressed_frames]
+    current_offset = data_start_offset
+    preload_end = None
+    for position, i in enumerate(layout):
+        offsets[i] = current_offset
+        current_offset += lengths[i]
+        if position + 1 == preload_frames:
+            preload_end = current_offset
+    index_table = _build_index_table(version, offsets, lengths)
+
+    # 预加载前缀：文件头、Meta信息区、索引表、校验和表与存储顺序的前 preload_frames 帧
+    if preload_frames > 0:
+        extensions = dict(extensions or {})
+        extensions[EXTENSION_PRELOAD] = PRELOAD_STRUCT.pack(preload_frames, preload_end or current_offset)
+
+    # 扩展区紧跟图片数据区
+    extension_data = build_ffab_extensions(extensions or {}, current_offset)
+
+    # 先写入临时文件再替换，读取方（如播放器、监视模式下的预览）不会读到写入中的文件
+    temp_path = f'{output_path}.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            # 写入文件头
+            f.write(header)
+
+            # 写入Meta信息区
+            f.write(meta)
+
+            # 写入索引表
+            f.write(index_table)
+
+            # 写入校验和表
+            f.write(checksum_table)
+
+            # 按存储顺序写入图片数据
+            for i in layout:
+                f.write(compressed_frames[i])
+
+            # 写入扩展区
+            f.write(extension_data)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    # 输出统计信息
+    print_ffab_summary(output_path, version, flags, extensions, len(extension_data), image_count,
+                       width, height, astc_format, os.path.getsize(output_path))
+
+
+def build_ffab_prefix(width: int, height: int, astc_format: str, lengths: Sequence[int]) -> Tuple[int, bytes]:
+    """
+    构建按帧序号顺序存储、没有扩展区的FFAB文件（版本1，超过上限时为版本3）的文件头、Meta信息区与索引表
+
+    每一帧的数据长度预先已知时（如非稀疏存储的帧长度固定），先写出前缀，再按帧序号顺序逐帧追加数据，
+    结果与 write_ffab_file 写出的文件完全一致。
+
+    Args:
+        width: 图片宽度
+        height: 图片高度
+        astc_format: ASTC格式
+        lengths: 每一帧的数据长度
+
+    Returns:
+        (版本号, 前缀数据)
+    """
+    if not lengths:
+        raise ValueError("没有可用的图片")
+    image_count = len(lengths)
+    version, meta = _select_version(image_count, width, height, get_astc_format_code(astc_format), 0)
+    header = HEADER_STRUCT.pack(FFAB_MAGIC, version)
+    offsets = [0] * image_count
+    current_offset = len(header) + len(meta) + image_count * INDEX_ENTRY_STRUCT.size
+    for i, length in enumerate(lengths):
+        offsets[i] = current_offset
+        current_offset += length
+    return version, header + meta + _build_index_table(version, offsets, lengths)
+
+
+def print_ffab_summary(output_path: str, version: int, flags: int, extensions: Optional[Dict[str, bytes]],
+                       extension_size: int, image_count: int, width: int, height: int, astc_format: str,
+                       file_size: int) -> None:
+    """输出FFAB文件写入完成后的统计信息"""
+    print(f"\nFFAB文件创建成功:")
+    print(f"  输出文件: {output_path}")
+    print(f"  ffab 版本: 0x{version:04X}")
+    if flags & FFAB_FLAG_SPARSE:
+        print(f"  稀疏存储: 是")
+    if flags & FFAB_FLAG_CHECKSUMS:
+        print(f"  校验和: CRC32")
+    if flags & FFAB_FLAG_TRAILING_INDEX:
+        print(f"  索引表位置: 文件末尾")
+    if extensions:
+        print(f"  扩展区: {', '.join(extensions)} ({extension_size} 字节)")
+    if extensions and EXTENSION_PRELOAD in extensions:
+        preload = parse_preload(extensions[EXTENSION_PRELOAD], file_size)
+        print(f"  预加载: 前 {preload['frames']} 帧 ({preload['length']} 字节)")
+    print(f"  图片数量: {image_count}")
+    print(f"  图片尺寸: {width}x{height}")
+    print(f"  ASTC格式: {astc_format}")
+    print(f"  文件大小: {file_size} 字节")
+
+
+def open_ffab_stream(stream: BinaryIO, width: int, height: int, astc_format: str, flags: int = 0) -> Dict[str, Any]:
+    """
+    开始单遍写出FFAB文件（版本2 FFAB_FLAG_TRAILING_INDEX，宽度或高度超过 65535 时为版本3）
+
+    立即写出文件头与 Meta信息区，之后每一帧通过 write_ffab_stream_frame 立即写出，
+    finish_ffab_stream 最后写出扩展区、索引表、校验和表与索引尾部。写出过程中不需要 seek，
+    也不需要预先知道图片数量，因此可以写入管道、socket 或标准输出。
+
+    Args:
+        stream: 二进制输出流
+        width: 图片宽度
+        height: 图片高度
+        astc_format: ASTC格式
+        flags: 额外的版本2标志位 (FFAB_FLAG_*)，FFAB_FLAG_TRAILING_INDEX 总是被设置
+
+    Returns:
+        写出状态，传给 write_ffab_stream_frame 与 finish_ffab_stream
+    """
+    flags |= FFAB_FLAG_TRAILING_INDEX
+    if flags & ~FFAB_KNOWN_FLAGS:
+        raise ValueError(f"不支持的FFAB标志位: 0x{flags:04X}")
+
+    # 写出时图片数量未知，Meta信息区中的图片数量为 0，以索引尾部为准（4字节，不受版本2的上限限制）
+    version, meta = _select_version(0, width, height, get_astc_format_code(astc_format), flags)
+    header = HEADER_STRUCT.pack(FFAB_MAGIC, version)
+    stream.write(header + meta)
+    return {
+        'stream': stream,
+        'version': version,
+        'flags': flags,
+        'width': width,
+        'height': height,
+        'astc_format': astc_format,
+        'offset': len(header) + len(meta),
+        'offsets': array(INDEX_OFFSET_TYPECODE),
+        'lengths': array(INDEX_LENGTH_TYPECODE),
+        'checksums': array(INDEX_LENGTH_TYPECODE),
+    }
+
+
+def write_ffab_stream_frame(state: Dict[str, Any], compressed_data: bytes) -> None:
+    """写出一帧数据并记录索引项（与校验和），数据格式参考 write_ffab_file 的 compressed_frames"""
+    state['stream'].write(compressed_data)
+    state['offsets'].append(state['offset'])
+    state['lengths'].append(len(compressed_data))
+    if state['flags'] & FFAB_FLAG_CHECKSUMS:
+        state['checksums'].append(zlib.crc32(compressed_data))
+    state['offset'] += len(compressed_data)
+
+
+def finish_ffab_stream(state: Dict[str, Any], extensions: Optional[Dict[str, bytes]] = None) -> int:
+    """
+    写出扩展区、索引表、校验和表与索引尾部，完成单遍写出
+
+    Args:
+        state: open_ffab_stream 返回的写出状态
+        extensions: 写入扩展区的扩展段，参考 write_ffab_file
+
+    Returns:
+        写出的文件大小（字节）
+    """
+    image_count = len(state['offsets'])
+    if not image_count:
+        raise ValueError("没有可用的图片")
+
+    # 扩展区紧跟图片数据区，索引表紧跟扩展区
+    extension_data = build_ffab_extensions(extensions or {}, state['offset'])
+    index_offset = state['offset'] + len(extension_data)
+    tables = (_build_index_table(state['version'], state['offsets'], state['lengths'])
+              + _build_be_array(INDEX_LENGTH_TYPECODE, state['checksums']))
+    footer = INDEX_FOOTER_STRUCT.pack(FFAB_INDEX_FOOTER_MAGIC, image_count, index_offset)
+    state['stream'].write(extension_data + tables + footer)
+    state['stream'].flush()
+    state['extension_size'] = len(extension_data)
+    return index_offset + len(tables) + len(footer)
+
+
+def write_ffab_file_v1(output_path: str, width: int, height: int, astc_format: str, compressed_frames: List[bytes]) -> None:
+    """
+    将已压缩的帧数据写入FFAB文件 (版本1)
+    `版本1 (0x0001) 定义内容概括：
+    1. 文件头(4字节):FFAB_MAGIC (0xFFAB) + 版本号(0x0001)
+    2. Meta信息区(8字节):图片数量(2字节) + 图片宽度(2字节) + 图片高度(2字节) + ASTC格式代码(2字节)
+    3. 索引表(每项12字节):每个索引项包含数据偏移量(8字节) + 数据长度(4字节)
+    4. 数据区:连续存储所有图片的ASTC压缩数据, 不包括 astc header (16字节)
+    图片数量、宽度或高度超过 65535 时写入版本3
+
+    Args:
+        output_path: 输出文件路径
+        width: 图片宽度
+        height: 图片高度
+        astc_format: ASTC格式 (4x4, 5x4, 5x5, 6x5, 6x6, 8x5, 8x6, 8x8, 10x5, 10x6, 10x8, 10x10, 12x10, 12x12)
+        compressed_frames: 每一帧不包括 astc header 的压缩数据
+    """
+    write_ffab_file(output_path, width, height, astc_format, compressed_frames)
@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 文件信息查看工具
+读取并显示FFAB格式文件的基本信息
+"""
+
+import os
+import sys
+import json
+import argparse
+import operator
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+from .archive import is_ffab_archive, load_ffab_archive, read_ffab_archive, verify_ffab_archive
+from .format import (
+    EXTENSION_DIRTY_RECTS,
+    FFAB_MAGIC,
+    FFAB_VERSION_PARSERS,
+    get_astc_frame_data_size,
+    parse_dirty_rects,
+    read_ffab,
+    verify_ffab,
+)
+
+
+def get_file_info(file_path: str, blocks: bool = False, check: bool = False,
+                  executor: Optional[Executor] = None, member: Optional[str] = None,
+                  entries: bool = False) -> Dict[str, Any]:
+    """
+    获取FFAB文件的完整信息
+
+    Args:
+        file_path: FFAB文件路径，或多动画归档 (.ffar) 路径
+        blocks: 是否分析 ASTC 块数据（void-extent、透明与相同块统计，需要 numpy），结果位于 'blocks'
+        check: 是否校验文件完整性（数据范围、帧长度与校验和），结果位于 'check'，参考 verify_ffab
+        executor: 校验使用的共享线程池
+        member: 归档中的动画名称，指定时获取该动画的信息（文件大小为动画的长度，偏移量相对归档文件开头）
+        entries: 是否在 index['entries'] 中列出每一帧的索引项（帧号、偏移量与数据长度），
+            不需要时不为每一帧创建对象，帧数很多的文件也能快速读取统计信息
+
+    Returns:
+        包含所有文件信息的字典
+    """
+    # 检查文件是否存在
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+
+    # 一次读取文件头、Meta信息区与索引表
+    if member is not None:
+        ffab = load_ffab_archive(file_path, [member])[member]
+    else:
+        ffab = read_ffab(file_path)
+    file_size = ffab['file_size']
+
+    header_info = {
+        'magic': ffab['magic'],
+        'version': ffab['version'],
+        'version_hex': f"0x{ffab['version']:04X}"
+    }
+
+    astc_format_code = ffab['astc_format_code']
+    meta_info = {
+        'image_count': ffab['image_count'],
+        'width': ffab['width'],
+        'height': ffab['height'],
+        'resolution': f"{ffab['width']}x{ffab['height']}",
+        'astc_format_code': astc_format_code,
+        'astc_format': ffab['astc_format'] or f"未知(0x{astc_format_code:04X})",
+        'astc_format_hex': f"0x{astc_format_code:04X}",
+        'flags': ffab['flags'],
+        'sparse': ffab['sparse'],
+        'checksums': ffab['checksums'] is not None,
+        'trailing_index': ffab['trailing_index']
+    }
+
+    # 索引表统计信息，直接在偏移量与数据长度数组上计算
+    data_lengths = ffab['lengths']
+    total_compressed_size = sum(data_lengths)
+    index_info = {
+        'index_start_offset': ffab['index_offset'],
+        'total_compressed_size': total_compressed_size,
+        'min_data_size': min(data_lengths, default=0),
+        'max_data_size': max(data_lengths, default=0),
+        'avg_data_size': total_compressed_size / len(data_lengths) if data_lengths else 0
+    }
+    if entries:
+        index_info['entries'] = [{'frame': i, 'offset': offset, 'data_length': data_length}
+                                 for i, (offset, data_length) in enumerate(zip(ffab['offsets'], data_lengths))]
+
+    # 数据区起始位置
+    data_start_offset = ffab['data_offset']
+
+    # 计算压缩比
+    uncompressed_size = meta_info['width'] * meta_info['height'] * 4 * meta_info['image_count']  # RGBA格式
+    compression_ratio = uncompressed_size / index_info['total_compressed_size'] if index_info['total_compressed_size'] > 0 else 0
+
+    # 扩展区：扩展段标签与大小，脏矩形扩展段解析为每一帧的矩形列表
+    extensions = ffab['extensions']
+    extension_info = {tag: len(payload) for tag, payload in extensions.items()}
+    dirty_rects = None
+    dirty_coverage = None
+    if EXTENSION_DIRTY_RECTS in extensions:
+        dirty_rects = parse_dirty_rects(extensions[EXTENSION_DIRTY_RECTS], ffab['image_count'])
+        if ffab['astc_format'] is not None and dirty_rects:
+            # 脏矩形覆盖的块占全部块的比例
+            blocks_per_frame = get_astc_frame_data_size(ffab['width'], ffab['height'], ffab['astc_format']) // 16
+            dirty_blocks = sum(w * h for rects in dirty_rects for _, _, w, h in rects)
+            dirty_coverage = dirty_blocks / (blocks_per_frame * len(dirty_rects))
+
+    # 帧数据是否按帧序号顺序存储（按播放顺序编码的文件可能不是）
+    offsets = ffab['offsets']
+    sequential_layout = all(map(operator.le, offsets, offsets[1:]))
+
+    info = {
+        'file_path': file_path,
+        'member': member,
+        'file_size': file_size,
+        'header': header_info,
+        'meta': meta_info,
+        'index': index_info,
+        'data_start_offset': data_start_offset,
+        'uncompressed_size': uncompressed_size,
+        'compression_ratio': compression_ratio,
+        'extensions': extension_info,
+        'dirty_rects': dirty_rects,
+        'dirty_coverage': dirty_coverage,
+        'sequential_layout': sequential_layout,
+        'preload': ffab['preload']
+    }
+
+    if check:
+        if member is not None:
+            info['check'] = verify_ffab_archive(file_path, [member], executor)[member]
+        else:
+            info['check'] = verify_ffab(file_path, executor)
+
+    # 块分析依赖 numpy，只在需要时导入
+    if blocks:
+        from .blocks import analyze_blocks
+        info['blocks'] = analyze_blocks(file_path, ffab)
+
+    return info
+
+
+def get_archive_info(file_path: str, check: bool = False, executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """
+    获取多动画归档的目录信息
+
+    Args:
+        file_path: 归档文件路径
+        check: 是否校验每个动画的完整性，结果位于每个动画的 'check'
+        executor: 校验使用的共享线程池
+
+    Returns:
+        归档信息字典，members 为按名称排序的动画列表
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+
+    archive = read_ffab_archive(file_path)
+    checks = verify_ffab_archive(file_path, executor=executor) if check else {}
+    members = []
+    for name, ffab in load_ffab_archive(file_path).items():
+        member = {
+            'name': name,
+            'offset': ffab['member_offset'],
+            'size': ffab['file_size'],
+            'version_hex': f"0x{ffab['version']:04X}",
+            'image_count': ffab['image_count'],
+            'resolution': f"{ffab['width']}x{ffab['height']}",
+            'astc_format': ffab['astc_format'] or f"未知(0x{ffab['astc_format_code']:04X})",
+            'flags': ffab['flags'],
+            'extensions': list(ffab['extensions']),
+        }
+        if name in checks:
+            member['check'] = checks[name]
+        members.append(member)
+
+    return {
+        'file_path': file_path,
+        'file_size': archive['file_size'],
+        'archive': {
+            'version': archive['version'],
+            'version_hex': f"0x{archive['version']:04X}",
+            'member_count': len(archive['names']),
+            'directory_size': archive['directory_size'],
+        },
+        'members': members,
+    }
+
+
+def print_archive_info(info: Dict[str, Any], verbose: bool = False) -> None:
+    """
+    打印多动画归档的目录信息
+
+    Args:
+        info: get_archive_info 的返回值
+        verbose: 是否显示每个动画的校验错误
+    """
+    archive = info['archive']
+    print("=" * 60)
+    print(f"FFAB归档信息: {info['file_path']}")
+    print("=" * 60)
+    print(f"文件大小: {info['file_size']:,} 字节 ({info['file_size'] / 1024:.2f} KB)")
+    print(f"归档版本: {archive['version_hex']}")
+    print(f"动画数量: {archive['member_count']}")
+    print(f"目录大小: {archive['directory_size']} 字节")
+
+    print(f"\n{'名称':<24} {'版本':<8} {'帧数':<8} {'尺寸':<12} {'格式':<8} {'大小'}")
+    print("-" * 60)
+    for member in info['members']:
+        flags = f" 标志位 0x{member['flags']:04X}" if member['flags'] else ''
+        print(f"{member['name']:<24} {member['version_hex']:<8} {member['image_count']:<8} "
+              f"{member['resolution']:<12} {member['astc_format']:<8} {member['size']:,} 字节{flags}")
+
+    checks = [member for member in info['members'] if 'check' in member]
+    if checks:
+        failed = [member for member in checks if not member['check']['ok']]
+        print("\n" + "-" * 60)
+        if failed:
+            print(f"完整性校验: 失败 ✗ ({len(failed)}/{len(checks)} 个动画)")
+        else:
+            print(f"完整性校验: 通过 ✓ ({len(checks)} 个动画)")
+        for member in failed:
+            print(f"  {member['name']}: {len(member['check']['errors'])} 个错误")
+            if verbose:
+                for error in member['check']['errors']:
+                    print(f"    {error}")
+
+    print("=" * 60)
+
+
+def print_block_info(blocks: Dict[str, Any], verbose: bool = False) -> None:
+    """
+    打印 ASTC 块分析结果
+
+    Args:
+        blocks: analyze_blocks 的返回值
+        verbose: 是否显示每一帧的统计
+    """
+    totals = blocks['totals']
+    estimates = blocks['estimates']
+    total_blocks = totals['blocks'] or 1
+
+    print("\n" + "-" * 60)
+    print("ASTC块分析:")
+    print("-" * 60)
+    print(f"块网格: {blocks['blocks_x']}x{blocks['blocks_y']} ({blocks['blocks_per_frame']} 块/帧)")
+    print(f"void-extent（单色）块: {totals['void_extent_blocks']:,} ({totals['void_extent_blocks'] / total_blocks * 100:.1f}%)")
+    print(f"完全透明块: {totals['transparent_blocks']:,} ({totals['transparent_blocks'] / total_blocks * 100:.1f}%)")
+    print(f"空块（RGBA 全为 0）: {totals['empty_blocks']:,} ({totals['empty_blocks'] / total_blocks * 100:.1f}%)")
+    print(f"与上一帧相同的块: {totals['identical_blocks']:,} ({totals['identical_blocks'] / total_blocks * 100:.1f}%)")
+
+    print("\n存储估算（只含块数据）:")
+    v1_bytes = estimates['v1_bytes'] or 1
+    for label, key in (('当前 (v1)', 'v1_bytes'), ('稀疏存储（跳过空块）', 'sparse_bytes'),
+                       ('增量存储（跳过相同块）', 'delta_bytes'), ('裁剪到非透明区域', 'crop_bytes')):
+        print(f"  {label}: {estimates[key]:,} 字节 ({estimates[key] / v1_bytes * 100:.1f}%)")
+
+    if verbose:
+        print(f"\n{'帧号':<8} {'单色块':<10} {'透明块':<10} {'相同块':<10} {'非透明区域（块）'}")
+        print("-" * 60)
+        for frame in blocks['frames']:
+            bbox = frame['bbox_blocks']
+            bbox_str = f"{bbox[2]}x{bbox[3]} @ ({bbox[0]}, {bbox[1]})" if bbox else "-"
+            print(f"{frame['frame']:<8} {frame['void_extent_blocks']:<10} {frame['transparent_blocks']:<10} "
+                  f"{frame['identical_blocks']:<10} {bbox_str}")
+
+
+def print_check_info(check: Dict[str, Any]) -> None:
+    """
+    打印完整性校验结果
+
+    Args:
+        check: verify_ffab 的返回值
+    """
+    print("\n" + "-" * 60)
+    if check['ok']:
+        if check['checksums']:
+            speed = check['bytes'] / 1024 / 1024 / check['seconds'] if check['seconds'] > 0 else 0
+            print(f"完整性校验: 通过 ✓ ({check['frames']} 帧, {check['bytes']:,} 字节, "
+                  f"{check['seconds']:.3f} 秒, {speed:.1f} MB/s)")
+        else:
+            print(f"完整性校验: 通过 ✓ ({check['frames']} 帧，文件没有校验和表，只检查了数据范围与长度)")
+    else:
+        print(f"完整性校验: 失败 ✗ ({len(check['errors'])} 个错误)")
+        for error in check['errors']:
+            print(f"  {error}")
+
+
+def print_file_info(info: Dict[str, Any], verbose: bool = False) -> None:
+    """
+    打印FFAB文件信息
+
+    Args:
+        info: 文件信息字典
+        verbose: 是否显示详细信息（索引表详情需要 get_file_info 的 entries 为 True）
+    """
+    print("=" * 60)
+    print(f"FFAB文件信息: {info['file_path']}")
+    if info['member'] is not None:
+        print(f"动画名称: {info['member']}")
+    print("=" * 60)
+
+    # 文件基本信息
+    print(f"文件大小: {info['file_size']:,} 字节 ({info['file_size'] / 1024:.2f} KB)")
+
+    # 文件头信息
+    header = info['header']
+    print(f"魔数: 0x{header['magic']:04X} {'✓' if header['magic'] == FFAB_MAGIC else '✗'}")
+    print(f"版本: {header['version_hex']} {'✓' if header['version'] in FFAB_VERSION_PARSERS else '✗'}")
+
+    # Meta信息
+    meta = info['meta']
+    print(f"图片数量: {meta['image_count']}")
+    print(f"图片尺寸: {meta['resolution']}")
+    print(f"ASTC格式: {meta['astc_format']} ({meta['astc_format_hex']})")
+    if meta['flags']:
+        print(f"标志位: 0x{meta['flags']:04X}")
+    if meta['sparse']:
+        print("稀疏存储: 是（每帧为块位图 + 非空块）")
+    if meta['checksums']:
+        print("校验和: CRC32（每帧）")
+    if meta['trailing_index']:
+        print("索引表位于文件末尾: 是（单遍写出）")
+
+    # 索引表信息
+    index = info['index']
+    print(f"索引表位置: 偏移量 {index['index_start_offset']}")
+    print(f"数据区位置: 偏移量 {info['data_start_offset']}")
+    print(f"压缩数据总大小: {index['total_compressed_size']:,} 字节 ({index['total_compressed_size'] / 1024:.2f} KB)")
+
+    # 压缩统计
+    print(f"压缩比: {info['compression_ratio']:.2f}:1")
+    print(f"每帧平均大小: {index['avg_data_size']:.2f} 字节")
+    print(f"最小帧大小: {index['min_data_size']} 字节")
+    print(f"最大帧大小: {index['max_data_size']} 字节")
+
+    # 扩展区信息
+    if info['extensions']:
+        print(f"扩展区: {', '.join(f'{tag} ({size} 字节)' for tag, size in info['extensions'].items())}")
+    dirty_rects = info['dirty_rects']
+    if dirty_rects:
+        coverage = f", 覆盖 {info['dirty_coverage'] * 100:.1f}% 的块" if info['dirty_coverage'] is not None else ''
+        print(f"脏矩形: 平均每帧 {sum(map(len, dirty_rects)) / len(dirty_rects):.1f} 个{coverage}")
+    if not info['sequential_layout']:
+        print("帧存储顺序: 按播放顺序（与帧序号顺序不同）")
+    preload = info['preload']
+    if preload:
+        print(f"预加载: 前 {preload['frames']} 帧, 前缀 {preload['length']:,} 字节 "
+              f"({preload['length'] / info['file_size'] * 100:.1f}%)")
+
+    # 详细信息
+    if verbose:
+        print("\n" + "-" * 60)
+        print("详细信息:")
+        print("-" * 60)
+        
+        print(f"未压缩总大小: {info['uncompressed_size']:,} 字节 ({info['uncompressed_size'] / 1024 / 1024:.2f} MB)")
+        print(f"压缩后总大小: {index['total_compressed_size']:,} 字节 ({index['total_compressed_size'] / 1024 / 1024:.2f} MB)")
+        print(f"空间节省: {info['uncompressed_size'] - index['total_compressed_size']:,} 字节 ({(1 - 1/info['compression_ratio'])*100:.1f}%)")
+
+        print("\n索引表详情:")
+        print(f"{'帧号':<8} {'偏移量':<12} {'数据长度':<12} {'数据大小'}")
+        print("-" * 50)
+        for entry in index.get('entries', []):
+            offset = entry['offset']
+            data_length = entry['data_length']
+            size_str = f"{data_length / 1024:.2f} KB" if data_length > 1024 else f"{data_length} B"
+            print(f"{entry['frame']:<8} {offset:<12} {data_length:<12} {size_str}")
+
+        if dirty_rects:
+            print("\n脏矩形详情（以块为单位，x, y, 宽, 高）:")
+            print("-" * 50)
+            for i, rects in enumerate(dirty_rects):
+                rects_str = ' '.join(f"({x},{y},{w},{h})" for x, y, w, h in rects) or "无变化"
+                print(f"{i:<8} {rects_str}")
+
+    if 'check' in info:
+        print_check_info(info['check'])
+
+    if 'blocks' in info:
+        print_block_info(info['blocks'], verbose)
+
+    print("=" * 60)
+
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='FFAB文件信息查看工具')
+    parser.add_argument('input_file', nargs='+', help='输入的FFAB文件或多动画归档 (.ffar) 路径，可以指定多个')
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示详细信息')
+    parser.add_argument('--blocks', action='store_true',
+                       help='分析ASTC块数据：统计 void-extent（单色）块、完全透明块与上一帧相同的块（需要 numpy）')
+    parser.add_argument('--check', action='store_true',
+                       help='校验文件完整性：检查数据范围与帧长度，文件包含校验和表时并行校验每一帧的 CRC32')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                       help='--check 并行校验的线程数 (默认: CPU核心数)')
+    parser.add_argument('--member', default=None,
+                       help='显示多动画归档中指定名称的动画的信息，不指定时列出归档中的全部动画')
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式输出文件信息')
+
+    args = parser.parse_args()
+
+    failed = False
+    results = []
+    with ThreadPoolExecutor(max_workers=args.jobs or os.cpu_count() or 1) as executor:
+        for input_file in args.input_file:
+            try:
+                # 获取文件信息，多动画归档未指定 --member 时列出全部动画
+                archive = args.member is None and is_ffab_archive(input_file)
+                if archive:
+                    info = get_archive_info(input_file, args.check, executor)
+                else:
+                    info = get_file_info(input_file, args.blocks, args.check, executor, args.member,
+                                         entries=args.verbose or args.json)
+            except Exception as e:
+                if args.json:
+                    results.append({'file_path': input_file, 'error': str(e)})
+                else:
+                    print(f"错误: {input_file}: {e}" if len(args.input_file) > 1 else f"错误: {e}")
+                failed = True
+                continue
+
+            if archive:
+                if not all(member['check']['ok'] for member in info['members'] if 'check' in member):
+                    failed = True
+            elif args.check and not info['check']['ok']:
+                failed = True
+
+            # 打印文件信息
+            if args.json:
+                results.append(info)
+            elif archive:
+                print_archive_info(info, args.verbose)
+            else:
+                print_file_info(info, args.verbose)
+
+    if args.json:
+        print(json.dumps(results[0] if len(results) == 1 else results, ensure_ascii=False, indent=2))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
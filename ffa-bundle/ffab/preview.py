@@ -0,0 +1,721 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 快速预览
+不调用 astcenc、不完整解码图片：通过 numpy 向量化解析每个 16 字节 ASTC 块的块模式、分区数量、颜色端点模式与
+颜色端点，以端点颜色的平均值近似整个块的平均颜色，得到每个块一个像素的缩略图（宽高为原图的 1/块宽 与 1/块高）。
+缩略图用于生成联系表 (contact sheet) 与动画预览 (GIF / WebP)，资源浏览工具可以在几秒内预览成千上万个动画。
+
+近似方式：
+- void-extent（单色）块直接使用块中的颜色
+- 其他块解码颜色端点（参考 ASTC 规范的 Integer Sequence Encoding 与颜色端点模式），每个分区取两个端点的中点，
+  各分区等权平均，不解码权重网格与分区表
+- 无效的块与 HDR 颜色端点模式（编码工具不会生成）与 astcenc 一样显示为品红色
+"""
+
+import os
+import sys
+import math
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError as e:
+    print(f"错误：缺少必要的依赖库 {e}")
+    print("请运行: pip install pillow numpy")
+    sys.exit(1)
+
+from .archive import is_ffab_archive, load_ffab_archive
+from .blocks import ASTC_BLOCK_SIZE, VOID_EXTENT_COLOR, as_blocks, read_frame_payload, void_extent_mask
+from .format import read_ffab
+
+# ASTC 量化等级（取值数量），序号即 ASTC 规范中的量化模式
+QUANT_LEVELS = (2, 3, 4, 5, 6, 8, 10, 12, 16, 20, 24, 32, 40, 48, 64, 80, 96, 128, 160, 192, 256)
+
+# 颜色端点允许的最低量化模式 (QUANT_6)
+MIN_COLOR_QUANT = 4
+
+# 每个块最多的颜色端点数值数量
+MAX_COLOR_VALUES = 18
+
+# 颜色端点区的起始位：单分区时位于颜色端点模式之后，多分区时位于分区序号与颜色端点模式之后
+COLOR_START_SINGLE = 17
+COLOR_START_MULTI = 29
+
+# LDR 颜色端点模式，其余为 HDR 模式（编码工具不会生成，预览时按无效块处理）
+LDR_ENDPOINT_MODES = (0, 1, 4, 5, 6, 8, 9, 10, 12, 13)
+
+# 无效块的颜色（与 astcenc 解码无效块的结果一致）
+ERROR_COLOR = (255, 0, 255, 255)
+
+# 颜色端点反量化参数 (三进制/五进制, 位数, B 的位布局, C)，参考 ASTC 规范 Color Unquantization
+# 位布局从第 8 位到第 0 位，a..f 为数值低位部分的第 0..5 位
+COLOR_UNQUANT_PARAMS = {
+    6: ('000000000', 204),
+    10: ('000000000', 113),
+    12: ('b000b0bb0', 93),
+    20: ('b0000bb00', 54),
+    24: ('cb000cbcb', 44),
+    40: ('cb0000cbc', 26),
+    48: ('dcb000dcb', 22),
+    80: ('dcb0000dc', 13),
+    96: ('edcb000ed', 11),
+    160: ('edcb0000e', 6),
+    192: ('fedcb000f', 5),
+}
+
+# 联系表默认的帧数量
+DEFAULT_SHEET_FRAMES = 16
+
+# 动画预览默认的帧率
+DEFAULT_PREVIEW_FPS = 24
+
+# 动画预览支持的输出格式
+ANIMATION_FORMATS = ('gif', 'webp', 'png')
+
+
+def _quant_encoding(quant: int) -> Tuple[int, int, int]:
+    """量化模式的编码方式：(三进制数量, 五进制数量, 位数)"""
+    levels = QUANT_LEVELS[quant]
+    if levels % 3 == 0:
+        return 1, 0, (levels // 3).bit_length() - 1
+    if levels % 5 == 0:
+        return 0, 1, (levels // 5).bit_length() - 1
+    return 0, 0, levels.bit_length() - 1
+
+
+def _ise_bit_count(count, quant: int):
+    """count 个数值以 Integer Sequence Encoding 编码后的位数，count 可以是 numpy 数组"""
+    trits, quints, bits = _quant_encoding(quant)
+    if trits:
+        return count * bits + (8 * count + 4) // 5
+    if quints:
+        return count * bits + (7 * count + 2) // 3
+    return count * bits
+
+
+@lru_cache(maxsize=None)
+def _block_mode_table() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    全部 2048 种二维块模式的解析结果
+
+    Returns:
+        (是否有效, 权重数据位数, 是否双平面) 三个数组，以块模式为下标
+    """
+    valid = np.zeros(2048, dtype=bool)
+    weight_bits = np.zeros(2048, dtype=np.int32)
+    dual_plane = np.zeros(2048, dtype=bool)
+    for mode in range(2048):
+        quant = (mode >> 4) & 1
+        h = (mode >> 9) & 1
+        d = (mode >> 10) & 1
+        a = (mode >> 5) & 3
+        if mode & 3:
+            quant |= (mode & 3) << 1
+            b = (mode >> 7) & 3
+            kind = (mode >> 2) & 3
+            if kind == 0:
+                x, y = b + 4, a + 2
+            elif kind == 1:
+                x, y = b + 8, a + 2
+            elif kind == 2:
+                x, y = a + 2, b + 8
+            elif mode & 0x100:
+                x, y = (b & 1) + 2, a + 2
+            else:
+                x, y = a + 2, (b & 1) + 6
+        else:
+            quant |= ((mode >> 2) & 3) << 1
+            if (mode >> 2) & 3 == 0:
+                continue
+            b = (mode >> 9) & 3
+            kind = (mode >> 7) & 3
+            if kind == 0:
+                x, y = 12, a + 2
+            elif kind == 1:
+                x, y = a + 2, 12
+            elif kind == 2:
+                x, y = a + 6, b + 6
+                d = h = 0
+            elif a == 0:
+                x, y = 6, 10
+            elif a == 1:
+                x, y = 10, 6
+            else:
+                continue
+
+        weight_count = x * y * (d + 1)
+        bits = _ise_bit_count(weight_count, quant - 2 + 6 * h)
+        if weight_count <= 64 and 24 <= bits <= 96:
+            valid[mode] = True
+            weight_bits[mode] = bits
+            dual_plane[mode] = bool(d)
+    return valid, weight_bits, dual_plane
+
+
+@lru_cache(maxsize=None)
+def _color_quant_table() -> np.ndarray:
+    """颜色端点的量化模式：[数值对数量, 可用位数] -> 能容纳的最高量化模式，无法容纳时为 -1"""
+    table = np.full((MAX_COLOR_VALUES // 2 + 1, 129), -1, dtype=np.int32)
+    for pairs in range(1, MAX_COLOR_VALUES // 2 + 1):
+        for bits in range(129):
+            for quant in range(len(QUANT_LEVELS) - 1, -1, -1):
+                if _ise_bit_count(pairs * 2, quant) <= bits:
+                    table[pairs, bits] = quant
+                    break
+    return table
+
+
+@lru_cache(maxsize=None)
+def _trit_table() -> np.ndarray:
+    """8 位三进制组 -> 5 个三进制数值，参考 ASTC 规范 Integer Sequence Encoding"""
+    table = np.zeros((256, 5), dtype=np.int32)
+    for t in range(256):
+        def bit(value, i):
+            return (value >> i) & 1
+        if (t >> 2) & 7 == 7:
+            c = (((t >> 5) & 7) << 2) | (t & 3)
+            t4 = t3 = 2
+        else:
+            c = t & 0x1F
+            if (t >> 5) & 3 == 3:
+                t4, t3 = 2, bit(t, 7)
+            else:
+                t4, t3 = bit(t, 7), (t >> 5) & 3
+        if c & 3 == 3:
+            t2, t1, t0 = 2, bit(c, 4), (bit(c, 3) << 1) | (bit(c, 2) & ~bit(c, 3) & 1)
+        elif (c >> 2) & 3 == 3:
+            t2, t1, t0 = 2, 2, c & 3
+        else:
+            t2, t1, t0 = bit(c, 4), (c >> 2) & 3, (bit(c, 1) << 1) | (bit(c, 0) & ~bit(c, 1) & 1)
+        table[t] = (t0, t1, t2, t3, t4)
+    return table
+
+
+@lru_cache(maxsize=None)
+def _quint_table() -> np.ndarray:
+    """7 位五进制组 -> 3 个五进制数值，参考 ASTC 规范 Integer Sequence Encoding"""
+    table = np.zeros((128, 3), dtype=np.int32)
+    for q in range(128):
+        def bit(value, i):
+            return (value >> i) & 1
+        if (q >> 1) & 3 == 3 and (q >> 5) & 3 == 0:
+            q2 = (bit(q, 0) << 2) | ((bit(q, 4) & ~bit(q, 0) & 1) << 1) | (bit(q, 3) & ~bit(q, 0) & 1)
+            q1 = q0 = 4
+        else:
+            if (q >> 1) & 3 == 3:
+                q2 = 4
+                c = (((q >> 3) & 3) << 3) | ((~(q >> 5) & 3) << 1) | bit(q, 0)
+            else:
+                q2 = (q >> 5) & 3
+                c = q & 0x1F
+            if c & 7 == 5:
+                q1, q0 = 4, (c >> 3) & 3
+            else:
+                q1, q0 = (c >> 3) & 3, c & 7
+        table[q] = (q0, q1, q2)
+    return table
+
+
+@lru_cache(maxsize=None)
+def _color_unquant_table() -> np.ndarray:
+    """颜色端点反量化表：[量化模式, 编码数值] -> 0..255，参考 ASTC 规范 Color Unquantization"""
+    table = np.zeros((len(QUANT_LEVELS), 256), dtype=np.int32)
+    for quant, levels in enumerate(QUANT_LEVELS):
+        trits, quints, bits = _quant_encoding(quant)
+        for value in range(levels):
+            if not (trits or quints):
+                # 只有二进制位时按位复制扩展到 8 位
+                result, filled = 0, 0
+                while filled < 8:
+                    result = (result << bits) | value
+                    filled += bits
+                table[quant, value] = result >> (filled - 8)
+                continue
+            if levels not in COLOR_UNQUANT_PARAMS:
+                continue
+            pattern, c = COLOR_UNQUANT_PARAMS[levels]
+            d, m = value >> bits, value & ((1 << bits) - 1)
+            a = 0x1FF if m & 1 else 0
+            b = 0
+            for char in pattern:
+                b = (b << 1) | (0 if char == '0' else (m >> (ord(char) - ord('a'))) & 1)
+            t = (d * c + b) ^ a
+            table[quant, value] = (a & 0x80) | (t >> 2)
+    return table
+
+
+def _as_words(blocks: np.ndarray) -> np.ndarray:
+    """将 (块数, 16) 的块数据转换为 (块数, 5) 的 uint64 数组：4 个小端序 32 位字，最后一列为 0（读取第 128 位之后时使用）"""
+    words = np.zeros((len(blocks), 5), dtype=np.uint64)
+    words[:, :4] = np.ascontiguousarray(blocks).view('<u4')
+    return words
+
+
+def _read_bits(words: np.ndarray, start: np.ndarray, count: int, end: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    按块读取从 start 开始的 count 位（低位在前，count 不超过 32），end 之后（以及第 128 位之后）的位按 0 处理
+
+    Args:
+        words: _as_words 的返回值
+        start: 每个块的起始位
+        count: 读取的位数
+        end: 每个块可读取的结束位，为 None 时读取到块末尾
+    """
+    rows = np.arange(len(words))
+    index = np.minimum(start >> 5, 4)
+    pair = words[rows, index] | (words[rows, np.minimum(index + 1, 4)] << np.uint64(32))
+    available = count if end is None else np.clip(end - start, 0, count)
+    mask = (np.int64(1) << available) - 1
+    return ((pair >> (start & 31).astype(np.uint64)).astype(np.int64) & mask).astype(np.int32)
+
+
+def _decode_ise(words: np.ndarray, quant: int, count: int, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """
+    解码 Integer Sequence Encoding 编码的前 count 个数值（超出序列长度的数值无意义）
+
+    Returns:
+        (块数, count) 的编码数值
+    """
+    trits, quints, width = _quant_encoding(quant)
+    values = np.zeros((len(words), count), dtype=np.int32)
+    if trits:
+        # 每组 5 个数值: m0 T[1:0] m1 T[3:2] m2 T[4] m3 T[6:5] m4 T[7]
+        for group in range(0, count, 5):
+            base = start + (group // 5) * (5 * width + 8)
+            packed = (_read_bits(words, base + width, 2, end)
+                      | _read_bits(words, base + 2 * width + 2, 2, end) << 2
+                      | _read_bits(words, base + 3 * width + 4, 1, end) << 4
+                      | _read_bits(words, base + 4 * width + 5, 2, end) << 5
+                      | _read_bits(words, base + 5 * width + 7, 1, end) << 7)
+            high = _trit_table()[packed]
+            for k, shift in enumerate((0, 2, 4, 5, 7)[:count - group]):
+                low = _read_bits(words, base + k * width + shift, width, end)
+                values[:, group + k] = high[:, k] << width | low
+    elif quints:
+        # 每组 3 个数值: m0 Q[2:0] m1 Q[4:3] m2 Q[6:5]
+        for group in range(0, count, 3):
+            base = start + (group // 3) * (3 * width + 7)
+            packed = (_read_bits(words, base + width, 3, end)
+                      | _read_bits(words, base + 2 * width + 3, 2, end) << 3
+                      | _read_bits(words, base + 3 * width + 5, 2, end) << 5)
+            high = _quint_table()[packed]
+            for k, shift in enumerate((0, 3, 5)[:count - group]):
+                low = _read_bits(words, base + k * width + shift, width, end)
+                values[:, group + k] = high[:, k] << width | low
+    else:
+        for k in range(count):
+            values[:, k] = _read_bits(words, start + k * width, width, end)
+    return values
+
+
+def _bit_transfer_signed(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """颜色端点模式中的 bit_transfer_signed：返回 (有符号偏移量, 基准值)"""
+    b = (b >> 1) | (a & 0x80)
+    a = (a >> 1) & 0x3F
+    return np.where(a & 0x20, a - 0x40, a), b
+
+
+def _blue_contract(r: np.ndarray, g: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return (r + b) >> 1, (g + b) >> 1, b
+
+
+def _decode_endpoints(mode: int, v: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按颜色端点模式将反量化后的数值转换为两个 RGBA 端点（LDR 模式），参考 ASTC 规范 Color Endpoint Decoding
+
+    Args:
+        mode: 颜色端点模式，LDR_ENDPOINT_MODES 之一
+        v: (块数, 8) 的反量化数值 (0..255)
+
+    Returns:
+        两个 (块数, 4) 的端点颜色
+    """
+    v0, v1, v2, v3, v4, v5, v6, v7 = (v[:, i] for i in range(8))
+    opaque = np.full_like(v0, 255)
+
+    if mode == 0:
+        # 亮度直接编码
+        e0, e1 = (v0, v0, v0, opaque), (v1, v1, v1, opaque)
+    elif mode == 1:
+        # 亮度基准值 + 偏移量
+        l0 = (v0 >> 2) | (v1 & 0xC0)
+        l1 = l0 + (v1 & 0x3F)
+        e0, e1 = (l0, l0, l0, opaque), (l1, l1, l1, opaque)
+    elif mode == 4:
+        # 亮度 + alpha 直接编码
+        e0, e1 = (v0, v0, v0, v2), (v1, v1, v1, v3)
+    elif mode == 5:
+        # 亮度 + alpha 基准值 + 偏移量
+        d1, b0 = _bit_transfer_signed(v1, v0)
+        d3, b2 = _bit_transfer_signed(v3, v2)
+        e0, e1 = (b0, b0, b0, b2), (b0 + d1, b0 + d1, b0 + d1, b2 + d3)
+    elif mode in (6, 10):
+        # RGB 基准值 + 缩放 (10: 另有两个 alpha)
+        a0, a1 = (opaque, opaque) if mode == 6 else (v4, v5)
+        e0, e1 = ((v0 * v3) >> 8, (v1 * v3) >> 8, (v2 * v3) >> 8, a0), (v0, v1, v2, a1)
+    elif mode in (8, 12):
+        # RGB(A) 直接编码，第二个端点的 RGB 之和小于第一个时使用 blue contraction 并交换端点
+        a0, a1 = (opaque, opaque) if mode == 8 else (v6, v7)
+        contract = (v1 + v3 + v5) < (v0 + v2 + v4)
+        e0 = tuple(np.where(contract, c, n) for c, n in zip((*_blue_contract(v1, v3, v5), a1), (v0, v2, v4, a0)))
+        e1 = tuple(np.where(contract, c, n) for c, n in zip((*_blue_contract(v0, v2, v4), a0), (v1, v3, v5, a1)))
+    else:
+        # 9 / 13: RGB(A) 基准值 + 偏移量，偏移量之和为负时使用 blue contraction 并交换端点
+        d1, b0 = _bit_transfer_signed(v1, v0)
+        d3, b2 = _bit_transfer_signed(v3, v2)
+        d5, b4 = _bit_transfer_signed(v5, v4)
+        d7, b6 = _bit_transfer_signed(v7, v6)
+        a0, a1 = (opaque, opaque) if mode == 9 else (b6, b6 + d7)
+        base = (b0, b2, b4, a0)
+        offset = (b0 + d1, b2 + d3, b4 + d5, a1)
+        contract = (d1 + d3 + d5) < 0
+        e0 = tuple(np.where(contract, c, n) for c, n in zip((*_blue_contract(*offset[:3]), a1), base))
+        e1 = tuple(np.where(contract, c, n) for c, n in zip((*_blue_contract(*base[:3]), a0), offset))
+    return np.clip(np.stack(e0, axis=1), 0, 255), np.clip(np.stack(e1, axis=1), 0, 255)
+
+
+def block_colors(blocks: np.ndarray) -> np.ndarray:
+    """
+    近似计算每个 ASTC 块的平均颜色，不解码权重网格与分区表
+
+    Args:
+        blocks: (块数, 16) 的 uint8 数组，参考 ffab.blocks.as_blocks
+
+    Returns:
+        (块数, 4) 的 RGBA uint8 数组
+    """
+    count = len(blocks)
+    colors = np.empty((count, 4), dtype=np.uint8)
+    colors[:] = ERROR_COLOR
+
+    # void-extent 块：LDR 颜色为 4 个小端序 uint16，取高 8 位
+    void = void_extent_mask(blocks)
+    hdr = (blocks[:, 1] & 0x02) != 0
+    void_colors = blocks[:, VOID_EXTENT_COLOR].view('<u2')
+    colors[void & ~hdr] = (void_colors[void & ~hdr] >> 8).astype(np.uint8)
+
+    # 其他块：块模式与分区数量
+    indices = np.flatnonzero(~void)
+    blocks = blocks[indices]
+    mode = blocks[:, 0].astype(np.int32) | (blocks[:, 1].astype(np.int32) & 7) << 8
+    partitions = ((blocks[:, 1] >> 3) & 3).astype(np.int32) + 1
+    mode_valid, mode_weight_bits, mode_dual_plane = _block_mode_table()
+    valid = mode_valid[mode] & ~(mode_dual_plane[mode] & (partitions == 4))
+    weight_bits = mode_weight_bits[mode]
+    words = _as_words(blocks)
+
+    # 颜色端点模式：单分区时为 4 位；多分区时低 6 位之后的部分位于权重数据之前
+    cem = np.full((len(blocks), 4), -1, dtype=np.int32)
+    single = partitions == 1
+    cem[single, 0] = _read_bits(words, np.full(len(blocks), 13), 4)[single]
+    encoded = _read_bits(words, np.full(len(blocks), 23), 6)
+    base_class = encoded & 3
+    extra_size = np.where(single | (base_class == 0), 0, 3 * partitions - 4)
+    extra = _read_bits(words, 128 - weight_bits - extra_size, 8, 128 - weight_bits)
+    encoded |= extra << 6
+    for p in range(4):
+        used = ~single & (p < partitions)
+        same = used & (base_class == 0)
+        cem[same, p] = encoded[same] >> 2
+        mixed = used & (base_class != 0)
+        c = (encoded >> (2 + p)) & 1
+        m = (encoded >> (2 + partitions + 2 * p)) & 3
+        cem[mixed, p] = (((c + base_class - 1) << 2) | m)[mixed]
+
+    # 颜色端点数值的数量与量化模式
+    value_count = np.where(cem >= 0, ((cem >> 2) + 1) * 2, 0).sum(axis=1)
+    color_bits = np.where(single, 111, 99) - weight_bits - extra_size - np.where(mode_dual_plane[mode], 2, 0)
+    color_bits = np.clip(color_bits, 0, 128)
+    quant = _color_quant_table()[np.minimum(value_count, MAX_COLOR_VALUES) // 2, color_bits]
+    valid &= (value_count <= MAX_COLOR_VALUES) & (quant >= MIN_COLOR_QUANT)
+
+    # 按量化模式分组解码颜色端点数值并反量化
+    start = np.where(single, COLOR_START_SINGLE, COLOR_START_MULTI)
+    values = np.zeros((len(blocks), MAX_COLOR_VALUES + 8), dtype=np.int32)
+    for q in np.unique(quant[valid]):
+        group = np.flatnonzero(valid & (quant == q))
+        group_count = value_count[group]
+        end = start[group] + _ise_bit_count(group_count, int(q))
+        decoded = _decode_ise(words[group], int(q), int(group_count.max()), start[group], end)
+        values[group, :decoded.shape[1]] = _color_unquant_table()[q][decoded]
+
+    # 每个分区取两个端点的中点，各分区等权平均；按颜色端点模式分组计算
+    total = np.zeros((len(blocks), 4), dtype=np.int32)
+    offset = np.zeros(len(blocks), dtype=np.int32)
+    for p in range(4):
+        used = np.flatnonzero(valid & (cem[:, p] >= 0))
+        if not used.size:
+            break
+        modes = cem[used, p]
+        partition_values = values[used[:, None], offset[used, None] + np.arange(8)]
+        for mode in np.unique(modes):
+            selected = modes == mode
+            if mode not in LDR_ENDPOINT_MODES:
+                valid[used[selected]] = False
+                continue
+            e0, e1 = _decode_endpoints(int(mode), partition_values[selected])
+            total[used[selected]] += e0 + e1
+        offset[used] += ((modes >> 2) + 1) * 2
+
+    average = (total + partitions[:, None]) // (2 * partitions[:, None])
+    colors[indices[valid]] = average[valid].astype(np.uint8)
+    return colors
+
+
+def frame_thumbnail(payload, width: int, height: int, astc_format: str) -> np.ndarray:
+    """
+    生成一帧的缩略图，每个块一个像素
+
+    Args:
+        payload: 不包括 astc header 的完整 ASTC 块数据
+        width: 图片宽度
+        height: 图片高度
+        astc_format: ASTC格式
+
+    Returns:
+        (高度方向块数, 宽度方向块数, 4) 的 RGBA uint8 数组
+    """
+    block_x, block_y = map(int, astc_format.split('x'))
+    blocks_x = (width + block_x - 1) // block_x
+    blocks_y = (height + block_y - 1) // block_y
+    blocks = as_blocks(payload)
+    if len(blocks) != blocks_x * blocks_y:
+        raise ValueError(f"帧数据长度 ({len(payload)}) 与尺寸不符 (期望: {blocks_x * blocks_y * ASTC_BLOCK_SIZE})")
+    return block_colors(blocks).reshape(blocks_y, blocks_x, 4)
+
+
+def iter_thumbnails(file_path: str, frames: Optional[Iterable[int]] = None,
+                    info: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    逐帧生成FFAB文件的缩略图，不调用 astcenc
+
+    Args:
+        file_path: FFAB文件路径，或多动画归档路径（此时 info 为归档中动画的文件信息）
+        frames: 帧序号序列（从 0 开始），为 None 时按顺序生成全部帧
+        info: 已读取的文件信息 (read_ffab 或 load_ffab_archive 的返回值)，为 None 时读取文件
+
+    Returns:
+        (帧序号, 缩略图) 的迭代器，参考 frame_thumbnail
+    """
+    info = info or read_ffab(file_path)
+    astc_format = info['astc_format']
+    if astc_format is None:
+        raise ValueError(f"未知的ASTC格式代码: 0x{info['astc_format_code']:04X}")
+    if frames is None:
+        frames = range(info['image_count'])
+
+    # 整个文件只读映射，每一帧按索引表切片，不复制数据
+    data = np.memmap(file_path, dtype=np.uint8, mode='r')
+    try:
+        for i in frames:
+            offset, data_length = info['offsets'][i], info['lengths'][i]
+            payload = read_frame_payload(data[offset:offset + data_length], info)
+            yield i, frame_thumbnail(payload, info['width'], info['height'], astc_format)
+    finally:
+        del data
+
+
+def thumbnail_image(thumbnail: np.ndarray, width: int, height: int, scale: int = 1) -> Image.Image:
+    """
+    将缩略图转换为 Pillow 图片，按原图宽高比校正非正方形块
+
+    Args:
+        thumbnail: frame_thumbnail 的返回值
+        width: 原图宽度
+        height: 原图高度
+        scale: 放大倍数（最近邻）
+    """
+    image = Image.fromarray(thumbnail, 'RGBA')
+    blocks_x = thumbnail.shape[1]
+    size = (blocks_x * scale, max(1, round(blocks_x * scale * height / width)))
+    if size != image.size:
+        image = image.resize(size, Image.NEAREST)
+    return image
+
+
+def sample_frames(image_count: int, count: int) -> List[int]:
+    """在全部帧中均匀选取 count 帧（包括第一帧）"""
+    if count <= 0 or count >= image_count:
+        return list(range(image_count))
+    return [i * image_count // count for i in range(count)]
+
+
+def build_contact_sheet(images: List[Image.Image], columns: Optional[int] = None, padding: int = 1) -> Image.Image:
+    """
+    将多张缩略图按行排列为一张联系表，背景透明
+
+    Args:
+        images: 尺寸相同的缩略图
+        columns: 每行的缩略图数量，为 None 时接近正方形排列
+        padding: 缩略图之间的间距（像素）
+    """
+    if not images:
+        raise ValueError("没有可用的缩略图")
+    columns = columns or math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    cell_width, cell_height = images[0].size
+    sheet = Image.new('RGBA', (columns * (cell_width + padding) + padding, rows * (cell_height + padding) + padding))
+    for i, image in enumerate(images):
+        row, column = divmod(i, columns)
+        sheet.paste(image, (padding + column * (cell_width + padding), padding + row * (cell_height + padding)))
+    return sheet
+
+
+def save_animated_preview(images: List[Image.Image], output_path: str, fps: float = DEFAULT_PREVIEW_FPS) -> None:
+    """
+    将缩略图序列保存为循环播放的动画预览，格式由扩展名决定 (.gif, .webp, .png 为 APNG)
+
+    Args:
+        images: 按帧顺序的缩略图
+        output_path: 输出文件路径
+        fps: 帧率
+    """
+    if not images:
+        raise ValueError("没有可用的缩略图")
+    duration = max(1, round(1000 / fps))
+    options = {'save_all': True, 'append_images': images[1:], 'duration': duration, 'loop': 0}
+    if output_path.lower().endswith('.gif'):
+        # 每一帧绘制前清除为透明，半透明像素在 GIF 中按 alpha 阈值处理
+        options['disposal'] = 2
+    elif output_path.lower().endswith('.webp'):
+        options['lossless'] = True
+    images[0].save(output_path, **options)
+
+
+def create_previews(file_path: str, output_prefix: str, info: Optional[Dict[str, Any]] = None,
+                    sheet_frames: int = DEFAULT_SHEET_FRAMES, columns: Optional[int] = None, scale: int = 1,
+                    fps: float = DEFAULT_PREVIEW_FPS, animation_format: Optional[str] = 'gif',
+                    sheet: bool = True) -> List[str]:
+    """
+    生成一个动画的联系表与动画预览
+
+    Args:
+        file_path: FFAB文件路径，或多动画归档路径（此时 info 为归档中动画的文件信息）
+        output_prefix: 输出路径前缀，联系表为 <前缀>_sheet.png，动画预览为 <前缀>.<格式>
+        info: 已读取的文件信息，为 None 时读取文件
+        sheet_frames: 联系表中均匀选取的帧数量，0 表示全部帧
+        columns: 联系表每行的缩略图数量，为 None 时接近正方形排列
+        scale: 缩略图放大倍数
+        fps: 动画预览的帧率
+        animation_format: 动画预览格式 (gif, webp, png)，为 None 时不生成
+        sheet: 是否生成联系表
+
+    Returns:
+        写出的文件路径列表
+    """
+    info = info or read_ffab(file_path)
+    image_count = info['image_count']
+    frames = range(image_count) if animation_format else sample_frames(image_count, sheet_frames)
+    images = {i: thumbnail_image(thumbnail, info['width'], info['height'], scale)
+              for i, thumbnail in iter_thumbnails(file_path, frames, info)}
+
+    Path(output_prefix).parent.mkdir(parents=True, exist_ok=True)
+    outputs = []
+    if sheet:
+        sheet_path = f'{output_prefix}_sheet.png'
+        build_contact_sheet([images[i] for i in sample_frames(image_count, sheet_frames)], columns).save(sheet_path)
+        outputs.append(sheet_path)
+    if animation_format:
+        animation_path = f'{output_prefix}.{animation_format}'
+        save_animated_preview([images[i] for i in range(image_count)], animation_path, fps)
+        outputs.append(animation_path)
+    return outputs
+
+
+def find_preview_inputs(input_path: str) -> List[str]:
+    """输入为文件夹时递归查找其中的 .ffab 与 .ffar 文件（按路径排序），否则返回输入文件本身"""
+    if not os.path.isdir(input_path):
+        return [input_path]
+    return sorted(str(path) for path in Path(input_path).rglob('*')
+                  if path.suffix.lower() in ('.ffab', '.ffar') and path.is_file())
+
+
+def _preview_file(file_path: str, output_dir: Optional[str], member: Optional[str],
+                  options: Dict[str, Any]) -> List[Tuple[str, List[str]]]:
+    """生成一个文件（多动画归档中的全部或指定动画）的预览，返回 (动画名称, 写出的文件路径列表) 列表"""
+    root = os.path.join(output_dir or os.path.dirname(file_path), Path(file_path).stem)
+    if member is None and not is_ffab_archive(file_path):
+        return [(file_path, create_previews(file_path, root, **options))]
+    members = load_ffab_archive(file_path, None if member is None else [member])
+    return [(f'{file_path}:{name}', create_previews(file_path, f'{root}_{name}', info, **options))
+            for name, info in members.items()]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='FFAB快速预览工具 - 不解码图片，从ASTC块的颜色端点生成缩略图、联系表与动画预览')
+    parser.add_argument('input', nargs='+', help='输入的FFAB文件、多动画归档 (.ffar)，或包含它们的文件夹（递归查找）')
+    parser.add_argument('-o', '--output-dir', default=None,
+                       help='输出文件夹 (默认: 与输入文件相同的文件夹)，输出为 <文件名>_sheet.png 与 <文件名>.<格式>，'
+                            '归档中的动画为 <文件名>_<动画名称>_sheet.png 等')
+    parser.add_argument('--member', default=None, help='只预览多动画归档中指定名称的动画 (默认: 全部动画)')
+    parser.add_argument('--sheet-frames', type=int, default=DEFAULT_SHEET_FRAMES,
+                       help=f'联系表中均匀选取的帧数量，0 表示全部帧 (默认: {DEFAULT_SHEET_FRAMES})')
+    parser.add_argument('--columns', type=int, default=None, help='联系表每行的缩略图数量 (默认: 接近正方形排列)')
+    parser.add_argument('--scale', type=int, default=1, help='缩略图放大倍数，最近邻放大 (默认: 1，每个块一个像素)')
+    parser.add_argument('--fps', type=float, default=DEFAULT_PREVIEW_FPS,
+                       help=f'动画预览的帧率 (默认: {DEFAULT_PREVIEW_FPS})')
+    parser.add_argument('--animation-format', choices=ANIMATION_FORMATS, default='gif',
+                       help='动画预览格式，png 为 APNG (默认: gif)')
+    parser.add_argument('--no-sheet', action='store_true', help='不生成联系表')
+    parser.add_argument('--no-animation', action='store_true', help='不生成动画预览')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='并行处理的文件数量 (默认: CPU核心数)')
+
+    args = parser.parse_args()
+
+    try:
+        if args.scale < 1:
+            raise ValueError("放大倍数必须大于0")
+        if args.fps <= 0:
+            raise ValueError("帧率必须大于0")
+        if args.columns is not None and args.columns < 1:
+            raise ValueError("每行的缩略图数量必须大于0")
+        if args.no_sheet and args.no_animation:
+            raise ValueError("--no-sheet 与 --no-animation 不能同时指定")
+        input_files = [file_path for input_path in args.input for file_path in find_preview_inputs(input_path)]
+        if not input_files:
+            raise ValueError("没有找到FFAB文件")
+    except Exception as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    options = {
+        'sheet_frames': args.sheet_frames,
+        'columns': args.columns,
+        'scale': args.scale,
+        'fps': args.fps,
+        'animation_format': None if args.no_animation else args.animation_format,
+        'sheet': not args.no_sheet,
+    }
+
+    start_time = time.perf_counter()
+    failed = False
+    animations = 0
+    with ThreadPoolExecutor(max_workers=args.jobs or os.cpu_count() or 1) as executor:
+        futures = [(file_path, executor.submit(_preview_file, file_path, args.output_dir, args.member, options))
+                   for file_path in input_files]
+        for file_path, future in futures:
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"错误: {file_path}: {e}")
+                failed = True
+                continue
+            for name, outputs in results:
+                print(f"已预览: {name} -> {', '.join(outputs)}")
+                animations += 1
+
+    print(f"\n预览完成: {animations} 个动画, 耗时 {time.perf_counter() - start_time:.2f} 秒")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 编码常驻服务
+通过 ffab_encoder.py --serve 启动，在本地 Unix socket 上接收编码与解码任务（协议参考 ffab.client）。
+服务进程保持 numpy / Pillow 已导入、astcenc 已探测，所有任务共享同一个压缩线程池与压缩帧缓存，
+每个任务只需要 astcenc 的压缩时间。
+"""
+
+import os
+import json
+import time
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from . import decoder, encoder
+from .client import connect, get_default_socket_path
+
+
+def _raise_argument_error(message: str) -> None:
+    """替代 ArgumentParser.error，参数错误时抛出异常而不是退出服务进程"""
+    raise ValueError(f"参数错误: {message}")
+
+
+def _parse_args(parser, argv: List[str]):
+    """使用命令行的参数解析器解析请求中的参数"""
+    parser.error = _raise_argument_error
+    return parser.parse_args(argv)
+
+
+def _resolve_path(cwd: str, path: Optional[str]) -> Optional[str]:
+    """将请求中的相对路径转换为基于客户端工作目录的绝对路径"""
+    if path is None:
+        return None
+    return os.path.join(cwd, os.path.expanduser(path))
+
+
+def _encode(request: Dict[str, Any], state: Dict[str, Any], send) -> str:
+    """执行编码任务，返回输出文件路径"""
+    args = _parse_args(encoder.build_arg_parser(), request.get('argv', []))
+    if args.input_path is None or args.output_file is None:
+        raise ValueError("需要指定 input_path 与 output_file")
+    if args.watch or args.serve:
+        raise ValueError("常驻服务不支持 --watch 与 --serve")
+    if args.output_file == encoder.STDOUT_PATH:
+        raise ValueError("常驻服务不支持输出到标准输出")
+    cwd = request.get('cwd') or os.getcwd()
+    args.input_path = _resolve_path(cwd, args.input_path)
+    args.output_file = _resolve_path(cwd, args.output_file)
+    # 并行帧数量上限与CPU预算以服务启动时为准，编码函数再按帧数量分配 astcenc -j
+    args.jobs = args.jobs or state['jobs']
+    args.cpu_budget = args.cpu_budget or state['cpu_budget']
+
+    def progress(img_name: str, done: int, total: Optional[int]) -> None:
+        send({'event': 'progress', 'frame': img_name, 'done': done, 'total': total})
+
+    encoder.run_encode(args, state['executor'], progress, state['frame_cache'])
+    return args.output_file
+
+
+def _decode(request: Dict[str, Any], state: Dict[str, Any], send) -> str:
+    """执行解码任务，返回输出路径"""
+    args = _parse_args(decoder.build_arg_parser(), request.get('argv', []))
+    if args.output_format == 'pipe' and not args.extract:
+        raise ValueError("常驻服务不支持 pipe 输出格式")
+    if args.output is None:
+        raise ValueError("--extract 需要指定输出文件夹" if args.extract else f"{args.output_format} 格式需要指定输出路径")
+    cwd = request.get('cwd') or os.getcwd()
+    input_file = _resolve_path(cwd, args.input_file)
+    output = _resolve_path(cwd, args.output)
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"输入文件不存在: {input_file}")
+
+    if args.extract:
+        # 解包不解码，直接复制归档中的动画数据
+        decoder.extract_ffab_archive(input_file, output, None if args.member is None else [args.member])
+        return output
+
+    def progress(done: int, total: int) -> None:
+        send({'event': 'progress', 'done': done, 'total': total})
+
+    decoder.decode_ffab_file(input_file, output, args.output_format, args.compress_level, args.jobs, progress,
+                             args.member)
+    return output
+
+
+def handle_connection(conn: socket.socket, state: Dict[str, Any]) -> None:
+    """处理一个客户端连接：读取一条请求，执行任务并返回进度与结果"""
+    def send(event: Dict[str, Any]) -> None:
+        conn.sendall((json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    with conn, conn.makefile('r', encoding='utf-8') as reader:
+        try:
+            request = json.loads(reader.readline())
+            op = request.get('op')
+            start_time = time.perf_counter()
+
+            if op == 'encode':
+                output = _encode(request, state, send)
+            elif op == 'decode':
+                output = _decode(request, state, send)
+            elif op == 'ping':
+                output = state['socket_path']
+            elif op == 'shutdown':
+                output = state['socket_path']
+                state['stopping'].set()
+                # 连接一次 socket，唤醒阻塞在 accept 的主线程
+                wake = connect(state['socket_path'])
+                if wake is not None:
+                    wake.close()
+            else:
+                raise ValueError(f"未知的任务类型: {op}")
+
+            cache = state['frame_cache']
+            send({
+                'event': 'done',
+                'output': output,
+                'seconds': time.perf_counter() - start_time,
+                'cache': {'entries': len(cache['entries']), 'size': cache['size'],
+                          'hits': cache['hits'], 'misses': cache['misses']},
+            })
+        except Exception as e:
+            print(f"错误: {e}")
+            try:
+                send({'event': 'error', 'message': str(e)})
+            except OSError:
+                # 客户端已断开
+                pass
+
+
+def serve(socket_path: Optional[str] = None, jobs: Optional[int] = None, cpu_budget: Optional[int] = None,
+          cache_size: int = 256 * 1024 * 1024) -> None:
+    """
+    启动常驻服务，直到收到 shutdown 请求、SIGINT 或 SIGTERM
+
+    Args:
+        socket_path: Unix socket 路径，为 None 时使用 get_default_socket_path()
+        jobs: 共享线程池的并行帧数量，为 None 时根据 CPU 预算自动计算
+        cpu_budget: CPU预算，为 None 时自动检测
+        cache_size: 压缩帧缓存的字节数上限
+    """
+    socket_path = socket_path or get_default_socket_path()
+
+    # 已有服务在运行时不重复启动；socket 文件残留（服务异常退出）时删除
+    if os.path.exists(socket_path):
+        existing = connect(socket_path)
+        if existing is not None:
+            existing.close()
+            raise RuntimeError(f"常驻服务已在运行: {socket_path}")
+        os.unlink(socket_path)
+
+    cpu_budget = cpu_budget or encoder.get_cpu_budget()
+    workers, astcenc_threads = encoder.plan_thread_budget(None, jobs, cpu_budget)
+    state = {
+        'socket_path': socket_path,
+        'jobs': workers,
+        'cpu_budget': cpu_budget,
+        'executor': ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ffab_serve'),
+        'frame_cache': encoder.create_frame_cache(cache_size),
+        'stopping': threading.Event(),
+    }
+
+    # bind 创建 socket 文件时即为 0600（umask 077），不存在其他用户可以连接的窗口；之后恢复原来的 umask
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o077)
+    try:
+        listener.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    os.chmod(socket_path, 0o600)
+    listener.listen()
+
+    # SIGTERM 与 Ctrl+C 一样结束服务
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    print(f"FFAB常驻服务已启动: {socket_path}")
+    print(f"astcenc: {encoder.get_astc_encoder()['path']}, CPU预算: {cpu_budget}, "
+          f"并行帧: {workers}, astcenc -j {astcenc_threads}, 压缩帧缓存: {cache_size / 1024 / 1024:.0f} MB")
+
+    try:
+        while not state['stopping'].is_set():
+            conn, _ = listener.accept()
+            if state['stopping'].is_set():
+                conn.close()
+                break
+            threading.Thread(target=handle_connection, args=(conn, state), daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        state['executor'].shutdown(wait=False, cancel_futures=True)
+        print("FFAB常驻服务已停止")
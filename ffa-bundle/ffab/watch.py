@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 监视模式
+监视图片文件夹，帧文件修改、新增或删除时只重新压缩变化的帧，使用保留的压缩数据重新写出FFAB文件。
+Linux 下通过 inotify 接收文件变化通知，其他平台或 inotify 不可用时定时轮询文件的修改时间。
+"""
+
+import io
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+from PIL import Image
+import numpy as np
+
+from .blocks import expand_sparse_frame
+from .encoder import (
+    EXTENSION_DIRTY_RECTS,
+    FFAB_FLAG_CHECKSUMS,
+    FFAB_FLAG_SPARSE,
+    SUPPORTED_FORMATS,
+    build_dirty_rects,
+    compress_frame,
+    compress_frame_adaptive,
+    generate_astc_header,
+    get_astc_frame_data_size,
+    get_dirty_rects,
+    pack_sparse_frame,
+    plan_thread_budget,
+    write_ffab_file,
+)
+
+# 默认轮询间隔（秒）
+DEFAULT_POLL_INTERVAL = 0.5
+
+# 收到变化通知后等待文件写入完成的时间（秒），期间的连续变化合并为一次更新
+DEBOUNCE_SECONDS = 0.2
+
+# inotify 事件：写入完成、移入、移出、创建、删除
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def scan_frame_files(folder: Path) -> Dict[str, os.stat_result]:
+    """扫描文件夹中的帧文件，忽略隐藏文件与不支持的文件（如编辑器的临时文件）"""
+    frame_files = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            if Path(entry.name).suffix.lower() in SUPPORTED_FORMATS:
+                frame_files[entry.name] = entry.stat()
+    return frame_files
+
+
+def _open_inotify(folder: Path) -> Optional[int]:
+    """创建 inotify 并监视文件夹，不可用时返回 None"""
+    libc_name = ctypes.util.find_library('c')
+    if libc_name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(folder), INOTIFY_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def iter_folder_changes(folder: Path, poll_interval: float = DEFAULT_POLL_INTERVAL) -> Iterator[None]:
+    """
+    文件夹中的文件发生变化时返回一次，连续的变化在 DEBOUNCE_SECONDS 内合并
+
+    优先使用 inotify，不可用时每 poll_interval 秒比较一次文件的修改时间与大小。
+    """
+    fd = _open_inotify(folder)
+    if fd is not None:
+        print("使用 inotify 监视文件变化")
+        try:
+            while True:
+                select.select([fd], [], [])
+                # 读取并丢弃事件，直到 DEBOUNCE_SECONDS 内没有新的事件
+                while select.select([fd], [], [], DEBOUNCE_SECONDS)[0]:
+                    os.read(fd, 64 * 1024)
+                yield
+        finally:
+            os.close(fd)
+
+    print(f"inotify 不可用，每 {poll_interval} 秒轮询文件变化")
+
+    def snapshot():
+        return {name: (st.st_mtime_ns, st.st_size) for name, st in scan_frame_files(folder).items()}
+
+    previous = snapshot()
+    while True:
+        time.sleep(poll_interval)
+        current = snapshot()
+        if current != previous:
+            # 等待写入完成后再更新
+            time.sleep(DEBOUNCE_SECONDS)
+            previous = snapshot()
+            yield
+
+
+def update_bundle(folder: Path, output_path: str, astc_format: str, state: Dict[str, Any],
+                  compress: Callable[[str, np.ndarray, bytes], bytes], executor: ThreadPoolExecutor) -> bool:
+    """
+    对比文件夹与上一次的状态，只重新压缩修改、新增的帧，删除已移除的帧，然后重新写出FFAB文件
+
+    修改时间与大小未变化的帧直接复用；修改时间变化但内容 hash 未变化的帧同样复用压缩数据。
+
+    Args:
+        folder: 图片文件夹
+        output_path: 输出的FFAB文件路径
+        astc_format: ASTC格式
+        state: 监视状态，包括 frames {名称: {mtime_ns, size, hash, payload}}、width、height、sparse、dirty_rects、checksums
+        compress: 压缩函数 compress(图片名称, 图片数据, astc_header) -> 不包括 astc header 的压缩数据
+        executor: 压缩使用的线程池
+
+    Returns:
+        FFAB文件是否被重新写出
+    """
+    start_time = time.perf_counter()
+    frames = state['frames']
+    current = scan_frame_files(folder)
+    if not current:
+        raise ValueError(f"文件夹中没有找到支持的图片格式: {SUPPORTED_FORMATS}")
+
+    removed = [name for name in frames if name not in current]
+    for name in removed:
+        del frames[name]
+
+    futures = {}
+    for name, st in sorted(current.items()):
+        entry = frames.get(name)
+        if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            continue
+
+        with open(folder / name, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry is not None and entry['hash'] == digest:
+            # 只有修改时间变化（如重新保存了相同的内容），复用压缩数据
+            entry['mtime_ns'], entry['size'] = st.st_mtime_ns, st.st_size
+            continue
+
+        with Image.open(io.BytesIO(data)) as img:
+            img_array = np.array(img.convert('RGBA'))
+        h, w = img_array.shape[:2]
+        if state['width'] is None:
+            state['width'], state['height'] = w, h
+            state['astc_header'] = generate_astc_header(w, h, astc_format)
+        elif (w, h) != (state['width'], state['height']):
+            raise ValueError(f"图片尺寸不一致: {name} ({w}x{h})，FFAB文件尺寸为 {state['width']}x{state['height']}")
+
+        future = executor.submit(compress, name, img_array, state['astc_header'])
+        futures[name] = (st, digest, future)
+
+    # 保留已成功压缩的帧，任一帧失败时不写出FFAB文件，下一次变化时重试失败的帧
+    errors = []
+    for name, (st, digest, future) in futures.items():
+        try:
+            payload = future.result()
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+            continue
+        if state['sparse']:
+            payload = pack_sparse_frame(payload)
+        frames[name] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'hash': digest, 'payload': payload}
+    if errors:
+        raise RuntimeError(f"压缩失败: {'; '.join(errors)}")
+
+    if not futures and not removed:
+        return False
+
+    payloads = [frames[name]['payload'] for name in sorted(frames)]
+    extensions = {}
+    if state['dirty_rects']:
+        # 帧顺序可能变化（新增、删除帧），每次重新计算全部帧的脏矩形
+        full_payloads = payloads
+        if state['sparse']:
+            blocks_per_frame = get_astc_frame_data_size(state['width'], state['height'], astc_format) // 16
+            full_payloads = [expand_sparse_frame(payload, blocks_per_frame) for payload in payloads]
+        extensions[EXTENSION_DIRTY_RECTS] = build_dirty_rects(
+            get_dirty_rects(full_payloads, state['width'], state['height'], astc_format))
+    flags = (FFAB_FLAG_SPARSE if state['sparse'] else 0) | (FFAB_FLAG_CHECKSUMS if state['checksums'] else 0)
+    write_ffab_file(output_path, state['width'], state['height'], astc_format, payloads, flags, extensions)
+    print(f"已更新: 重新压缩 {len(futures)} 帧, 删除 {len(removed)} 帧, 共 {len(frames)} 帧, "
+          f"耗时 {time.perf_counter() - start_time:.2f} 秒")
+    return True
+
+
+def watch_folder(input_path: str, output_path: str, astc_format: str, quality: Union[float, str],
+                 jobs: Optional[int] = None, astcenc_threads: Optional[int] = None,
+                 target: Optional[Dict[str, Any]] = None, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 sparse: bool = False, dirty_rects: bool = False, checksums: bool = False,
+                 cpu_budget: Optional[int] = None) -> None:
+    """
+    编码图片文件夹，然后监视文件夹变化并增量更新FFAB文件，直到 Ctrl+C
+
+    Args:
+        input_path: 图片文件夹路径
+        output_path: 输出的FFAB文件路径
+        astc_format: ASTC格式
+        quality: ASTC压缩质量 (0.0-100.0) 或速度预设
+        jobs: 并行压缩的帧数量，为 None 时根据 CPU 预算自动计算
+        astcenc_threads: 每个 astcenc 进程的线程数 (-j)，为 None 时根据 CPU 预算自动计算
+        target: 自适应质量目标，参考 encode_frames_to_ffab_v1
+        poll_interval: inotify 不可用时的轮询间隔（秒）
+        sparse: 是否使用稀疏存储（版本2），保留的压缩数据为稀疏存储格式
+        dirty_rects: 是否写入脏矩形扩展段
+        checksums: 是否写入校验和表
+        cpu_budget: CPU 预算，在并行帧与 astcenc -j 之间分配，为 None 时使用 get_cpu_budget()
+    """
+    folder = Path(input_path)
+    if not folder.is_dir():
+        raise FileNotFoundError(f"文件夹不存在: {input_path}")
+
+    # 监视期间帧数量会变化，按帧数量足够多分配
+    workers, planned_threads = plan_thread_budget(None, jobs, cpu_budget)
+    astcenc_threads = astcenc_threads or planned_threads
+    print(f"并行帧: {workers}, astcenc -j {astcenc_threads}")
+
+    def compress(img_name: str, img_data: np.ndarray, astc_header: bytes) -> bytes:
+        if target is None:
+            return compress_frame(img_name, img_data, astc_header, astc_format, quality, astcenc_threads)
+        payload, _ = compress_frame_adaptive(img_name, img_data, astc_header, astc_format,
+                                             target.get('min_psnr'), target.get('max_rmse'), astcenc_threads)
+        return payload
+
+    state = {'frames': {}, 'width': None, 'height': None, 'astc_header': b'', 'sparse': sparse,
+             'dirty_rects': dirty_rects, 'checksums': checksums}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        update_bundle(folder, output_path, astc_format, state, compress, executor)
+
+        print(f"\n正在监视文件夹: {input_path} (Ctrl+C 退出)")
+        try:
+            for _ in iter_folder_changes(folder, poll_interval):
+                try:
+                    update_bundle(folder, output_path, astc_format, state, compress, executor)
+                except Exception as e:
+                    print(f"错误: {e}")
+        except KeyboardInterrupt:
+            print("\n已停止监视")
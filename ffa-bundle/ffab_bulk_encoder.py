@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 批量编码工具
+扫描根目录下的所有图片序列文件夹，将所有文件夹的所有帧放到同一个线程池中统一调度，批量编码成FFAB文件
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    from PIL import Image
+    import numpy as np
+except ImportError as e:
+    print(f"错误：缺少必要的依赖库 {e}")
+    print("请运行: pip install pillow numpy")
+    sys.exit(1)
+
+from ffab.encoder import (
+    ASTC_FORMAT_CODES,
+    SUPPORTED_FORMATS,
+    ASTC_QUALITY_PRESETS,
+    check_astc_encoder,
+    check_astc_format,
+    compress_frame,
+    generate_astc_header,
+    get_astc_encoder,
+    get_cpu_budget,
+    plan_thread_budget,
+    write_ffab_file_v1,
+)
+
+
+def find_input_folders(input_root: str) -> List[Path]:
+    """
+    查找根目录下所有包含图片的文件夹（包括根目录自身），忽略隐藏文件夹与隐藏文件
+
+    Args:
+        input_root: 根目录路径
+
+    Returns:
+        按路径排序的文件夹列表
+    """
+    root = Path(input_root)
+    if not root.is_dir():
+        raise FileNotFoundError(f"文件夹不存在: {input_root}")
+
+    folders = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        # 原地修改 dir_names，os.walk 不再进入隐藏文件夹（如 .git）
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith('.'))
+        if any(Path(name).suffix.lower() in SUPPORTED_FORMATS for name in file_names if not name.startswith('.')):
+            folders.append(Path(dir_path))
+
+    return sorted(folders)
+
+
+def plan_bundle(folder: Path, input_root: Path, output_root: Path) -> Dict[str, Any]:
+    """
+    为单个图片文件夹生成编码任务，只读取图片文件头获取尺寸，不解码像素
+
+    Args:
+        folder: 图片文件夹
+        input_root: 输入根目录
+        output_root: 输出根目录
+
+    Returns:
+        包含帧文件列表、尺寸、输出路径与工作量估算的字典
+    """
+    image_files = []
+    for file in folder.iterdir():
+        if file.is_dir() or file.name.startswith('.'):
+            continue
+        if file.suffix.lower() not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的图片格式: {file}")
+        image_files.append(file)
+    image_files = sorted(image_files)
+
+    # 检查所有图片的尺寸是否一致
+    with Image.open(image_files[0]) as img:
+        width, height = img.size
+    for img_file in image_files[1:]:
+        with Image.open(img_file) as img:
+            if img.size != (width, height):
+                raise ValueError(f"图片尺寸不一致: {image_files[0].name} ({width}x{height}) vs {img_file.name} ({img.size[0]}x{img.size[1]})")
+
+    # 输出路径与输入目录结构对应，根目录自身以根目录名称命名；
+    # 在完整的文件夹名称后追加扩展名（walk.1 输出为 walk.1.ffab），不替换名称中的点号部分
+    relative = folder.relative_to(input_root)
+    if relative == Path('.'):
+        output_path = output_root / f"{input_root.resolve().name}.ffab"
+    else:
+        output_path = output_root / relative.parent / (relative.name + '.ffab')
+
+    return {
+        'folder': folder,
+        'image_files': image_files,
+        'width': width,
+        'height': height,
+        'output_path': output_path,
+        # 以总像素数估算压缩工作量
+        'cost': width * height * len(image_files),
+    }
+
+
+def compress_image_file(img_file: Path, astc_header: bytes, astc_format: str, quality: Union[float, str],
+                        astcenc_threads: Optional[int]) -> bytes:
+    """加载单个图片文件并压缩，返回不包括 astc header 的压缩数据"""
+    with Image.open(img_file) as img:
+        img_array = np.array(img.convert('RGBA'))
+    return compress_frame(img_file.name, img_array, astc_header, astc_format, quality, astcenc_threads)
+
+
+def build_bundles(bundles: List[Dict[str, Any]], astc_format: str, quality: Union[float, str], jobs: int,
+                  astcenc_threads: Optional[int] = None) -> List[Path]:
+    """
+    使用同一个线程池压缩所有文件夹的所有帧，工作量大的文件夹优先调度，文件夹的所有帧完成后立即写出FFAB文件
+
+    Args:
+        bundles: plan_bundle 生成的编码任务列表
+        astc_format: ASTC格式
+        quality: ASTC压缩质量 (0.0-100.0) 或速度预设
+        jobs: 并行压缩的帧数量
+        astcenc_threads: 每个 astcenc 进程的线程数 (-j)
+
+    Returns:
+        编码失败的文件夹列表
+    """
+    # 工作量大的文件夹先提交，线程池按提交顺序执行，缩短整体收尾时间
+    bundles = sorted(bundles, key=lambda b: b['cost'], reverse=True)
+
+    failed_folders = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        future_to_frame = {}
+        for bundle in bundles:
+            astc_header = generate_astc_header(bundle['width'], bundle['height'], astc_format)
+            bundle['compressed_frames'] = [None] * len(bundle['image_files'])
+            bundle['remaining'] = len(bundle['image_files'])
+            bundle['futures'] = []
+            for i, img_file in enumerate(bundle['image_files']):
+                future = executor.submit(compress_image_file, img_file, astc_header, astc_format, quality,
+                                         astcenc_threads)
+                future_to_frame[future] = (bundle, i)
+                bundle['futures'].append(future)
+
+        for future in as_completed(future_to_frame):
+            bundle, i = future_to_frame[future]
+            if future.cancelled() or bundle['folder'] in failed_folders:
+                continue
+
+            try:
+                bundle['compressed_frames'][i] = future.result()
+            except Exception as e:
+                print(f"错误: {bundle['folder']} 编码失败: {e}")
+                failed_folders.append(bundle['folder'])
+                # 取消该文件夹尚未开始的帧，释放已完成的压缩数据
+                for other in bundle['futures']:
+                    other.cancel()
+                bundle['compressed_frames'] = None
+                continue
+
+            bundle['remaining'] -= 1
+            if bundle['remaining'] == 0:
+                # 文件夹的所有帧已完成，立即写出FFAB文件
+                try:
+                    bundle['output_path'].parent.mkdir(parents=True, exist_ok=True)
+                    write_ffab_file_v1(str(bundle['output_path']), bundle['width'], bundle['height'],
+                                       astc_format, bundle['compressed_frames'])
+                except Exception as e:
+                    print(f"错误: {bundle['folder']} 写入失败: {e}")
+                    failed_folders.append(bundle['folder'])
+                bundle['compressed_frames'] = None
+
+    return failed_folders
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='FFAB批量编码工具 - 将根目录下的所有图片序列文件夹批量编码成FFAB格式')
+    parser.add_argument('input_root', help='输入根目录，其中每个包含图片的文件夹编码为一个FFAB文件')
+    parser.add_argument('output_root', help='输出根目录，FFAB文件按输入目录结构存放')
+    parser.add_argument('--format', choices=list(ASTC_FORMAT_CODES.keys()), default='6x6',
+                        help='ASTC压缩格式 (默认: 6x6)')
+    parser.add_argument('--quality', type=float, default=50,
+                        help='ASTC压缩质量 (0.0-100.0, 默认: 50)')
+    parser.add_argument('--preset', choices=ASTC_QUALITY_PRESETS, default=None,
+                        help='astcenc 速度预设，指定时替代 --quality')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='并行压缩的帧数量 (默认: 根据CPU预算自动计算)')
+    parser.add_argument('--cpu-budget', type=int, default=None,
+                        help='CPU预算，在并行帧与 astcenc -j 之间分配 (默认: 根据CPU亲和性与cgroup配额自动检测)')
+
+    args = parser.parse_args()
+
+    try:
+        # 只检查一次ASTC编码器是否可用
+        if not check_astc_encoder():
+            print("错误：未找到ASTC编码器 (astcenc)")
+            print("请从 https://github.com/ARM-software/astc-encoder 下载并安装")
+            sys.exit(1)
+
+        # 校验ASTC格式
+        astc_format = check_astc_format(args.format)
+
+        # 校验ASTC质量
+        if not (0 <= args.quality <= 100):
+            print("错误：ASTC质量必须在0-100之间")
+            sys.exit(1)
+        quality = args.preset or args.quality
+
+        input_root = Path(args.input_root)
+        output_root = Path(args.output_root)
+
+        # 查找所有图片文件夹并生成编码任务
+        folders = find_input_folders(args.input_root)
+        if not folders:
+            raise ValueError(f"根目录下没有找到包含图片的文件夹: {SUPPORTED_FORMATS}")
+
+        bundles = []
+        failed_folders = []
+        for folder in folders:
+            try:
+                bundles.append(plan_bundle(folder, input_root, output_root))
+            except Exception as e:
+                print(f"错误: {folder} 无法编码: {e}")
+                failed_folders.append(folder)
+
+        # 多个文件夹对应同一个输出文件时（如根目录 anim 与子文件夹 anim）都不编码，避免互相覆盖
+        output_folders = {}
+        for bundle in bundles:
+            output_folders.setdefault(bundle['output_path'], []).append(bundle['folder'])
+        for output_path, same_folders in output_folders.items():
+            if len(same_folders) > 1:
+                print(f"错误: {', '.join(str(f) for f in same_folders)} 对应同一个输出文件: {output_path}")
+                failed_folders += same_folders
+        bundles = [b for b in bundles if b['folder'] not in failed_folders]
+
+        total_frames = sum(len(b['image_files']) for b in bundles)
+        total_pixels = sum(b['cost'] for b in bundles)
+
+        # 在并行帧与 astcenc -j 之间分配CPU预算
+        cpu_budget = args.cpu_budget or get_cpu_budget()
+        jobs, astcenc_threads = plan_thread_budget(total_frames, args.jobs, cpu_budget)
+        print(f"astcenc: {get_astc_encoder()['path']}")
+        print(f"找到 {len(folders)} 个图片文件夹，共 {total_frames} 帧，"
+              f"CPU预算: {cpu_budget}, 并行帧: {jobs}, astcenc -j {astcenc_threads}")
+
+        start_time = time.perf_counter()
+        failed_folders += build_bundles(bundles, astc_format, quality, jobs, astcenc_threads)
+        elapsed = time.perf_counter() - start_time
+
+        output_size = sum(b['output_path'].stat().st_size for b in bundles
+                          if b['folder'] not in failed_folders and b['output_path'].exists())
+
+        # 输出吞吐量统计
+        print("\n=== 批量编码结果 ===")
+        print(f"成功: {len(folders) - len(failed_folders)} / {len(folders)} 个文件夹")
+        print(f"总帧数: {total_frames}")
+        print(f"总耗时: {elapsed:.2f} 秒")
+        if elapsed > 0:
+            print(f"吞吐量: {total_frames / elapsed:.2f} 帧/秒, {total_pixels / elapsed / 1e6:.2f} 百万像素/秒")
+        print(f"输出总大小: {output_size:,} 字节 ({output_size / 1024 / 1024:.2f} MB)")
+
+        if failed_folders:
+            print(f"失败文件夹: {', '.join(str(f) for f in failed_folders)}")
+            sys.exit(1)
+    except Exception as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 容器转换工具
+将FFAB文件导出为 .astc 文件或 KTX2 数组纹理，或将它们导入为FFAB文件，只复制压缩数据，不重新压缩
+
+命令行入口，实现位于 ffab.container，同时保持 `import ffab_container` 的导入方式可用
+"""
+
+from ffab.container import *  # noqa: F401,F403
+from ffab.container import main
+
+if __name__ == '__main__':
+    main()
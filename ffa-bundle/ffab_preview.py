@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 快速预览工具
+不调用 astcenc，从 ASTC 块的颜色端点生成缩略图、联系表与动画预览
+
+命令行入口，实现位于 ffab.preview，同时保持 `import ffab_preview` 的导入方式可用
+"""
+
+from ffab.preview import *  # noqa: F401,F403
+from ffab.preview import main
+
+if __name__ == '__main__':
+    main()
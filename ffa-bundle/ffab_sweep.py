@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FFAB 压缩格式扫描工具
+从图片序列或视频中采样少量帧，使用所有 ASTC 压缩格式与多个压缩质量并行压缩，
+测量 PSNR / SSIM、单帧字节数与单帧压缩耗时，输出 Pareto 前沿并根据体积或质量目标推荐压缩格式
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+    import numpy as np
+except ImportError as e:
+    print(f"错误：缺少必要的依赖库 {e}")
+    print("请运行: pip install pillow numpy")
+    sys.exit(1)
+
+from ffab.encoder import (
+    ASTC_FORMAT_CODES,
+    SUPPORTED_FORMATS,
+    build_astcenc_compress_command,
+    check_astc_encoder,
+    check_ffmpeg,
+    compute_psnr,
+    get_astc_encoder,
+    get_astc_frame_data_size,
+    get_cpu_budget,
+    is_archive_file,
+    is_video_file,
+    iter_frames_from_video,
+    load_images_from_archive,
+    plan_thread_budget,
+    write_astcenc_input,
+)
+
+# 默认采样帧数
+DEFAULT_SAMPLES = 4
+
+# 默认扫描的压缩质量
+DEFAULT_QUALITIES = (10.0, 50.0, 98.0)
+
+# SSIM 计算使用的窗口大小与常数
+SSIM_WINDOW = 7
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+
+def sample_frames(input_path: str, samples: int, fps: Optional[float] = None) -> Tuple[List[Tuple[str, np.ndarray]], int]:
+    """
+    从图片文件夹、压缩包或视频中均匀采样帧
+
+    图片文件夹只加载被采样的图片；压缩包需要顺序读取，加载全部图片后采样；视频只读取一遍，读取过程中保留的帧数超过 2 倍采样数时，
+    丢弃一半并加倍采样间隔，内存占用与视频长度无关。
+
+    Args:
+        input_path: 图片文件夹、压缩包或视频文件路径
+        samples: 采样帧数
+        fps: 视频输入时的抽帧帧率
+
+    Returns:
+        (采样帧列表, 总帧数)
+    """
+    if is_video_file(input_path):
+        if not check_ffmpeg():
+            raise RuntimeError("未找到 ffmpeg 或 ffprobe")
+        kept = []
+        stride = 1
+        frame_count = 0
+        for index, (img_name, img_data) in enumerate(iter_frames_from_video(input_path, fps)):
+            frame_count += 1
+            if index % stride != 0:
+                continue
+            kept.append((img_name, img_data.copy()))
+            if len(kept) > 2 * samples:
+                kept = kept[::2]
+                stride *= 2
+        if not kept:
+            raise ValueError(f"视频中没有读取到帧: {input_path}")
+        picked = [kept[i * len(kept) // samples] for i in range(min(samples, len(kept)))]
+        return picked, frame_count
+
+    if is_archive_file(input_path):
+        images = load_images_from_archive(input_path)
+        picked = [images[i * len(images) // samples] for i in range(min(samples, len(images)))]
+        return picked, len(images)
+
+    folder = Path(input_path)
+    if not folder.is_dir():
+        raise FileNotFoundError(f"文件夹不存在: {input_path}")
+    image_files = sorted(file for file in folder.iterdir() if file.suffix.lower() in SUPPORTED_FORMATS)
+    if not image_files:
+        raise ValueError(f"文件夹中没有找到支持的图片格式: {SUPPORTED_FORMATS}")
+
+    frames = []
+    for i in range(min(samples, len(image_files))):
+        img_file = image_files[i * len(image_files) // samples]
+        with Image.open(img_file) as img:
+            frames.append((img_file.name, np.array(img.convert('RGBA'))))
+    return frames, len(image_files)
+
+
+def _box_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """使用积分图计算每个窗口（valid 区域）的均值，values 为 (H, W, C)"""
+    integral = np.pad(values, ((1, 0), (1, 0), (0, 0))).cumsum(axis=0).cumsum(axis=1)
+    total = (integral[window:, window:] - integral[:-window, window:]
+             - integral[window:, :-window] + integral[:-window, :-window])
+    return total / (window * window)
+
+
+def compute_ssim(original: np.ndarray, decoded: np.ndarray) -> float:
+    """
+    使用 numpy 向量化计算两张 RGBA 图片的平均 SSIM（7x7 均值窗口，包含 alpha 通道）
+
+    Returns:
+        SSIM，范围 -1.0 - 1.0，两张图片完全一致时为 1.0
+    """
+    x = original.astype(np.float64)
+    y = decoded.astype(np.float64)
+    window = min(SSIM_WINDOW, x.shape[0], x.shape[1])
+
+    mu_x = _box_mean(x, window)
+    mu_y = _box_mean(y, window)
+    var_x = _box_mean(x * x, window) - mu_x * mu_x
+    var_y = _box_mean(y * y, window) - mu_y * mu_y
+    cov_xy = _box_mean(x * y, window) - mu_x * mu_y
+
+    ssim_map = ((2 * mu_x * mu_y + SSIM_C1) * (2 * cov_xy + SSIM_C2)) / \
+               ((mu_x * mu_x + mu_y * mu_y + SSIM_C1) * (var_x + var_y + SSIM_C2))
+    return float(ssim_map.mean())
+
+
+def measure_frame(img_data: np.ndarray, astc_format: str, quality: float,
+                  threads: Optional[int]) -> Tuple[float, float, float]:
+    """
+    压缩并解码单帧，测量压缩耗时与还原质量
+
+    Returns:
+        (压缩耗时毫秒, PSNR dB, SSIM)
+    """
+    with tempfile.TemporaryDirectory(prefix='ffab_sweep_') as temp_dir:
+        # 与编码工具使用相同的未压缩输入，测得的耗时与实际编码一致
+        input_path = write_astcenc_input(temp_dir, img_data)
+        astc_path = os.path.join(temp_dir, 'output.astc')
+        decoded_path = os.path.join(temp_dir, 'decoded.tga' if input_path.endswith('.tga') else 'decoded.png')
+
+        start_time = time.perf_counter()
+        result = subprocess.run(build_astcenc_compress_command(input_path, astc_path, astc_format, quality, threads),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        encode_ms = (time.perf_counter() - start_time) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(f"ASTC编码失败: {result.stderr} {result.stdout}")
+
+        result = subprocess.run([get_astc_encoder()['path'], '-dl', astc_path, decoded_path],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ASTC解码失败: {result.stderr} {result.stdout}")
+
+        with Image.open(decoded_path) as img:
+            decoded = np.asarray(img.convert('RGBA'))
+
+    psnr, _ = compute_psnr(img_data, decoded)
+    return encode_ms, psnr, compute_ssim(img_data, decoded)
+
+
+def run_sweep(frames: List[Tuple[str, np.ndarray]], formats: List[str], qualities: List[float],
+              jobs: int, astcenc_threads: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    使用同一个线程池并行测量所有 (压缩格式, 压缩质量, 采样帧) 组合
+
+    Returns:
+        每个 (压缩格式, 压缩质量) 组合的统计信息列表，PSNR 为所有采样帧中的最低值，SSIM 与耗时为平均值
+    """
+    height, width = frames[0][1].shape[:2]
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {}
+        for astc_format in formats:
+            for quality in qualities:
+                futures[(astc_format, quality)] = [
+                    executor.submit(measure_frame, img_data, astc_format, quality, astcenc_threads)
+                    for _, img_data in frames
+                ]
+
+        results = []
+        for (astc_format, quality), frame_futures in futures.items():
+            measurements = [future.result() for future in frame_futures]
+            results.append({
+                'format': astc_format,
+                'quality': quality,
+                'bytes_per_frame': get_astc_frame_data_size(width, height, astc_format),
+                'encode_ms': sum(m[0] for m in measurements) / len(measurements),
+                'psnr': min(m[1] for m in measurements),
+                'ssim': sum(m[2] for m in measurements) / len(measurements),
+            })
+            print(f"已测量: {astc_format} 质量 {quality:g}")
+
+    return results
+
+
+def find_pareto_front(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    查找 Pareto 前沿：不存在另一个组合在体积、PSNR、SSIM 与压缩耗时上都不差且至少一项更好
+
+    Returns:
+        按单帧字节数从小到大排列的 Pareto 前沿
+    """
+    def dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        not_worse = (a['bytes_per_frame'] <= b['bytes_per_frame'] and a['psnr'] >= b['psnr']
+                     and a['ssim'] >= b['ssim'] and a['encode_ms'] <= b['encode_ms'])
+        better = (a['bytes_per_frame'] < b['bytes_per_frame'] or a['psnr'] > b['psnr']
+                  or a['ssim'] > b['ssim'] or a['encode_ms'] < b['encode_ms'])
+        return not_worse and better
+
+    front = [r for r in results if not any(dominates(other, r) for other in results)]
+    return sorted(front, key=lambda r: (r['bytes_per_frame'], -r['psnr']))
+
+
+def recommend(results: List[Dict[str, Any]], frame_count: int, budget: Optional[int] = None,
+              min_psnr: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    根据体积预算与质量目标推荐压缩格式与质量
+
+    - 只指定 min_psnr：满足 PSNR 的组合中体积最小者，体积相同时压缩最快者
+    - 指定 budget：整个FFAB文件不超过预算的组合中 SSIM 最高者，SSIM 相近（0.001 以内）时压缩最快者
+
+    Args:
+        results: run_sweep 的统计信息列表
+        frame_count: 动画总帧数，用于估算整个FFAB文件的体积
+        budget: 整个FFAB文件的体积（内存）预算字节数
+        min_psnr: 最低 PSNR (dB)
+
+    Returns:
+        推荐的组合，没有满足条件的组合时返回 None
+    """
+    candidates = [r for r in results
+                  if (budget is None or r['bytes_per_frame'] * frame_count <= budget)
+                  and (min_psnr is None or r['psnr'] >= min_psnr)]
+    if not candidates:
+        return None
+
+    if budget is None and min_psnr is not None:
+        return min(candidates, key=lambda r: (r['bytes_per_frame'], r['encode_ms']))
+
+    best_ssim = max(r['ssim'] for r in candidates)
+    close = [r for r in candidates if r['ssim'] >= best_ssim - 0.001]
+    return min(close, key=lambda r: (r['encode_ms'], r['bytes_per_frame']))
+
+
+def print_results(results: List[Dict[str, Any]], front: List[Dict[str, Any]], frame_count: int) -> None:
+    """打印所有组合的统计信息，Pareto 前沿上的组合以 * 标记"""
+    front_keys = {(r['format'], r['quality']) for r in front}
+    print(f"\n{'':2}{'格式':<8}{'质量':>6}{'字节/帧':>12}{'总大小(MB)':>12}{'耗时(ms/帧)':>14}{'PSNR(dB)':>10}{'SSIM':>8}")
+    for r in results:
+        mark = '*' if (r['format'], r['quality']) in front_keys else ' '
+        print(f"{mark:2}{r['format']:<8}{r['quality']:>6g}{r['bytes_per_frame']:>12,}"
+              f"{r['bytes_per_frame'] * frame_count / 1024 / 1024:>12.2f}{r['encode_ms']:>14.1f}"
+              f"{r['psnr']:>10.2f}{r['ssim']:>8.4f}")
+    print("\n* Pareto 前沿（体积、PSNR、SSIM、压缩耗时）")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='FFAB压缩格式扫描工具 - 采样帧并比较所有ASTC格式与质量的体积、质量与压缩耗时')
+    parser.add_argument('input_path', help='包含PNG或JPEG图片的输入文件夹或压缩包 (zip, tar)，或视频文件路径')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES,
+                        help=f'均匀采样的帧数 (默认: {DEFAULT_SAMPLES})')
+    parser.add_argument('--formats', default=None,
+                        help='扫描的ASTC格式，逗号分隔 (默认: 全部格式)')
+    parser.add_argument('--qualities', default=','.join(f'{q:g}' for q in DEFAULT_QUALITIES),
+                        help=f'扫描的ASTC压缩质量，逗号分隔 (默认: {",".join(f"{q:g}" for q in DEFAULT_QUALITIES)})')
+    parser.add_argument('--budget', type=float, default=None,
+                        help='整个FFAB文件的体积（内存）预算，单位 MB，用于推荐压缩格式')
+    parser.add_argument('--min-psnr', type=float, default=None,
+                        help='最低 PSNR (dB)，用于推荐压缩格式')
+    parser.add_argument('--fps', type=float, default=None,
+                        help='视频输入时的抽帧帧率 (默认: 保持视频原始帧率)')
+    parser.add_argument('--json', default=None,
+                        help='将扫描结果写入指定的 JSON 文件')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='并行压缩的帧数量 (默认: 根据CPU预算自动计算)')
+    parser.add_argument('--cpu-budget', type=int, default=None,
+                        help='CPU预算，在并行帧与 astcenc -j 之间分配 (默认: 根据CPU亲和性与cgroup配额自动检测)')
+
+    args = parser.parse_args()
+
+    try:
+        if not check_astc_encoder():
+            print("错误：未找到ASTC编码器 (astcenc)")
+            print("请从 https://github.com/ARM-software/astc-encoder 下载并安装")
+            sys.exit(1)
+
+        formats = args.formats.split(',') if args.formats else list(ASTC_FORMAT_CODES.keys())
+        for astc_format in formats:
+            if astc_format not in ASTC_FORMAT_CODES:
+                raise ValueError(f"无效的ASTC格式: {astc_format}")
+        qualities = [float(q) for q in args.qualities.split(',')]
+        for quality in qualities:
+            if not (0 <= quality <= 100):
+                raise ValueError("ASTC质量必须在0-100之间")
+        if args.samples < 1:
+            raise ValueError("采样帧数必须大于0")
+
+        frames, frame_count = sample_frames(args.input_path, args.samples, args.fps)
+        height, width = frames[0][1].shape[:2]
+
+        total_jobs = len(formats) * len(qualities) * len(frames)
+        cpu_budget = args.cpu_budget or get_cpu_budget()
+        jobs, astcenc_threads = plan_thread_budget(total_jobs, args.jobs, cpu_budget)
+        print(f"astcenc: {get_astc_encoder()['path']}")
+        print(f"图片尺寸: {width}x{height}, 总帧数: {frame_count}, 采样帧: {', '.join(name for name, _ in frames)}")
+        print(f"扫描 {len(formats)} 种格式 x {len(qualities)} 种质量 x {len(frames)} 帧，"
+              f"CPU预算: {cpu_budget}, 并行帧: {jobs}, astcenc -j {astcenc_threads}")
+
+        start_time = time.perf_counter()
+        results = run_sweep(frames, formats, qualities, jobs, astcenc_threads)
+        elapsed = time.perf_counter() - start_time
+
+        front = find_pareto_front(results)
+        print_results(results, front, frame_count)
+        print(f"扫描耗时: {elapsed:.2f} 秒")
+
+        budget = int(args.budget * 1024 * 1024) if args.budget is not None else None
+        recommended = None
+        if budget is not None or args.min_psnr is not None:
+            recommended = recommend(results, frame_count, budget, args.min_psnr)
+            if recommended is None:
+                print("\n没有满足体积预算与质量目标的压缩格式")
+            else:
+                print(f"\n推荐: --format {recommended['format']} --quality {recommended['quality']:g} "
+                      f"(总大小 {recommended['bytes_per_frame'] * frame_count / 1024 / 1024:.2f} MB, "
+                      f"PSNR {recommended['psnr']:.2f} dB, SSIM {recommended['ssim']:.4f})")
+
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({
+                    'input_path': args.input_path,
+                    'width': width,
+                    'height': height,
+                    'frame_count': frame_count,
+                    'samples': [name for name, _ in frames],
+                    'results': results,
+                    'pareto_front': [(r['format'], r['quality']) for r in front],
+                    'recommended': recommended,
+                }, f, indent=2, ensure_ascii=False)
+            print(f"扫描结果已写入: {args.json}")
+    except Exception as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
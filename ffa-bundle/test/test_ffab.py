@@ -20,14 +20,47 @@ FFAB 编码与解码功能测试
     F. 调用 ffab_decoder.py 将 build/test1/output_ffab 目录下的每一个 FFAB 文件解码为图片序列帧，解码的图片序列帧存储在 build/test1/output_frames 目录下
     G. 使用并发的方式对每一个 ffab 文件解码为图片序列帧，解码的图片序列帧存储在 build/test1/output_frames 目录下，会生成如 build/test1/output_frames/output_4x4、build/test1/output_frames/output_5x4 等目录，每个目录下存储对应 ASTC 格式的图片序列帧
     H. 对比 build/test1/output_frames 目录下的图片序列帧与原始图片序列帧，要求图片数量与图片分辨率一致，只需要对比文件夹下的第一个图片的分辨率即可
+    I. 使用进程池逐帧对比原始帧与解码帧，使用 numpy 向量化计算 PSNR 与每个通道（包括 alpha）的最大误差，
+       超出 QUALITY_THRESHOLDS 中对应格式的阈值时测试失败，逐帧指标写入 build/test1/metrics/output_4x4.json 等文件
+5. 所有视频在同一个进程池中并发处理，提取帧、编码、解码按依赖关系流水线执行
+6. 提取的帧与 FFAB 文件会被缓存，缓存记录在 build/test1/cache.json 中：
+    A. 提取的帧以视频文件 hash 与帧率为缓存键
+    B. FFAB 文件以视频文件 hash、编码器源码 (ENCODER_SOURCES) hash、压缩质量与 ASTC 格式为缓存键
+    C. 解码与对比每次都会执行；使用 --clean 清空 build 目录，使用 --formats 只测试部分格式
+7. 视频测试之前先执行格式往返测试 (ROUNDTRIP_TESTS)：不调用 astcenc 与 ffmpeg，用 void-extent（单色）块直接构造帧数据，
+   写出后读回并逐帧对比，覆盖稀疏存储、校验和、单遍写出、版本3、脏矩形、多动画归档、.astc / KTX2 容器、
+   密度变体规划、缩略图预览与帧存储顺序 / 预加载；使用 --roundtrip-only 只执行格式往返测试
 """
 
+import io
+import json
+import math
 import shutil
+import struct
 import sys
+import contextlib
+import traceback
+import hashlib
+import argparse
 import subprocess
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from PIL import Image
+import numpy as np
+
+# 与编码、解码工具使用同一个 astcenc 选择逻辑，格式往返测试直接调用 ffab 包
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ffab.archive import extract_ffab_archive, load_ffab_archive, verify_ffab_archive, write_ffab_archive
+from ffab.blocks import EMPTY_BLOCK, as_blocks, compute_dirty_rects, expand_sparse_frame, identical_mask, \
+    pack_sparse_frame
+from ffab.container import export_astc_files, export_ktx2, import_astc_files, import_ktx2
+from ffab.encoder import get_astc_encoder, get_variant_output_path, get_variant_size, parse_density_scales, \
+    parse_playback_order
+from ffab.format import EXTENSION_DIRTY_RECTS, FFAB_FLAG_CHECKSUMS, FFAB_FLAG_SPARSE, build_dirty_rects, \
+    build_ffab_prefix, finish_ffab_stream, open_ffab_stream, parse_dirty_rects, read_ffab, verify_ffab, \
+    write_ffab_file, write_ffab_stream_frame
+from ffab.info import get_file_info
+from ffab.preview import create_previews, iter_thumbnails
 
 # 测试视频提取帧率
 EXTRACT_FRAMES_FPS = 24
@@ -38,6 +71,24 @@ ASTC_FORMATS = ['4x4', '6x6', '8x8', '12x12']
 # 测试压缩质量 [0.0-100.0]
 ASTC_QUALITY = 10.0
 
+# 各 ASTC 格式的质量阈值：每一帧的 PSNR 不低于 min_psnr (dB)，每个通道的最大误差不超过 max_error (0-255)
+QUALITY_THRESHOLDS = {
+    '4x4': {'min_psnr': 38.0, 'max_error': 96},
+    '6x6': {'min_psnr': 32.0, 'max_error': 128},
+    '8x8': {'min_psnr': 29.0, 'max_error': 160},
+    '12x12': {'min_psnr': 25.0, 'max_error': 192},
+}
+
+# RGBA 通道名称
+CHANNEL_NAMES = ('r', 'g', 'b', 'a')
+
+# 编码器源码文件（相对工具目录的 glob 模式），内容变化时编码缓存失效：
+# 整个 ffab 包（编码器依赖 blocks、format 等模块，常驻服务与客户端也在包中）与编码工具入口脚本
+ENCODER_SOURCES = ['ffab/**/*.py', 'ffab_encoder.py']
+
+# 测试目录下的缓存记录文件
+CACHE_FILE_NAME = 'cache.json'
+
 def run_command(command, cwd=None):
     """运行命令并返回结果"""
     print(f"执行命令: {' '.join(command)}")
@@ -68,9 +119,9 @@ def check_ffmpeg_availability():
 
 
 def check_astc_encoder_availability():
-    """检查 astcenc 是否可用"""
-    success = run_command(['astcenc', '-help'])
-    if not success:
+    """检查 astcenc 是否可用（按 get_astc_encoder 选择的可执行文件，如 astcenc-avx2）"""
+    encoder = get_astc_encoder()
+    if encoder is None or not run_command([encoder['path'], '-help']):
         print("错误：未找到 ASTC 编码器 (astcenc)")
         print("请从 https://github.com/ARM-software/astc-encoder 下载并安装")
         return False
@@ -147,7 +198,9 @@ def encode_to_ffab(tools_dir: Path, input_dir: Path, output_dir: Path, astc_form
         str(input_dir),
         str(output_file),
         '--format', astc_format,
-        '--quality', str(ASTC_QUALITY)
+        '--quality', str(ASTC_QUALITY),
+        # 在测试进程中执行，不交给可能运行着旧代码的常驻服务
+        '--no-daemon'
     ]
 
     success = run_command(command)
@@ -170,7 +223,8 @@ def decode_from_ffab(tools_dir: Path, ffab_file: Path, output_dir: Path) -> bool
         sys.executable,
         str(decoder_script),
         str(ffab_file),
-        str(output_dir)
+        str(output_dir),
+        '--no-daemon'
     ]
 
     success = run_command(command)
@@ -211,125 +265,595 @@ def compare_frames(original_dir: Path, decoded_dir: Path) -> bool:
     return True
 
 
-def process_video(tools_dir: Path, video_path: Path, build_dir: Path):
-    """处理单个视频文件的测试流程"""
-    print(f"\n=== 开始处理视频: {video_path.name} ===")
-
-    # 获取视频文件名（不含扩展名）作为测试目录名
-    video_name = video_path.stem
-    test_dir = build_dir / video_name
-
-    # 创建测试目录结构
-    input_frames_dir, output_ffab_dir, output_frames_dir = create_test_directories(test_dir)
-
-    # 提取视频帧
-    print(f"\n--- 提取视频帧 ---")
-    if not extract_frames(video_path, input_frames_dir):
+def compute_frame_metrics(original_file: Path, decoded_file: Path) -> dict:
+    """使用 numpy 向量化计算单帧的 PSNR 与每个通道（包括 alpha）的最大误差"""
+    with Image.open(original_file) as orig_img, Image.open(decoded_file) as dec_img:
+        original = np.asarray(orig_img.convert('RGBA'), dtype=np.int16)
+        decoded = np.asarray(dec_img.convert('RGBA'), dtype=np.int16)
+
+    diff = np.abs(original - decoded)
+    mse = float(np.mean(np.square(diff, dtype=np.int32), dtype=np.float64))
+    # 两帧完全一致时 PSNR 为无穷大，JSON 中记录为 null
+    psnr = None if mse == 0 else 10.0 * math.log10(255.0 * 255.0 / mse)
+    max_error = diff.reshape(-1, 4).max(axis=0)
+
+    return {
+        'frame': original_file.name,
+        'psnr': psnr,
+        'max_error': {name: int(value) for name, value in zip(CHANNEL_NAMES, max_error)},
+    }
+
+
+def verify_frame_quality(executor: ProcessPoolExecutor, original_dir: Path, decoded_dir: Path,
+                         astc_format: str, metrics_file: Path) -> bool:
+    """
+    使用进程池逐帧对比原始帧与解码帧，检查 PSNR 与每个通道的最大误差是否满足格式对应的阈值，
+    逐帧指标写入 metrics_file
+    """
+    original_files = sorted(original_dir.glob('*'))
+    decoded_files = sorted(decoded_dir.glob('*'))
+    thresholds = QUALITY_THRESHOLDS[astc_format]
+
+    chunksize = max(1, len(original_files) // 32)
+    frame_metrics = list(executor.map(compute_frame_metrics, original_files, decoded_files, chunksize=chunksize))
+
+    failures = []
+    for metrics in frame_metrics:
+        if metrics['psnr'] is not None and metrics['psnr'] < thresholds['min_psnr']:
+            failures.append(f"{metrics['frame']}: PSNR {metrics['psnr']:.2f} dB < {thresholds['min_psnr']} dB")
+        for name, value in metrics['max_error'].items():
+            if value > thresholds['max_error']:
+                failures.append(f"{metrics['frame']}: 通道 {name} 最大误差 {value} > {thresholds['max_error']}")
+
+    finite_psnr = [m['psnr'] for m in frame_metrics if m['psnr'] is not None]
+    summary = {
+        'format': astc_format,
+        'frames': len(frame_metrics),
+        'thresholds': thresholds,
+        'min_psnr': min(finite_psnr) if finite_psnr else None,
+        'mean_psnr': sum(finite_psnr) / len(finite_psnr) if finite_psnr else None,
+        'max_error': {name: max(m['max_error'][name] for m in frame_metrics) for name in CHANNEL_NAMES},
+        'passed': not failures,
+    }
+
+    metrics_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(metrics_file, 'w') as f:
+        json.dump({'summary': summary, 'frames': frame_metrics}, f, indent=2)
+
+    min_psnr_text = f"{summary['min_psnr']:.2f} dB" if summary['min_psnr'] is not None else 'inf'
+    max_error_text = ', '.join(f"{name}={value}" for name, value in summary['max_error'].items())
+    print(f"{astc_format} 格式质量: 最低 PSNR {min_psnr_text}, 最大误差 {max_error_text}")
+
+    if failures:
+        print(f"{astc_format} 格式质量不满足阈值 ({len(failures)} 项):")
+        for failure in failures[:10]:
+            print(f"  {failure}")
         return False
 
-    # 编码为FFAB文件
-    print(f"\n--- 编码为FFAB文件 ---")
-    encode_success = True
-    failed_formats = []
-
-    # 准备所有要处理的格式
-    formats_to_test = ASTC_FORMATS
-    print(f"将并行处理 {len(formats_to_test)} 种 ASTC 格式")
-
-    # 使用进程池并行执行编码任务
-    with ProcessPoolExecutor() as executor:
-        # 提交所有编码任务
-        future_to_format = {}
-        for astc_format in formats_to_test:
-            print(f"提交编码任务: {astc_format} 格式")
-            future = executor.submit(encode_to_ffab, tools_dir, input_frames_dir, output_ffab_dir, astc_format)
-            future_to_format[future] = astc_format
-
-        # 收集所有任务的结果
-        for future in as_completed(future_to_format):
-            astc_format = future_to_format[future]
-            try:
-                success = future.result()
-                if not success:
-                    encode_success = False
-                    failed_formats.append(astc_format)
-            except Exception as e:
-                print(f"处理 {astc_format} 格式时出错: {str(e)}")
-                encode_success = False
-                failed_formats.append(astc_format)
-
-    if not encode_success:
-        print(f"编码失败格式: {', '.join(failed_formats)}")
-        return False
+    return True
 
-    # 解码FFAB文件
-    print(f"\n--- 解码FFAB文件 ---")
-    decode_success = True
 
-    # 获取所有FFAB文件
-    ffab_files = list(output_ffab_dir.glob('*.ffab'))
-    if not ffab_files:
-        print("错误：未找到FFAB文件")
-        return False
+def file_sha256(path: Path) -> str:
+    """计算文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encoder_source_hash(tools_dir: Path) -> str:
+    """计算编码器源码的 hash，只包括 ENCODER_SOURCES 匹配的文件，修改其他工具不会使编码缓存失效"""
+    digest = hashlib.sha256()
+    for pattern in ENCODER_SOURCES:
+        for source in sorted(tools_dir.glob(pattern)):
+            digest.update(source.relative_to(tools_dir).as_posix().encode())
+            digest.update(file_sha256(source).encode())
+    return digest.hexdigest()
+
+
+def load_cache(test_dir: Path) -> dict:
+    """读取测试目录的缓存记录，不存在或无法解析时返回空记录"""
+    try:
+        with open(test_dir / CACHE_FILE_NAME) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache.setdefault('frames', None)
+    cache.setdefault('ffab', {})
+    return cache
+
+
+def save_cache(test_dir: Path, cache: dict) -> None:
+    """写入测试目录的缓存记录"""
+    with open(test_dir / CACHE_FILE_NAME, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+
+def clear_directory(directory: Path) -> None:
+    """清空目录，避免残留上一次运行的文件"""
+    if directory.exists():
+        shutil.rmtree(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+
+def run_pipeline(tools_dir: Path, mp4_files: list, build_dir: Path, formats: list, jobs=None) -> list:
+    """
+    使用同一个进程池并发处理所有视频：提取帧、编码、解码按依赖关系流水线执行，一个任务完成后立即提交后续任务
+
+    提取的帧以视频文件 hash 为缓存键，FFAB 文件以视频文件 hash、编码器源码 hash、ASTC 格式与压缩质量为缓存键，
+    缓存命中时跳过对应的步骤。
+
+    Returns:
+        失败的视频文件名列表
+    """
+    source_hash = encoder_source_hash(tools_dir)
+    failed_videos = set()
+    videos = {}
+    pending = {}
+
+    def submit(executor, fn, *args, kind, video_path, astc_format=None):
+        pending[executor.submit(fn, *args)] = (kind, video_path, astc_format)
+
+    def submit_decode(executor, video_path, astc_format):
+        video = videos[video_path]
+        output_dir = video['output_frames_dir'] / f'output_{astc_format}'
+        clear_directory(output_dir)
+        print(f"提交解码任务: {video_path.name} {astc_format}")
+        submit(executor, decode_from_ffab, tools_dir, video['output_ffab_dir'] / f'output_{astc_format}.ffab',
+               output_dir, kind='decode', video_path=video_path, astc_format=astc_format)
+
+    def submit_encodes(executor, video_path):
+        video = videos[video_path]
+        for astc_format in formats:
+            if video['cache']['ffab'].get(astc_format) == video['ffab_keys'][astc_format] \
+                    and (video['output_ffab_dir'] / f'output_{astc_format}.ffab').exists():
+                print(f"使用缓存的FFAB文件: {video_path.name} {astc_format}")
+                submit_decode(executor, video_path, astc_format)
+            else:
+                print(f"提交编码任务: {video_path.name} {astc_format}")
+                submit(executor, encode_to_ffab, tools_dir, video['input_frames_dir'], video['output_ffab_dir'],
+                       astc_format, kind='encode', video_path=video_path, astc_format=astc_format)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for video_path in mp4_files:
+            test_dir = build_dir / video_path.stem
+            input_frames_dir, output_ffab_dir, output_frames_dir = create_test_directories(test_dir)
+            video_hash = file_sha256(video_path)
+            frames_key = f'{video_hash}:{EXTRACT_FRAMES_FPS}'
+            videos[video_path] = {
+                'test_dir': test_dir,
+                'input_frames_dir': input_frames_dir,
+                'output_ffab_dir': output_ffab_dir,
+                'output_frames_dir': output_frames_dir,
+                'cache': load_cache(test_dir),
+                'frames_key': frames_key,
+                'ffab_keys': {astc_format: f'{frames_key}:{source_hash}:{ASTC_QUALITY}:{astc_format}'
+                              for astc_format in formats},
+                'decoded': [],
+            }
+
+            video = videos[video_path]
+            if video['cache']['frames'] == frames_key and any(input_frames_dir.iterdir()):
+                print(f"使用缓存的视频帧: {video_path.name}")
+                submit_encodes(executor, video_path)
+            else:
+                # 帧缓存失效时，该视频的所有FFAB缓存同时失效
+                video['cache'] = {'frames': None, 'ffab': {}}
+                save_cache(test_dir, video['cache'])
+                clear_directory(input_frames_dir)
+                print(f"提交帧提取任务: {video_path.name}")
+                submit(executor, extract_frames, video_path, input_frames_dir, kind='extract', video_path=video_path)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, video_path, astc_format = pending.pop(future)
+                video = videos[video_path]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    print(f"{video_path.name} {kind} {astc_format or ''} 出错: {e}")
+                    success = False
 
-    # 使用进程池并行执行解码任务
-    with ProcessPoolExecutor() as executor:
-        # 提交所有解码任务
-        future_to_file = {}
-        for ffab_file in ffab_files:
-            # 从文件名提取格式信息，如output_4x4.ffab -> output_4x4
-            format_name = ffab_file.stem
-            output_dir = output_frames_dir / format_name
-            output_dir.mkdir(exist_ok=True)
-
-            print(f"提交解码任务: {ffab_file.name}")
-            future = executor.submit(decode_from_ffab, tools_dir, ffab_file, output_dir)
-            future_to_file[future] = ffab_file
-
-        # 收集所有任务的结果
-        for future in as_completed(future_to_file):
-            ffab_file = future_to_file[future]
-            try:
-                success = future.result()
                 if not success:
-                    decode_success = False
-            except Exception as e:
-                print(f"解码 {ffab_file.name} 时出错: {str(e)}")
-                decode_success = False
-
-    if not decode_success:
-        print("部分或全部FFAB文件解码失败")
-        return False
-
-    # 对比解码后的帧与原始帧
-    print(f"\n--- 对比解码帧与原始帧 ---")
-    compare_success = True
-
-    # 检查每个格式的解码结果
-    for ffab_file in ffab_files:
-        format_name = ffab_file.stem
-        decoded_dir = output_frames_dir / format_name
-
-        print(f"对比 {format_name} 格式的帧...")
-        if not compare_frames(input_frames_dir, decoded_dir):
-            print(f"{format_name} 格式帧对比失败")
-            compare_success = False
+                    print(f"失败: {video_path.name} {kind} {astc_format or ''}")
+                    failed_videos.add(video_path.name)
+                    if kind == 'encode':
+                        video['cache']['ffab'].pop(astc_format, None)
+                        save_cache(video['test_dir'], video['cache'])
+                    continue
+
+                if kind == 'extract':
+                    video['cache']['frames'] = video['frames_key']
+                    save_cache(video['test_dir'], video['cache'])
+                    submit_encodes(executor, video_path)
+                elif kind == 'encode':
+                    video['cache']['ffab'][astc_format] = video['ffab_keys'][astc_format]
+                    save_cache(video['test_dir'], video['cache'])
+                    submit_decode(executor, video_path, astc_format)
+                else:
+                    video['decoded'].append(astc_format)
+
+        # 对比解码后的帧与原始帧，逐帧质量验证同样使用该进程池
+        print(f"\n--- 对比解码帧与原始帧 ---")
+        for video_path in mp4_files:
+            video = videos[video_path]
+            for astc_format in formats:
+                if astc_format not in video['decoded']:
+                    continue
+                format_name = f'output_{astc_format}'
+                decoded_dir = video['output_frames_dir'] / format_name
+
+                print(f"对比 {video_path.name} {format_name} 格式的帧...")
+                if not compare_frames(video['input_frames_dir'], decoded_dir):
+                    print(f"{format_name} 格式帧对比失败")
+                    failed_videos.add(video_path.name)
+                elif not verify_frame_quality(executor, video['input_frames_dir'], decoded_dir, astc_format,
+                                              video['test_dir'] / 'metrics' / f'{format_name}.json'):
+                    print(f"{format_name} 格式质量验证失败")
+                    failed_videos.add(video_path.name)
+                else:
+                    print(f"{format_name} 格式帧对比成功")
+
+    return [video_path.name for video_path in mp4_files if video_path.name in failed_videos]
+
+
+# ---------------------------------------------------------------------------
+# 格式往返测试：不调用 astcenc，用 void-extent（单色）块构造帧数据，写出后读回对比
+# ---------------------------------------------------------------------------
+
+# 往返测试的图片尺寸与 ASTC 格式（宽高不是块尺寸的整数倍，覆盖部分块）
+ROUNDTRIP_WIDTH = 38
+ROUNDTRIP_HEIGHT = 22
+ROUNDTRIP_FORMAT = '4x4'
+ROUNDTRIP_FRAMES = 6
+
+
+def void_extent_block(color) -> bytes:
+    """构造 LDR void-extent 块，颜色为 8 位 RGBA（按 UNORM16 存储，解码结果与输入完全一致）"""
+    return EMPTY_BLOCK[:8] + struct.pack('<4H', *(c * 257 for c in color))
+
+
+def frame_color(i: int) -> tuple:
+    """第 i 帧方块的颜色"""
+    return (i * 40 % 256, 255 - i * 30 % 256, 64 + i, 255)
+
+
+def make_frames(width: int = ROUNDTRIP_WIDTH, height: int = ROUNDTRIP_HEIGHT, astc_format: str = ROUNDTRIP_FORMAT,
+                count: int = ROUNDTRIP_FRAMES) -> list:
+    """生成测试帧：透明背景（空块）上一个按帧移动的 2x2 块单色方块，以及一行固定的不透明块"""
+    block_x, block_y = map(int, astc_format.split('x'))
+    blocks_x = (width + block_x - 1) // block_x
+    blocks_y = (height + block_y - 1) // block_y
+    frames = []
+    for i in range(count):
+        grid = [EMPTY_BLOCK] * (blocks_x * blocks_y)
+        grid[(blocks_y - 1) * blocks_x:] = [void_extent_block((10, 20, 30, 255))] * blocks_x
+        x = i % max(1, blocks_x - 1)
+        y = i // max(1, blocks_x - 1) % max(1, blocks_y - 2)
+        for dy in range(min(2, blocks_y - 1)):
+            for dx in range(min(2, blocks_x)):
+                grid[(y + dy) * blocks_x + x + dx] = void_extent_block(frame_color(i))
+        frames.append(b''.join(grid))
+    return frames
+
+
+def read_frames(path: Path, info: dict) -> list:
+    """按索引表读取每一帧存储的数据"""
+    data = path.read_bytes()
+    return [data[offset:offset + length] for offset, length in zip(info['offsets'], info['lengths'])]
+
+
+def quiet_write(fn, *args, **kwargs):
+    """调用写出函数，不输出写出统计信息"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def roundtrip_layout(work_dir: Path) -> None:
+    """帧存储顺序与预加载：预加载前缀包含按播放顺序的前几帧，最后一帧不在前缀中时位于数据区末尾（版本1），否则写入版本2"""
+    frames = make_frames()
+
+    # 从第 3 帧开始播放：最后一帧不在前缀中，移到数据区末尾，仍为版本1
+    path = work_dir / 'rotated.ffab'
+    quiet_write(write_ffab_file, str(path), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, frames,
+                layout=parse_playback_order('3-5,0-2', len(frames)), preload_frames=2)
+    info = read_ffab(str(path))
+    assert info['version'] == 1, info['version']
+    assert read_frames(path, info) == frames
+    offsets, lengths = info['offsets'], info['lengths']
+    stored = sorted(range(len(frames)), key=lambda i: offsets[i])
+    assert stored == [3, 4, 0, 1, 2, 5], stored
+    assert offsets[-1] + lengths[-1] == max(o + l for o, l in zip(offsets, lengths))
+    assert info['preload'] == {'frames': 2, 'offset': 0, 'length': offsets[4] + lengths[4]}, info['preload']
+    assert not get_file_info(str(path))['sequential_layout']
+
+    # 倒序播放：前缀必须包含最先播放的最后一帧，无法位于数据区末尾，写入版本2
+    path = work_dir / 'reverse.ffab'
+    quiet_write(write_ffab_file, str(path), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, frames,
+                layout=parse_playback_order('reverse', len(frames)), preload_frames=2)
+    info = read_ffab(str(path))
+    assert info['version'] == 2 and info['flags'] == 0, info['version']
+    assert read_frames(path, info) == frames
+    offsets, lengths = info['offsets'], info['lengths']
+    stored = sorted(range(len(frames)), key=lambda i: offsets[i])
+    assert stored == [5, 4, 3, 2, 1, 0], stored
+    assert info['preload'] == {'frames': 2, 'offset': 0, 'length': offsets[4] + lengths[4]}, info['preload']
+    assert verify_ffab(str(path))['ok']
+
+    # 倒序播放但不预加载：最后一帧移到数据区末尾，仍为版本1
+    path = work_dir / 'reverse_v1.ffab'
+    quiet_write(write_ffab_file, str(path), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, frames,
+                layout=parse_playback_order('reverse', len(frames)))
+    info = read_ffab(str(path))
+    assert info['version'] == 1 and read_frames(path, info) == frames
+    assert sorted(range(len(frames)), key=lambda i: info['offsets'][i]) == [4, 3, 2, 1, 0, 5]
+
+    # 默认顺序与 layout=None 的输出完全一致
+    sequential = work_dir / 'sequential.ffab'
+    quiet_write(write_ffab_file, str(sequential), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, frames)
+    identity = work_dir / 'identity.ffab'
+    quiet_write(write_ffab_file, str(identity), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, frames,
+                layout=list(range(len(frames))))
+    assert sequential.read_bytes() == identity.read_bytes()
+    assert get_file_info(str(sequential))['sequential_layout']
+
+    # 先写出前缀再逐帧追加（encode_bundle_async）的结果与 write_ffab_file 完全一致
+    _, prefix = build_ffab_prefix(ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, [len(f) for f in frames])
+    assert prefix + b''.join(frames) == sequential.read_bytes()
+
+
+def roundtrip_sparse(work_dir: Path) -> None:
+    """稀疏存储：帧数据为块位图加非空块，还原后与原始帧完全一致，文件小于完整存储"""
+    frames = make_frames()
+    path = work_dir / 'sparse.ffab'
+    quiet_write(write_ffab_file, str(path), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT,
+                [pack_sparse_frame(frame) for frame in frames], FFAB_FLAG_SPARSE)
+
+    info = read_ffab(str(path))
+    assert info['version'] == 2 and info['sparse']
+    blocks_per_frame = len(frames[0]) // 16
+    assert [expand_sparse_frame(data, blocks_per_frame) for data in read_frames(path, info)] == frames
+    assert path.stat().st_size < sum(map(len, frames))
+
+
+def roundtrip_checksums(work_dir: Path) -> None:
+    """校验和表：完整文件校验通过，修改一帧中的一个字节后校验报告该帧"""
+    frames = make_frames()
+    path = work_dir / 'checksums.ffab'
+    quiet_write(write_ffab_file, str(path), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, frames,
+                FFAB_FLAG_CHECKSUMS)
+
+    info = read_ffab(str(path))
+    assert info['version'] == 2 and info['checksums'] is not None
+    assert read_frames(path, info) == frames
+    result = verify_ffab(str(path))
+    assert result['ok'] and result['checksums'] and result['bytes'] == sum(map(len, frames)), result
+
+    data = bytearray(path.read_bytes())
+    data[info['offsets'][2] + 9] ^= 0xFF
+    path.write_bytes(bytes(data))
+    result = verify_ffab(str(path))
+    assert not result['ok'] and len(result['errors']) == 1 and '第2帧' in result['errors'][0], result['errors']
+
+
+def roundtrip_stream(work_dir: Path) -> None:
+    """单遍写出：索引表位于文件末尾，扩展区与校验和表同样可以读回"""
+    frames = make_frames()
+    block_x, block_y = map(int, ROUNDTRIP_FORMAT.split('x'))
+    blocks_x, blocks_y = -(-ROUNDTRIP_WIDTH // block_x), -(-ROUNDTRIP_HEIGHT // block_y)
+    dirty_rects = compute_dirty_rects(frames, blocks_x, blocks_y)
+    path = work_dir / 'stream.ffab'
+    with open(path, 'wb') as f:
+        state = open_ffab_stream(f, ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, FFAB_FLAG_CHECKSUMS)
+        for frame in frames:
+            write_ffab_stream_frame(state, frame)
+        file_size = finish_ffab_stream(state, {EXTENSION_DIRTY_RECTS: build_dirty_rects(dirty_rects)})
+    assert file_size == path.stat().st_size
+
+    info = read_ffab(str(path))
+    assert info['trailing_index'] and info['image_count'] == len(frames)
+    assert read_frames(path, info) == frames
+    assert parse_dirty_rects(info['extensions'][EXTENSION_DIRTY_RECTS], len(frames)) == dirty_rects
+    assert verify_ffab(str(path))['ok']
+
+
+def roundtrip_v3(work_dir: Path) -> None:
+    """版本3：宽度或图片数量超过 65535 时写入版本3，按列存储的索引表读回一致"""
+    frames = make_frames(65540, 24, '12x12', 2)
+    path = work_dir / 'wide.ffab'
+    quiet_write(write_ffab_file, str(path), 65540, 24, '12x12', frames, FFAB_FLAG_CHECKSUMS)
+    info = read_ffab(str(path))
+    assert (info['version'], info['width'], info['height']) == (3, 65540, 24), info['version']
+    assert read_frames(path, info) == frames
+    assert verify_ffab(str(path))['ok']
+    unchecked = work_dir / 'wide_unchecked.ffab'
+    quiet_write(write_ffab_file, str(unchecked), 65540, 24, '12x12', frames)
+    version, prefix = build_ffab_prefix(65540, 24, '12x12', [len(frame) for frame in frames])
+    assert version == 3 and prefix + b''.join(frames) == unchecked.read_bytes()
+
+    # 65536 帧，每帧一个块
+    frames = [void_extent_block((i & 0xFF, i >> 8, 0, 255)) for i in range(65536)]
+    path = work_dir / 'many.ffab'
+    quiet_write(write_ffab_file, str(path), 12, 12, '12x12', frames)
+    info = read_ffab(str(path))
+    assert info['version'] == 3 and info['image_count'] == 65536
+    assert read_frames(path, info) == frames
+
+
+def roundtrip_dirty_rects(work_dir: Path) -> None:
+    """脏矩形：扩展段读回一致，每一帧相对上一帧变化的块都在脏矩形内"""
+    frames = make_frames()
+    block_x, block_y = map(int, ROUNDTRIP_FORMAT.split('x'))
+    blocks_x, blocks_y = -(-ROUNDTRIP_WIDTH // block_x), -(-ROUNDTRIP_HEIGHT // block_y)
+    dirty_rects = compute_dirty_rects(frames, blocks_x, blocks_y)
+    path = work_dir / 'dirty.ffab'
+    quiet_write(write_ffab_file, str(path), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, frames,
+                extensions={EXTENSION_DIRTY_RECTS: build_dirty_rects(dirty_rects)})
+
+    info = read_ffab(str(path))
+    assert info['version'] == 1
+    assert read_frames(path, info) == frames
+    parsed = parse_dirty_rects(info['extensions'][EXTENSION_DIRTY_RECTS], len(frames))
+    assert parsed == dirty_rects
+    for i, rects in enumerate(parsed):
+        changed = ~identical_mask(as_blocks(frames[i]), as_blocks(frames[i - 1])).reshape(blocks_y, blocks_x)
+        covered = np.zeros_like(changed)
+        for x, y, w, h in rects:
+            covered[y:y + h, x:x + w] = True
+        assert changed.any() and not (changed & ~covered).any(), (i, rects)
+
+
+def roundtrip_archive(work_dir: Path) -> None:
+    """多动画归档：动画按名称读取，偏移量相对归档文件开头，校验与解包后与原文件完全一致"""
+    frames = make_frames()
+    members = {'walk': work_dir / 'walk.ffab', 'idle': work_dir / 'idle.ffab'}
+    quiet_write(write_ffab_file, str(members['walk']), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, frames,
+                FFAB_FLAG_CHECKSUMS, layout=[2, 0, 1, 3, 4, 5], preload_frames=1)
+    quiet_write(write_ffab_file, str(members['idle']), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT,
+                [pack_sparse_frame(frame) for frame in frames[:3]], FFAB_FLAG_SPARSE)
+    path = work_dir / 'bundle.ffar'
+    quiet_write(write_ffab_archive, str(path), {name: str(p) for name, p in members.items()})
+
+    archive = load_ffab_archive(str(path))
+    assert list(archive) == ['idle', 'walk'], list(archive)
+    assert read_frames(path, archive['walk']) == frames
+    blocks_per_frame = len(frames[0]) // 16
+    assert [expand_sparse_frame(data, blocks_per_frame) for data in read_frames(path, archive['idle'])] == frames[:3]
+    preload = archive['walk']['preload']
+    assert preload['frames'] == 1 and preload['offset'] == archive['walk']['member_offset'], preload
+    assert all(result['ok'] for result in verify_ffab_archive(str(path)).values())
+
+    extracted = quiet_write(extract_ffab_archive, str(path), str(work_dir / 'extracted'))
+    assert len(extracted) == 2
+    for name, member_path in members.items():
+        assert (work_dir / 'extracted' / f'{name}.ffab').read_bytes() == member_path.read_bytes(), name
+
+
+def roundtrip_containers(work_dir: Path) -> None:
+    """.astc 文件与 KTX2 数组纹理：导出后再导入，帧数据与尺寸不变"""
+    frames = make_frames()
+    path = work_dir / 'container.ffab'
+    quiet_write(write_ffab_file, str(path), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT, frames)
+
+    quiet_write(export_astc_files, str(path), str(work_dir / 'astc'))
+    quiet_write(import_astc_files, str(work_dir / 'astc'), str(work_dir / 'from_astc.ffab'))
+    quiet_write(export_ktx2, str(path), str(work_dir / 'frames.ktx2'))
+    quiet_write(import_ktx2, str(work_dir / 'frames.ktx2'), str(work_dir / 'from_ktx2.ffab'))
+    for name in ('from_astc.ffab', 'from_ktx2.ffab'):
+        info = read_ffab(str(work_dir / name))
+        assert (info['width'], info['height'], info['astc_format']) == \
+            (ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT), name
+        assert read_frames(work_dir / name, info) == frames, name
+
+
+def roundtrip_density_variants(work_dir: Path) -> None:
+    """密度变体规划：密度分组按相对源密度的比例缩放，按比例从大到小排列（压缩需要 astcenc，不在此测试）"""
+    scales = parse_density_scales('xhdpi,xxhdpi,0.25', 'xxxhdpi')
+    assert scales == [('xxhdpi', 0.75), ('xhdpi', 0.5), ('0.25x', 0.25)], scales
+    assert get_variant_size(300, 256, 0.5, '6x6') == (150, 128)
+    assert get_variant_size(300, 256, 0.5, '6x6', snap_blocks=True) == (150, 126)
+    assert get_variant_output_path('out/anim.ffab', 'xhdpi') == 'out/anim_xhdpi.ffab'
+
+
+def roundtrip_previews(work_dir: Path) -> None:
+    """缩略图预览：void-extent 块的缩略图颜色与块颜色完全一致，联系表与动画预览正常写出"""
+    frames = make_frames()
+    path = work_dir / 'preview.ffab'
+    quiet_write(write_ffab_file, str(path), ROUNDTRIP_WIDTH, ROUNDTRIP_HEIGHT, ROUNDTRIP_FORMAT,
+                [pack_sparse_frame(frame) for frame in frames], FFAB_FLAG_SPARSE)
+
+    for i, thumbnail in iter_thumbnails(str(path)):
+        expected = np.frombuffer(frames[i], dtype=np.uint8).reshape(thumbnail.shape[:2] + (16,))[..., 8:16]
+        expected = expected.view('<u2') >> 8
+        assert np.array_equal(thumbnail, expected), i
+        assert (thumbnail.reshape(-1, 4) == frame_color(i)).all(axis=1).sum() == 4, i
+
+    outputs = create_previews(str(path), str(work_dir / 'previews' / 'preview'))
+    assert [Path(output).name for output in outputs] == ['preview_sheet.png', 'preview.gif'], outputs
+    with Image.open(outputs[1]) as animation:
+        assert animation.n_frames == len(frames)
+
+
+# 格式往返测试列表，按顺序执行
+ROUNDTRIP_TESTS = [
+    roundtrip_layout,
+    roundtrip_sparse,
+    roundtrip_checksums,
+    roundtrip_stream,
+    roundtrip_v3,
+    roundtrip_dirty_rects,
+    roundtrip_archive,
+    roundtrip_containers,
+    roundtrip_density_variants,
+    roundtrip_previews,
+]
+
+
+def run_roundtrip_tests(work_dir: Path) -> list:
+    """
+    执行全部格式往返测试，每个测试使用独立的子目录
+
+    Returns:
+        失败的测试名称列表
+    """
+    print(f"\n--- 格式往返测试 ---")
+    clear_directory(work_dir)
+    failed = []
+    for test in ROUNDTRIP_TESTS:
+        test_dir = work_dir / test.__name__
+        test_dir.mkdir()
+        try:
+            test(test_dir)
+        except Exception:
+            print(f"失败: {test.__name__}")
+            traceback.print_exc()
+            failed.append(test.__name__)
         else:
-            print(f"{format_name} 格式帧对比成功")
-
-    return compare_success
+            print(f"通过: {test.__name__}")
+    return failed
 
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='FFAB 编码与解码功能测试')
+    parser.add_argument('--formats', default=','.join(ASTC_FORMATS),
+                        help=f'测试的 ASTC 格式，逗号分隔 (默认: {",".join(ASTC_FORMATS)})')
+    parser.add_argument('--clean', action='store_true',
+                        help='清空 build 目录，不使用缓存')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='进程池大小 (默认: CPU 数量)')
+    parser.add_argument('--roundtrip-only', action='store_true',
+                        help='只执行格式往返测试，不需要 ffmpeg 与 astcenc')
+    args = parser.parse_args()
+
+    formats = args.formats.split(',')
+    for astc_format in formats:
+        if astc_format not in QUALITY_THRESHOLDS:
+            print(f"错误：不支持的测试格式 {astc_format}，可选值: {', '.join(QUALITY_THRESHOLDS)}")
+            return 1
+
     # 获取目录路径
     tools_dir = Path(__file__).parent.parent
     test_dir = tools_dir / 'test'
     resources_dir = test_dir / 'resources'
     build_dir = test_dir / 'build'
 
-    # 重置build目录
-    reset_build_directory(build_dir)
+    # 指定 --clean 时重置build目录，否则保留缓存
+    if args.clean:
+        reset_build_directory(build_dir)
+    else:
+        build_dir.mkdir(exist_ok=True)
+
+    # 格式往返测试不依赖外部工具，先执行
+    failed_roundtrips = run_roundtrip_tests(build_dir / 'roundtrip')
+    if failed_roundtrips:
+        print(f"\n格式往返测试失败: {', '.join(failed_roundtrips)}")
+        return 1
+    print(f"格式往返测试全部通过 ({len(ROUNDTRIP_TESTS)} 项)")
+    if args.roundtrip_only:
+        return 0
 
     # 检查必要工具
     if not check_ffmpeg_availability():
@@ -344,19 +868,14 @@ def main():
         return 1
 
     # 获取resources目录下的所有mp4文件
-    mp4_files = list(resources_dir.glob('*.mp4'))
+    mp4_files = sorted(resources_dir.glob('*.mp4'))
     if not mp4_files:
         print(f"错误：resources目录下未找到mp4文件: {resources_dir}")
         return 1
 
-    print(f"找到 {len(mp4_files)} 个测试视频文件")
-
-    # 处理每个视频文件
-    failed_videos = []
+    print(f"找到 {len(mp4_files)} 个测试视频文件，测试格式: {', '.join(formats)}")
 
-    for video_path in mp4_files:
-        if not process_video(tools_dir, video_path, build_dir):
-            failed_videos.append(video_path.name)
+    failed_videos = run_pipeline(tools_dir, mp4_files, build_dir, formats, args.jobs)
 
     # 输出测试结果摘要
     print("\n=== 测试结果摘要 ===")